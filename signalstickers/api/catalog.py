@@ -0,0 +1,12 @@
+from api.serializers import PackSerializer
+from core.models import Pack
+from rest_framework.renderers import JSONRenderer
+
+
+def render_packs():
+    """
+    Render all ONLINE packs as they are returned by `GET /v1/packs/`, as JSON
+    bytes.
+    """
+    serializer = PackSerializer(Pack.objects.onlines(), many=True)
+    return JSONRenderer().render(serializer.data)
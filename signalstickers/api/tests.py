@@ -1,7 +1,12 @@
+from io import StringIO
 import logging
+from pathlib import Path
+import shutil
+import tempfile
 from unittest.mock import patch
 from uuid import UUID
 
+from core.image_samples import make_png
 from core.models import (
     AIReview,
     AIReviewStatus,
@@ -19,6 +24,7 @@ from core.services import (
 )
 from core.utils import get_current_ym_date, get_last_month_ym_date
 from django.core.exceptions import ValidationError
+from django.core.management import call_command
 from django.test import TestCase, override_settings
 from django.urls import reverse
 from rest_framework import status
@@ -465,7 +471,7 @@ class PackTestCase(TestCase):
 
         # Second pack, status ONLINE: should be returned second by the API
         mocked_getpacklib.return_value = TestPack(
-            "Pack title 2", "Pack author 2", b"\x61\x63\x54\x4c"
+            "Pack title 2", "Pack author 2", make_png(frames=2)
         )
 
         Pack.objects.new(
@@ -577,6 +583,65 @@ class PackTestCase(TestCase):
             ],
         )
 
+    def test_get_all_packs_conditional(self, mocked_getpacklib):
+        mocked_getpacklib.return_value = TestPack("Pack", "Author", b"\x00")
+        Pack.objects.new(
+            pack_id="a" * 32, pack_key="b" * 64, status=PackStatus.ONLINE.name
+        )
+
+        response = self.client.get(reverse("api_v1:packs"))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data), 1)
+        self.assertIn("Last-Modified", response)
+        self.assertIn("stale-while-revalidate", response["Cache-Control"])
+
+        response = self.client.get(
+            reverse("api_v1:packs"), HTTP_IF_NONE_MATCH=response["ETag"]
+        )
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_get_all_packs_artifact(self, mocked_getpacklib):
+        mocked_getpacklib.return_value = TestPack("Pack", "Author", b"\x00")
+        Pack.objects.new(
+            pack_id="a" * 32, pack_key="b" * 64, status=PackStatus.ONLINE.name
+        )
+        response = self.client.get(reverse("api_v1:packs"))
+
+        tmp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmp_dir)
+        with override_settings(
+            CATALOG_ARTIFACTS={
+                "path": Path(tmp_dir),
+                "url": "https://static.example.com/catalog",
+                "serve": "redirect",
+                "keep": 3,
+            }
+        ):
+            call_command("build_catalog_artifacts", catalog=["v1"], stdout=StringIO())
+            (path,) = (Path(tmp_dir) / "v1").glob("packs.*.json")
+            # Same content as the API
+            self.assertEqual(path.read_bytes(), response.content)
+
+            response = self.client.get(reverse("api_v1:packs"))
+            self.assertEqual(response.status_code, status.HTTP_302_FOUND)
+            self.assertEqual(
+                response["Location"],
+                f"https://static.example.com/catalog/v1/{path.name}",
+            )
+
+    def test_feeds_conditional(self, mocked_getpacklib):
+        mocked_getpacklib.return_value = TestPack("Pack", "Author", b"\x00")
+        Pack.objects.new(
+            pack_id="a" * 32, pack_key="b" * 64, status=PackStatus.ONLINE.name
+        )
+
+        for url in ("/feed/rss/", "/feed/atom/"):
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertIn("max-age=300", response["Cache-Control"])
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=response["ETag"])
+            self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
 
 # pylint: disable=no-member
 class BotPreventionQuestionTestCase(TestCase):
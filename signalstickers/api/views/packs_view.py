@@ -1,5 +1,8 @@
 from api.serializers import PackSerializer
+from core.catalog_artifacts import artifact_response
+from core.http_cache import catalog_cache
 from core.models import Pack
+from django.utils.decorators import method_decorator
 from rest_framework import parsers
 from rest_framework.response import Response
 from rest_framework.views import APIView
@@ -8,10 +11,15 @@ from rest_framework.views import APIView
 class PacksView(APIView):
     parser_classes = (parsers.JSONParser,)
 
+    @method_decorator(catalog_cache("catalog"))
     def get(self, request):
         """
         List all packs
         """
+        response = artifact_response("v1")
+        if response is not None:
+            return response
+
         all_packs = Pack.objects.onlines()
         serializer = PackSerializer(all_packs, many=True)
         return Response(serializer.data)
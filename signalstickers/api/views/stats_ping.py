@@ -1,5 +1,5 @@
 from api.serializers import StatsPingSerializer
-from core.models import Pack, SiteStat
+from core.analytics import record_pack_view, record_site_visit
 from core.utils import get_current_ym_date
 from rest_framework import parsers, status
 from rest_framework.response import Response
@@ -23,19 +23,10 @@ class StatsPingView(APIView):
 
         if req_target == "home":
             # Hit the homepage
-            month_visit = SiteStat.objects.get_or_create(month=current_ym)[0]
-            month_visit.visits += 1
-            month_visit.save()
+            record_site_visit(current_ym)
             return Response({})
 
         # Pack stats
-        try:
-            pack = Pack.objects.get(pack_id=req_target)
-            try:
-                pack.stats[current_ym] += 1
-            except KeyError:
-                pack.stats[current_ym] = 1
-            pack.save()
-            return Response({})
-        except Pack.DoesNotExist:
+        if not record_pack_view(req_target, current_ym):
             return Response({}, status=status.HTTP_400_BAD_REQUEST)
+        return Response({})
@@ -0,0 +1,118 @@
+"""
+Renderers of the `GET /v2/packs/` catalog (see `settings.CATALOG_RENDERERS`).
+
+Besides the list of `PackResponse`, the catalog comes in a columnar format,
+selected with the `format` query parameter (see `CATALOG_FORMATS`), in JSON or
+MessagePack. Each field of the packs is an array, all in the same order, and
+tags are indexes in a shared dictionary of tags:
+
+    {
+        "flags": ["nsfw", "original", "animated", "editorschoice"],
+        "tags": ["cat", "cute", ...],
+        "packs": {
+            "id": [...], "key": [...], "title": [...], "author": [...],
+            "source": [...], "cover_id": [...], "totalviews": [...],
+            "hotviews": [...],
+            "flags": [5, 0, ...],      # bit i set: the pack is flags[i]
+            "tags": [[0, 1], [], ...]  # indexes in tags
+        }
+    }
+
+Tags are sorted by decreasing frequency, so that the most used ones get the
+shortest indexes.
+"""
+
+from collections import Counter
+import json
+
+from api_v2.schemas import PackResponse
+from core.models import Pack
+import msgpack
+from pydantic import TypeAdapter
+
+PACK_FLAGS = ("nsfw", "original", "animated", "editorschoice")
+
+COLUMNAR_JSON = "application/vnd.signalstickers.columnar+json"
+COLUMNAR_MSGPACK = "application/vnd.signalstickers.columnar+msgpack"
+
+# Formats of the catalog (`format` query parameter): name of their catalog, and
+# content type. Each format has its own URL, so that caches keep them apart.
+CATALOG_FORMATS = {
+    "json": ("v2", "application/json; charset=utf-8"),
+    "columnar": ("v2-columnar", f"{COLUMNAR_JSON}; charset=utf-8"),
+    "msgpack": ("v2-msgpack", COLUMNAR_MSGPACK),
+}
+
+_packs_adapter = TypeAdapter(list[PackResponse])
+
+
+def online_packs():
+    """
+    Return all ONLINE packs, as `PackResponse`.
+    """
+    return _packs_adapter.validate_python(list(Pack.objects.onlines()))
+
+
+def _pack_flags(meta):
+    return sum(1 << bit for bit, flag in enumerate(PACK_FLAGS) if getattr(meta, flag))
+
+
+def columnar_catalog(packs):
+    """
+    Return the packs `packs` (`PackResponse`) in the columnar format, as a dict.
+    """
+    tag_counts = Counter(tag for pack in packs for tag in pack.meta.tags)
+    tags = sorted(tag_counts, key=lambda tag: (-tag_counts[tag], tag))
+    tag_indexes = {tag: index for index, tag in enumerate(tags)}
+
+    return {
+        "flags": list(PACK_FLAGS),
+        "tags": tags,
+        "packs": {
+            "id": [pack.meta.id for pack in packs],
+            "key": [pack.meta.key for pack in packs],
+            "title": [pack.manifest.title for pack in packs],
+            "author": [pack.manifest.author for pack in packs],
+            "source": [pack.meta.source for pack in packs],
+            "cover_id": [pack.manifest.cover_id for pack in packs],
+            "totalviews": [pack.meta.totalviews for pack in packs],
+            "hotviews": [pack.meta.hotviews for pack in packs],
+            "flags": [_pack_flags(pack.meta) for pack in packs],
+            "tags": [[tag_indexes[tag] for tag in pack.meta.tags] for pack in packs],
+        },
+    }
+
+
+def dump_packs(packs):
+    return _packs_adapter.dump_json(packs, exclude_none=True, exclude_defaults=True)
+
+
+def dump_columnar_json(packs):
+    catalog = columnar_catalog(packs)
+    return json.dumps(catalog, ensure_ascii=False, separators=(",", ":")).encode()
+
+
+def dump_columnar_msgpack(packs):
+    return msgpack.packb(columnar_catalog(packs))
+
+
+def render_packs():
+    """
+    Render all ONLINE packs as they are returned by `GET /v2/packs/`, as JSON
+    bytes.
+    """
+    return dump_packs(online_packs())
+
+
+def render_packs_columnar():
+    """
+    Render all ONLINE packs in the columnar format, as JSON bytes.
+    """
+    return dump_columnar_json(online_packs())
+
+
+def render_packs_msgpack():
+    """
+    Render all ONLINE packs in the columnar format, as MessagePack bytes.
+    """
+    return dump_columnar_msgpack(online_packs())
@@ -0,0 +1,93 @@
+import gzip
+import json
+import random
+import time
+from types import SimpleNamespace
+
+from api_v2.catalog import (
+    dump_columnar_json,
+    dump_columnar_msgpack,
+    dump_packs,
+    online_packs,
+)
+from api_v2.schemas import PackResponse
+import brotli
+from django.core.management.base import BaseCommand, CommandError
+import msgpack
+
+
+def _synthetic_packs(nb_packs, nb_tags=500):
+    """
+    Return `nb_packs` random packs (`PackResponse`). Tags follow a Zipf
+    distribution, as in the catalog: a few tags are used by most packs.
+    """
+    rng = random.Random(0)  # nosec
+    tags = [f"tag {index}" for index in range(nb_tags)]
+    weights = [1 / rank for rank in range(1, nb_tags + 1)]
+    packs = []
+    for index in range(nb_packs):
+        pack_tags = set(rng.choices(tags, weights, k=rng.randint(0, 8)))
+        pack = SimpleNamespace(
+            pack_id=rng.randbytes(16).hex(),
+            pack_key=rng.randbytes(32).hex(),
+            source=rng.choice(["", "", "signalstickers.org", "Telegram"]),
+            tags=[SimpleNamespace(name=tag) for tag in sorted(pack_tags)],
+            nsfw=rng.random() < 0.1,
+            original=rng.random() < 0.3,
+            animated=rng.random() < 0.2,
+            editorschoice=rng.random() < 0.05,
+            total_views=rng.randint(0, 100_000),
+            hot_views=rng.randint(0, 1_000),
+            title=f"Pack {index}",
+            author=f"Author {index % 1000}",
+            id_cover=rng.randint(0, 30),
+        )
+        packs.append(PackResponse.model_validate(pack))
+    return packs
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare the size and the parse time of the formats of the v2 catalog: "
+        "the JSON list of packs, and the columnar format in JSON and MessagePack."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--synthetic",
+            type=int,
+            default=0,
+            help="Number of random packs to use (default: the ONLINE packs)",
+        )
+        parser.add_argument("--runs", type=int, default=20)
+
+    def handle(self, *_, **options):
+        if options["synthetic"]:
+            packs = _synthetic_packs(options["synthetic"])
+        else:
+            packs = online_packs()
+        if not packs:
+            raise CommandError("No pack to run the benchmark on.")
+
+        formats = [
+            ("json", dump_packs, json.loads),
+            ("columnar json", dump_columnar_json, json.loads),
+            ("columnar msgpack", dump_columnar_msgpack, msgpack.unpackb),
+        ]
+
+        self.stdout.write(f"{len(packs)} packs:")
+        for label, dump, parse in formats:
+            content = dump(packs)
+            sizes = [
+                f"gzip {len(gzip.compress(content)) / 1024:.0f} KiB",
+                f"brotli {len(brotli.compress(content)) / 1024:.0f} KiB",
+            ]
+
+            start = time.perf_counter()
+            for _ in range(options["runs"]):
+                parse(content)
+            elapsed = time.perf_counter() - start
+            self.stdout.write(
+                f"  {label}: {len(content) / 1024:.0f} KiB ({', '.join(sizes)}), "
+                f"parsed in {elapsed / options['runs'] * 1e3:.2f} ms"
+            )
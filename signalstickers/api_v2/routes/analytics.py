@@ -2,7 +2,7 @@ from http import HTTPStatus
 
 from api_v2.schemas import AnalyticsRequest
 from api_v2.schemas.errors import APIErrorResponse
-from core.models import Pack, SiteStat
+from core.analytics import record_pack_view, record_site_visit
 from core.utils import get_current_ym_date
 from ninja import Form, Router
 
@@ -25,19 +25,10 @@ def send_analytics(request, data: Form[AnalyticsRequest]):
 
     if data.target == "home":
         # Hit the homepage
-        month_visit = SiteStat.objects.get_or_create(month=current_ym)[0]
-        month_visit.visits += 1
-        month_visit.save()
+        record_site_visit(current_ym)
         return HTTPStatus.NO_CONTENT, None
 
     # Pack stats
-    try:
-        pack = Pack.objects.get(pack_id=data.target)
-        try:
-            pack.stats[current_ym] += 1
-        except KeyError:
-            pack.stats[current_ym] = 1
-        pack.save()
-        return HTTPStatus.NO_CONTENT, None
-    except Pack.DoesNotExist:
+    if not record_pack_view(data.target, current_ym):
         return HTTPStatus.BAD_REQUEST, APIErrorResponse(detail="Unknown pack")
+    return HTTPStatus.NO_CONTENT, None
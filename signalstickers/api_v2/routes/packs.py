@@ -1,21 +1,33 @@
 from http import HTTPStatus
 import logging
+from typing import Literal
 
+from api_v2.catalog import CATALOG_FORMATS
 from api_v2.schemas import (
     APIErrorResponse,
     ContributionRequest,
+    PackChangesRequest,
+    PackChangesResponse,
     PackIdentifierRequest,
+    PackListRequest,
+    PackListResponse,
     PackResponse,
+    PackSearchRequest,
     ReportRequest,
     StatusResponse,
 )
-from api_v2.utils import validate_securityanswer_or_die
-from core.models import Pack, PackStatus, Report
+from api_v2.utils import decode_cursor, encode_cursor, validate_securityanswer_or_die
+from core.catalog import get_catalog_snapshot
+from core.catalog_artifacts import artifact_response
+from core.http_cache import catalog_cache, status_cache
+from core.models import PACK_ORDERINGS, CatalogChange, Pack, PackStatus, Report
 from core.services import send_email_on_pack_propose
 from django.conf import settings
 from django.core.exceptions import ValidationError
 from django.db.utils import IntegrityError
+from django.http import HttpResponse
 from ninja import Query, Router
+from ninja.decorators import decorate_view
 
 logger = logging.getLogger(__name__)
 
@@ -31,18 +43,133 @@ router = Router()
     exclude_none=True,
     exclude_defaults=True,
 )
-def get_all_packs(request, role_preload: bool = False):
+@decorate_view(catalog_cache("catalog"))
+def get_all_packs(
+    request,
+    role_preload: bool = False,
+    catalog_format: Literal["json", "columnar", "msgpack"] = Query(
+        "json", alias="format"
+    ),
+):
     """
     List all packs.
 
     _Falsy_ values are ignored, and are not returned.
 
     If set to `true`, `role_preload` only returns the first 64 packs.
+
+    The full list is served from a pre-rendered snapshot, and supports
+    `If-None-Match` and `If-Modified-Since` (`304 Not Modified`). It may be
+    redirected to a static, precompressed file.
+
+    It is also available in a compact, columnar format, with `format` set to
+    `columnar` (`application/vnd.signalstickers.columnar+json`) or `msgpack`
+    (`application/vnd.signalstickers.columnar+msgpack`, MessagePack): one array
+    per field, and tags as indexes in a shared `tags` array.
     """
     if role_preload:
         return Pack.objects.onlines()[:64]
 
-    return Pack.objects.onlines()
+    name, content_type = CATALOG_FORMATS[catalog_format]
+    if name == "v2":
+        response = artifact_response(name)
+        if response is not None:
+            return response
+
+    snapshot = get_catalog_snapshot(name)
+    return HttpResponse(snapshot.content, content_type=content_type)
+
+
+@router.get(
+    "/list",
+    response={
+        HTTPStatus.OK: PackListResponse,
+        HTTPStatus.BAD_REQUEST: APIErrorResponse,
+    },
+    exclude_none=True,
+    exclude_defaults=True,
+    summary="List packs, page by page",
+)
+def list_packs(request, data: Query[PackListRequest]):
+    """
+    List the packs matching the filters, sorted by `sort`: `newest`, `popular`
+    (most viewed ever) or `hot` (most viewed this month and last month).
+
+    At most `limit` packs are returned. To get the next page, send the same
+    request with `cursor` set to the `next_cursor` of the response. There is no
+    `next_cursor` on the last page.
+
+    _Falsy_ values are ignored, and are not returned.
+    """
+    after = None
+    if data.cursor:
+        try:
+            after = decode_cursor(data.cursor, len(PACK_ORDERINGS[data.sort]))
+        except ValueError:
+            return HTTPStatus.BAD_REQUEST, APIErrorResponse(detail="Invalid cursor")
+
+    packs = Pack.objects.onlines_sorted(data.sort, after)
+    if data.tag:
+        packs = packs.filter(tags__name=data.tag.strip().lower())
+    for flag in ("nsfw", "original", "animated", "editorschoice"):
+        if getattr(data, flag) is not None:
+            packs = packs.filter(**{flag: getattr(data, flag)})
+
+    # Fetch one more pack, to know if there is a next page
+    packs = list(packs[: data.limit + 1])
+    next_cursor = None
+    if len(packs) > data.limit:
+        packs = packs[: data.limit]
+        next_cursor = encode_cursor(packs[-1].keyset(data.sort))
+
+    # Packs are validated by ninja, from the model instances
+    return {"packs": packs, "next_cursor": next_cursor}
+
+
+@router.get(
+    "/changes",
+    response={
+        HTTPStatus.OK: PackChangesResponse,
+    },
+    exclude_none=True,
+    exclude_defaults=True,
+    summary="List the changes of the catalog",
+)
+@decorate_view(catalog_cache("catalog"))
+def get_changes(request, data: Query[PackChangesRequest]):
+    """
+    List the packs added, changed (`upserts`) or removed (`removals`, pack ids)
+    since the sequence number `since`. Packs are returned as they are now. To
+    get the next changes, send `seq` as `since`.
+
+    With `since` 0 (or unset), all the packs are returned: use it to sync a
+    catalog for the first time. Removals only list packs that left the catalog,
+    but may list packs added and removed since the last sync.
+
+    _Falsy_ values are ignored, and are not returned.
+    """
+    seq, upserts, removals = CatalogChange.objects.since(data.since)
+    # Packs are validated by ninja, from the model instances
+    return {"seq": seq, "upserts": upserts, "removals": removals}
+
+
+@router.get(
+    "/search",
+    response={
+        HTTPStatus.OK: list[PackResponse],
+    },
+    exclude_none=True,
+    exclude_defaults=True,
+    summary="Search packs",
+)
+def search_packs(request, data: Query[PackSearchRequest]):
+    """
+    Search packs by title, tags and author, best matches first. Words of `q`
+    match the words starting with them: `cat` matches `cats`.
+
+    _Falsy_ values are ignored, and are not returned.
+    """
+    return Pack.objects.search(data.q, Pack.objects.onlines())[: data.limit]
 
 
 @router.put(
@@ -123,6 +250,7 @@ def public_contribute(
     },
     summary="Get the status of a pack",
 )
+@decorate_view(status_cache())
 def get_pack_status(request, data: Query[PackIdentifierRequest]):
     """
     Get the status of a pack
@@ -2,13 +2,18 @@ from api_v2.schemas.analytics import AnalyticsRequest
 from api_v2.schemas.contribution import APIContributionRequest, ContributionRequest
 from api_v2.schemas.errors import APIErrorResponse
 from api_v2.schemas.pack import (
+    PackChangesRequest,
+    PackChangesResponse,
     PackIdentifierRequest,
     PackIDType,
     PackKeyType,
+    PackListRequest,
+    PackListResponse,
     PackManifestResponse,
     PackMetaRequest,
     PackMetaResponse,
     PackResponse,
+    PackSearchRequest,
 )
 from api_v2.schemas.report import ReportRequest
 from api_v2.schemas.securityquestion import (
@@ -1,5 +1,7 @@
+from typing import Literal, Optional
+
 from ninja import Schema
-from pydantic import StringConstraints, model_validator
+from pydantic import Field, StringConstraints, model_validator
 from typing_extensions import Annotated
 
 # ---------- Common ---------- #
@@ -53,6 +55,40 @@ class PackIdentifierRequest(_PackMetaIdentifiers):
     """
 
 
+class PackListRequest(Schema):
+    """
+    Filters, sort order and page of a list of packs
+    """
+
+    tag: Optional[str] = None
+    nsfw: Optional[bool] = None
+    original: Optional[bool] = None
+    animated: Optional[bool] = None
+    editorschoice: Optional[bool] = None
+    sort: Literal["newest", "popular", "hot"] = "newest"
+    cursor: Optional[str] = None
+    limit: Annotated[int, Field(ge=1, le=100)] = 50
+
+
+class PackChangesRequest(Schema):
+    """
+    Changes of the catalog after a sequence number
+    """
+
+    since: Annotated[int, Field(ge=0)] = 0
+
+
+class PackSearchRequest(Schema):
+    """
+    Full-text search among packs
+    """
+
+    q: Annotated[
+        str, StringConstraints(strip_whitespace=True, min_length=1, max_length=256)
+    ]
+    limit: Annotated[int, Field(ge=1, le=100)] = 50
+
+
 # ---------- Responses ---------- #
 
 
@@ -102,3 +138,14 @@ class PackResponse(Schema):
                 "cover_id": data.id_cover,
             },
         }
+
+
+class PackListResponse(Schema):
+    packs: list[PackResponse]
+    next_cursor: Optional[str] = None
+
+
+class PackChangesResponse(Schema):
+    seq: int
+    upserts: list[PackResponse]
+    removals: list[str]
@@ -1,10 +1,22 @@
+import gzip
 from http import HTTPStatus
+from io import StringIO
 import logging
+from pathlib import Path
+import shutil
+import tempfile
 from unittest.mock import patch
 
-from core.models import Pack, PackStatus
-from django.test import TestCase
+from api_v2.catalog import COLUMNAR_JSON, COLUMNAR_MSGPACK
+from api_v2.utils import encode_cursor
+import brotli
+from core.catalog_artifacts import build_catalog_artifact
+from core.image_samples import make_png
+from core.models import CatalogChange, Pack, PackStatus, Tag
+from django.core.management import call_command
+from django.test import TestCase, override_settings
 from django.urls import reverse
+import msgpack
 
 from signalstickers.tests_common import TestPack
 
@@ -37,7 +49,7 @@ class PackTestCase(TestCase):
 
         # Second pack, status ONLINE: should be returned second by the API
         mocked_getpacklib.return_value = TestPack(
-            "Pack title 2", "Pack author 2", b"\x61\x63\x54\x4c"
+            "Pack title 2", "Pack author 2", make_png(frames=2)
         )
 
         Pack.objects.new(
@@ -70,7 +82,7 @@ class PackTestCase(TestCase):
 
         # Status IN_REVIEW: should NOT be returned by the API
         Pack.objects.new(
-            pack_id="g" * 32, pack_key="h" * 64, status=PackStatus.IN_REVIEW.name
+            pack_id="0" * 32, pack_key="1" * 64, status=PackStatus.IN_REVIEW.name
         )
         response = self.client.get(reverse("api_v2:get_all_packs"))
 
@@ -148,3 +160,311 @@ class PackTestCase(TestCase):
                 }
             ],
         )
+
+    def test_get_all_packs_etag(self, mocked_getpacklib):
+        """
+        The catalog is served with an ETag, and is rebuilt when a pack changes
+        """
+        mocked_getpacklib.return_value = TestPack("Pack 1", "Author 1", b"\x00")
+        Pack.objects.new(
+            pack_id="a" * 32, pack_key="b" * 64, status=PackStatus.ONLINE.name
+        )
+
+        response = self.client.get(reverse("api_v2:get_all_packs"))
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        etag = response["ETag"]
+        self.assertEqual(len(response.json()), 1)
+
+        # Same catalog: 304
+        response = self.client.get(
+            reverse("api_v2:get_all_packs"), HTTP_IF_NONE_MATCH=etag
+        )
+        self.assertEqual(response.status_code, HTTPStatus.NOT_MODIFIED)
+        self.assertEqual(response.content, b"")
+        self.assertEqual(response["ETag"], etag)
+        self.assertEqual(
+            response["Cache-Control"], "public, max-age=60, stale-while-revalidate=600"
+        )
+        response = self.client.get(
+            reverse("api_v2:get_all_packs"),
+            HTTP_IF_MODIFIED_SINCE=response["Last-Modified"],
+        )
+        self.assertEqual(response.status_code, HTTPStatus.NOT_MODIFIED)
+
+        # New pack: the snapshot is rebuilt
+        Pack.objects.new(
+            pack_id="c" * 32, pack_key="d" * 64, status=PackStatus.ONLINE.name
+        )
+        response = self.client.get(
+            reverse("api_v2:get_all_packs"), HTTP_IF_NONE_MATCH=etag
+        )
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertNotEqual(response["ETag"], etag)
+        self.assertEqual(
+            [pack["meta"]["id"] for pack in response.json()], ["c" * 32, "a" * 32]
+        )
+
+    def test_get_all_packs_artifact(self, mocked_getpacklib):
+        """
+        Once built, the catalog is handed over to its static files
+        """
+        tmp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmp_dir)
+        path = Path(tmp_dir)
+        conf = {"path": path, "url": "/catalog/", "serve": "redirect", "keep": 1}
+        mocked_getpacklib.return_value = TestPack("Pack 1", "Author 1", b"\x00")
+        Pack.objects.new(
+            pack_id="a" * 32, pack_key="b" * 64, status=PackStatus.ONLINE.name
+        )
+
+        with override_settings(CATALOG_ARTIFACTS=conf), patch(
+            "core.catalog_artifacts.schedule_artifact_build"
+        ) as mocked_build:
+            # Not built yet: served by the API, and built in the background
+            response = self.client.get(reverse("api_v2:get_all_packs"))
+            self.assertEqual(response.status_code, HTTPStatus.OK)
+            mocked_build.assert_called_once_with("v2")
+
+            artifact = build_catalog_artifact("v2")
+            json_path = path / "v2" / artifact.filename
+            self.assertEqual(json_path.read_bytes(), response.content)
+            self.assertEqual(
+                gzip.decompress(Path(f"{json_path}.gz").read_bytes()), response.content
+            )
+            self.assertEqual(
+                brotli.decompress(Path(f"{json_path}.br").read_bytes()),
+                response.content,
+            )
+
+            response = self.client.get(reverse("api_v2:get_all_packs"))
+            self.assertEqual(response.status_code, HTTPStatus.FOUND)
+            self.assertEqual(response["Location"], f"/catalog/v2/{artifact.filename}")
+            response = self.client.get(
+                reverse("api_v2:get_all_packs"), {"role_preload": "true"}
+            )
+            self.assertEqual(response.status_code, HTTPStatus.OK)
+
+            with override_settings(CATALOG_ARTIFACTS={**conf, "serve": "x-accel"}):
+                response = self.client.get(reverse("api_v2:get_all_packs"))
+                self.assertEqual(response.status_code, HTTPStatus.OK)
+                self.assertEqual(response.content, b"")
+                self.assertEqual(
+                    response["X-Accel-Redirect"], f"/catalog/v2/{artifact.filename}"
+                )
+                self.assertIn("max-age=60", response["Cache-Control"])
+
+            # New pack: out of date, served by the API until rebuilt
+            Pack.objects.new(
+                pack_id="c" * 32, pack_key="d" * 64, status=PackStatus.ONLINE.name
+            )
+            response = self.client.get(reverse("api_v2:get_all_packs"))
+            self.assertEqual(response.status_code, HTTPStatus.OK)
+            self.assertEqual(len(response.json()), 2)
+
+            new_artifact = build_catalog_artifact("v2")
+            self.assertNotEqual(new_artifact.filename, artifact.filename)
+            # Only the files of the last build are kept
+            self.assertFalse(json_path.exists())
+            self.assertTrue((path / "v2" / new_artifact.filename).exists())
+
+    def test_get_all_packs_columnar(self, mocked_getpacklib):
+        """
+        The catalog is also served in the columnar format, in JSON or
+        MessagePack, selected with the `format` parameter
+        """
+        mocked_getpacklib.return_value = TestPack("Pack 1", "Author 1", b"\x00")
+        Pack.objects.new(
+            pack_id="a" * 32,
+            pack_key="b" * 64,
+            status=PackStatus.ONLINE.name,
+            nsfw=True,
+            tags=["Foo", "Bar"],
+        )
+        mocked_getpacklib.return_value = TestPack(
+            "Pack 2", "Author 2", make_png(frames=2)
+        )
+        Pack.objects.new(
+            pack_id="c" * 32,
+            pack_key="d" * 64,
+            status=PackStatus.ONLINE.name,
+            original=True,
+            tags=["Foo"],
+        )
+        expected = {
+            "flags": ["nsfw", "original", "animated", "editorschoice"],
+            "tags": ["foo", "bar"],
+            "packs": {
+                "id": ["c" * 32, "a" * 32],
+                "key": ["d" * 64, "b" * 64],
+                "title": ["Pack 2", "Pack 1"],
+                "author": ["Author 2", "Author 1"],
+                "source": ["", ""],
+                "cover_id": [42, 42],
+                "totalviews": [0, 0],
+                "hotviews": [0, 0],
+                "flags": [0b0110, 0b0001],
+                "tags": [[0], [1, 0]],
+            },
+        }
+
+        json_response = self.client.get(reverse("api_v2:get_all_packs"))
+        response = self.client.get(
+            reverse("api_v2:get_all_packs"), {"format": "columnar"}
+        )
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertEqual(response["Content-Type"], f"{COLUMNAR_JSON}; charset=utf-8")
+        self.assertEqual(response.json(), expected)
+        self.assertNotEqual(response["ETag"], json_response["ETag"])
+
+        # Each format has its own URL and ETag, for the caches
+        response = self.client.get(
+            reverse("api_v2:get_all_packs"),
+            {"format": "columnar"},
+            HTTP_IF_NONE_MATCH=json_response["ETag"],
+        )
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertNotIn("Accept", response.get("Vary", ""))
+
+        # The format is not negotiated with the Accept header
+        response = self.client.get(
+            reverse("api_v2:get_all_packs"), HTTP_ACCEPT=COLUMNAR_JSON
+        )
+        self.assertEqual(response.content, json_response.content)
+        response = self.client.get(reverse("api_v2:get_all_packs"), {"format": "json"})
+        self.assertEqual(response.content, json_response.content)
+
+        response = self.client.get(
+            reverse("api_v2:get_all_packs"), {"format": "msgpack"}
+        )
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertEqual(response["Content-Type"], COLUMNAR_MSGPACK)
+        self.assertEqual(msgpack.unpackb(response.content), expected)
+
+        response = self.client.get(reverse("api_v2:get_all_packs"), {"format": "xml"})
+        self.assertEqual(response.status_code, HTTPStatus.UNPROCESSABLE_ENTITY)
+
+    def test_get_changes(self, mocked_getpacklib):
+        """
+        Clients sync the catalog from the changes since their last sync
+        """
+        mocked_getpacklib.return_value = TestPack("Pack", "Author", b"\x00")
+        for pack_id, status in (
+            ("a", PackStatus.ONLINE),
+            ("c", PackStatus.ONLINE),
+            ("e", PackStatus.IN_REVIEW),
+            ("f", PackStatus.IN_REVIEW),
+        ):
+            Pack.objects.new(
+                pack_id=pack_id * 32,
+                pack_key="b" * 64,
+                status=status.name,
+                tags=[f"tag {pack_id}"],
+            )
+
+        def get_changes(since):
+            response = self.client.get(reverse("api_v2:get_changes"), {"since": since})
+            self.assertEqual(response.status_code, HTTPStatus.OK)
+            changes = response.json()
+            upserts = [pack["meta"]["id"][0] for pack in changes["upserts"]]
+            removals = [pack_id[0] for pack_id in changes["removals"]]
+            return changes["seq"], upserts, removals
+
+        # First sync: the whole catalog
+        seq, upserts, removals = get_changes(0)
+        self.assertEqual((upserts, removals), (["c", "a"], []))
+        self.assertEqual(get_changes(seq), (seq, [], []))
+
+        # Approval, refusals, deletion: packs never ONLINE are not removals
+        Pack.objects.filter(pack_id="e" * 32).get().approve()
+        Pack.objects.filter(pack_id="a" * 32).get().refuse()
+        Pack.objects.filter(pack_id="f" * 32).get().refuse()
+        Pack.objects.filter(pack_id="c" * 32).delete()
+        new_seq, upserts, removals = get_changes(seq)
+        self.assertGreater(new_seq, seq)
+        self.assertEqual((upserts, removals), (["e"], ["a", "c"]))
+
+        # Tag renamed
+        tag = Tag.objects.get(name="tag e")
+        tag.name = "tag e2"
+        tag.save()
+        response = self.client.get(reverse("api_v2:get_changes"), {"since": new_seq})
+        self.assertEqual(response.json()["upserts"][0]["meta"]["tags"], ["tag e2"])
+
+        # Compaction: only the last change of each pack is kept
+        call_command("compact_catalog_changes", stdout=StringIO())
+        self.assertEqual(CatalogChange.objects.count(), 3)
+        self.assertEqual(get_changes(seq)[1:], (["e"], ["a", "c"]))
+
+        response = self.client.get(reverse("api_v2:get_changes"), {"since": -1})
+        self.assertEqual(response.status_code, HTTPStatus.UNPROCESSABLE_ENTITY)
+
+    def test_list_packs(self, mocked_getpacklib):
+        """
+        Packs can be filtered, sorted, and fetched page by page
+        """
+        mocked_getpacklib.return_value = TestPack("Pack", "Author", b"\x00")
+        for pack_id, views, tags, nsfw in (
+            ("a", 5, ["Foo"], False),
+            ("c", 20, ["foo", "bar"], False),
+            ("e", 5, [], False),
+            ("f", 0, ["foo"], True),
+        ):
+            Pack.objects.new(
+                pack_id=pack_id * 32,
+                pack_key="b" * 64,
+                status=PackStatus.ONLINE.name,
+                tags=tags,
+                nsfw=nsfw,
+            )
+            if views:
+                Pack.objects.increment_views(pack_id * 32, count=views)
+        Pack.objects.new(
+            pack_id="d" * 32, pack_key="b" * 64, status=PackStatus.IN_REVIEW.name
+        )
+
+        def list_packs(**params):
+            response = self.client.get(reverse("api_v2:list_packs"), params)
+            self.assertEqual(response.status_code, HTTPStatus.OK)
+            data = response.json()
+            ids = [pack["meta"]["id"][0] for pack in data["packs"]]
+            return ids, data.get("next_cursor")
+
+        # Newest first
+        ids, cursor = list_packs(limit=2)
+        self.assertEqual(ids, ["f", "e"])
+        self.assertEqual(list_packs(limit=2, cursor=cursor), (["c", "a"], None))
+
+        # Most viewed first, newest first for the same number of views
+        ids, cursor = list_packs(sort="popular", limit=2)
+        self.assertEqual(ids, ["c", "e"])
+        self.assertEqual(
+            list_packs(sort="popular", limit=2, cursor=cursor), (["a", "f"], None)
+        )
+
+        # Filters
+        self.assertEqual(list_packs(tag="FOO", nsfw="false"), (["c", "a"], None))
+        self.assertEqual(list_packs(nsfw="true"), (["f"], None))
+
+        # Invalid cursors
+        for cursor in ("foo", encode_cursor([1, 2])):
+            response = self.client.get(reverse("api_v2:list_packs"), {"cursor": cursor})
+            self.assertEqual(response.status_code, HTTPStatus.BAD_REQUEST)
+
+    def test_search_packs(self, mocked_getpacklib):
+        mocked_getpacklib.return_value = TestPack("Cute cats", "Author", b"\x00")
+        Pack.objects.new(
+            pack_id="a" * 32, pack_key="b" * 64, status=PackStatus.ONLINE.name
+        )
+        Pack.objects.new(
+            pack_id="c" * 32, pack_key="d" * 64, status=PackStatus.IN_REVIEW.name
+        )
+
+        response = self.client.get(reverse("api_v2:search_packs"), {"q": "cute"})
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertEqual([pack["meta"]["id"] for pack in response.json()], ["a" * 32])
+
+        response = self.client.get(reverse("api_v2:search_packs"), {"q": "dogs"})
+        self.assertEqual(response.json(), [])
+
+        response = self.client.get(reverse("api_v2:search_packs"), {"q": ""})
+        self.assertEqual(response.status_code, HTTPStatus.UNPROCESSABLE_ENTITY)
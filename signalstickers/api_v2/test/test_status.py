@@ -44,6 +44,36 @@ class StatusAPITestCase(TestCase):
             },
         )
 
+        # Unchanged pack: 304
+        response = self.client.get(
+            reverse("api_v2:get_pack_status"),
+            {"id": "a" * 32, "key": "b" * 64},
+            HTTP_IF_NONE_MATCH=response["ETag"],
+        )
+        self.assertEqual(HTTPStatus.NOT_MODIFIED, response.status_code)
+        self.assertIn("max-age=10", response["Cache-Control"])
+
+        pack.status = PackStatus.REFUSED.name
+        pack.save()
+        response = self.client.get(
+            reverse("api_v2:get_pack_status"),
+            {"id": "a" * 32, "key": "b" * 64},
+            HTTP_IF_NONE_MATCH=response["ETag"],
+        )
+        self.assertEqual(HTTPStatus.OK, response.status_code)
+        self.assertEqual(response.json()["status"], PackStatus.REFUSED.name)
+
+        # Changes of packs not in the catalog change their status too
+        pack.status_comments = "Not a sticker pack"
+        pack.save()
+        response = self.client.get(
+            reverse("api_v2:get_pack_status"),
+            {"id": "a" * 32, "key": "b" * 64},
+            HTTP_IF_NONE_MATCH=response["ETag"],
+        )
+        self.assertEqual(HTTPStatus.OK, response.status_code)
+        self.assertEqual(response.json()["status_comments"], "Not a sticker pack")
+
     def test_status_pack_noexists(self, mocked_getpacklib):
         mocked_getpacklib.return_value = TestPack(
             "Pack title 1", "Pack author 1", b"\x00"
@@ -1,4 +1,6 @@
+from base64 import urlsafe_b64decode, urlsafe_b64encode
 from http import HTTPStatus
+import json
 
 from api_v2.schemas.errors import InvalidSecurityErrorResponse
 from core.services import check_contribution_request
@@ -18,3 +20,25 @@ def validate_securityanswer_or_die(
             HTTPStatus.BAD_REQUEST,
             sec_quest_invalid_reason,
         )
+
+
+def encode_cursor(keyset: list[int]) -> str:
+    """
+    Return an opaque pagination cursor for `keyset`
+    """
+    return urlsafe_b64encode(json.dumps(keyset).encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, length: int) -> list[int]:
+    """
+    Return the keyset encoded in `cursor`, which must contain `length` values.
+    Raise a `ValueError` if the cursor is invalid.
+    """
+    keyset = json.loads(urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+    if (
+        not isinstance(keyset, list)
+        or len(keyset) != length
+        or not all(isinstance(value, int) for value in keyset)
+    ):
+        raise ValueError("Invalid cursor")
+    return keyset
@@ -1,11 +1,18 @@
+import re
 from urllib.parse import parse_qsl, urlencode
 
 from core.models import Pack, PackStatus
+from core.thumbnails import get_sticker_thumbnails
+from django.conf import settings
 from django.contrib import admin
 from django.contrib.admin.options import HttpResponseRedirect, csrf_protect_m
+from django.core.exceptions import PermissionDenied
+from django.db.models import Q
+from django.http import Http404, HttpResponse
 from django.shortcuts import redirect
 from django.template.loader import render_to_string
-from django.urls import reverse
+from django.urls import path, reverse
+from django.utils.cache import patch_cache_control
 from django.utils.html import format_html
 from django.utils.safestring import mark_safe
 
@@ -52,9 +59,28 @@ class PackAdmin(admin.ModelAdmin):
         "animated",
         "_view",
     )
-    search_fields = ("title", "pack_id", "pack_key", "tags__name")
+    # Only shows the search box: searches are made by get_search_results()
+    search_fields = ("title",)
     list_filter = ("status", "original", "nsfw", "animated", "editorschoice")
 
+    def get_search_results(self, request, queryset, search_term):
+        # Title, tags and author are matched with the search index. Hex terms
+        # may also be the start of an id or a key (prefix match, indexed).
+        search_term = search_term.strip().lower()
+        if not search_term:
+            return queryset, False
+        matches = Pack.objects.search(search_term, queryset)
+        if not re.fullmatch(r"[a-f0-9]+", search_term):
+            return matches, False
+        return (
+            queryset.filter(
+                Q(pack_id__startswith=search_term)
+                | Q(pack_key__startswith=search_term)
+                | Q(id__in=matches.values("id"))
+            ),
+            False,
+        )
+
     #
     # Edit view
     #
@@ -173,6 +199,40 @@ class PackAdmin(admin.ModelAdmin):
             + f"?{params}"
         )
 
+    #
+    # Thumbnails
+    #
+
+    def get_urls(self):
+        return [
+            path(
+                "<path:object_id>/thumbnails/<int:sticker_id>/",
+                self.admin_site.admin_view(self.thumbnail_view),
+                name="core_pack_thumbnail",
+            ),
+        ] + super().get_urls()
+
+    def thumbnail_view(self, request, object_id, sticker_id):
+        """
+        Serve the thumbnail of a sticker (or of the cover) of the pack.
+        Thumbnails never change: browsers keep them (see
+        `settings.HTTP_CACHE_POLICIES["thumbnails"]`).
+        """
+        pack = self.get_object(request, object_id)
+        if pack is None:
+            raise Http404
+        if not self.has_view_permission(request, pack):
+            raise PermissionDenied
+
+        thumbnails = get_sticker_thumbnails()
+        thumbnail = thumbnails.get(pack.pack_id, pack.pack_key, sticker_id)
+        if thumbnail is None:
+            raise Http404
+
+        response = HttpResponse(thumbnail, content_type=thumbnails.content_type)
+        patch_cache_control(response, **settings.HTTP_CACHE_POLICIES["thumbnails"])
+        return response
+
     @csrf_protect_m
     def changeform_view(self, request, object_id=None, form_url="", extra_context=None):
         # Classic pack we need to approve automatically
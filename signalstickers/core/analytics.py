@@ -0,0 +1,319 @@
+"""
+Analytics ingestion. Depending on `settings.ANALYTICS_BUFFER["backend"]`, hits
+are either written to the DB as they come ("direct"), or aggregated in a buffer
+and written in bulk by a background thread ("memory": one buffer per worker;
+"file": a local queue file, shared by all the workers of the host).
+"""
+
+from abc import ABC, abstractmethod
+import atexit
+from collections import Counter
+import fcntl
+from functools import cache
+import logging
+import os
+from pathlib import Path
+import threading
+import uuid
+
+from core.catalog import get_catalog_version
+from core.models import Pack, SiteStat
+from django.conf import settings
+from django.db import connection, transaction
+
+logger = logging.getLogger("main")
+
+_known_packs = {"version": None, "ids": frozenset()}
+
+
+def is_known_pack(pack_id):
+    """
+    Return True if the pack exists in the DB. The list of packs is loaded once
+    per catalog version, so this does not hit the DB on the hot path.
+    """
+    version = get_catalog_version()
+    if _known_packs["version"] != version:
+        _known_packs["ids"] = frozenset(Pack.objects.values_list("pack_id", flat=True))
+        _known_packs["version"] = version
+    return pack_id in _known_packs["ids"]
+
+
+def write_analytics(pack_views, site_visits):
+    """
+    Write aggregated hits to the DB. `pack_views` maps (pack_id, month) to a
+    number of views, `site_visits` maps a month to a number of visits. All or
+    none of them are written, so that a failed flush can be retried.
+    """
+    with transaction.atomic():
+        if pack_views:
+            Pack.objects.bulk_increment_views(pack_views)
+        for month, visits in site_visits.items():
+            SiteStat.objects.increment_visits(month, visits)
+
+
+class DirectAnalytics:
+    """
+    No buffering: each hit is written to the DB.
+    """
+
+    def record_pack_view(self, pack_id, month):
+        return bool(Pack.objects.increment_views(pack_id, month))
+
+    def record_site_visit(self, month):
+        SiteStat.objects.increment_visits(month)
+
+    def flush(self):
+        return 0, 0
+
+
+class AnalyticsBuffer(ABC):
+    """
+    Base class for buffers. Subclasses store hits with `_push()`, and return all
+    the buffered hits with `_pop()`. Once they are written to the DB, `_done()`
+    is called; if the write failed, `_restore()` is called instead.
+    """
+
+    def __init__(self, flush_interval, flush_threshold):
+        self.flush_interval = flush_interval
+        self.flush_threshold = flush_threshold
+        self._nb_pending = 0
+        # Held briefly, to update the buffered hits and their count
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._flush_lock = threading.Lock()
+        self._flusher = None
+
+    @abstractmethod
+    def _push(self, pack_id, month):
+        """
+        Store a hit: a view of the pack `pack_id`, or a site visit if None.
+        """
+
+    @abstractmethod
+    def _pop(self):
+        """
+        Return all the buffered hits, as (pack views, site visits): see
+        `write_analytics()`.
+        """
+
+    def _done(self):
+        pass
+
+    def _restore(self, pack_views, site_visits):
+        pass
+
+    def record_pack_view(self, pack_id, month):
+        """
+        Buffer a view for the pack. Return False if the pack does not exist.
+        """
+        if not is_known_pack(pack_id):
+            return False
+        self._push(pack_id, month)
+        self._hit()
+        return True
+
+    def record_site_visit(self, month):
+        self._push(None, month)
+        self._hit()
+
+    def _hit(self):
+        if self._flusher is None:
+            self._start_flusher()
+        with self._lock:
+            self._nb_pending += 1
+            flush_due = self._nb_pending >= self.flush_threshold
+        if flush_due:
+            self._wakeup.set()
+
+    def flush(self):
+        """
+        Write all the buffered hits to the DB. Return the number of pack views
+        and site visits written.
+        """
+        with self._flush_lock:
+            with self._lock:
+                self._nb_pending = 0
+            pack_views, site_visits = self._pop()
+            try:
+                write_analytics(pack_views, site_visits)
+            except Exception:
+                self._restore(pack_views, site_visits)
+                raise
+            self._done()
+        return sum(pack_views.values()), sum(site_visits.values())
+
+    def _start_flusher(self):
+        with self._flush_lock:
+            if self._flusher is not None:
+                return
+            self._flusher = threading.Thread(
+                target=self._run_flusher, name="analytics-flusher", daemon=True
+            )
+            self._flusher.start()
+
+    def _run_flusher(self):
+        while True:
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            try:
+                self.flush()
+            except Exception:  # pylint: disable=broad-except
+                logger.exception("Error when flushing analytics")
+            finally:
+                connection.close()
+
+
+class MemoryAnalyticsBuffer(AnalyticsBuffer):
+    """
+    Aggregate hits in memory, per worker.
+    """
+
+    def __init__(self, flush_interval, flush_threshold):
+        super().__init__(flush_interval, flush_threshold)
+        self._pack_views = Counter()
+        self._site_visits = Counter()
+
+    def _push(self, pack_id, month):
+        with self._lock:
+            if pack_id:
+                self._pack_views[(pack_id, month)] += 1
+            else:
+                self._site_visits[month] += 1
+
+    def _pop(self):
+        with self._lock:
+            pack_views, self._pack_views = self._pack_views, Counter()
+            site_visits, self._site_visits = self._site_visits, Counter()
+        return pack_views, site_visits
+
+    def _restore(self, pack_views, site_visits):
+        with self._lock:
+            self._pack_views.update(pack_views)
+            self._site_visits.update(site_visits)
+
+
+class FileAnalyticsBuffer(AnalyticsBuffer):
+    """
+    Append hits to a local queue file (one line per hit). To flush, the queue is
+    renamed, so that new hits go to a new file, and read under an exclusive
+    lock: writers hold a shared lock while appending. A file that could not be
+    written to the DB is kept, and retried on the next flush.
+    """
+
+    def __init__(self, path, flush_interval, flush_threshold):
+        super().__init__(flush_interval, flush_threshold)
+        self.path = Path(path)
+        self._claimed = []  # (fd, path) of the files being flushed
+
+    def _push(self, pack_id, month):
+        line = f"{pack_id or ''}|{month}\n".encode()
+        while True:
+            fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o600)
+            try:
+                fcntl.flock(fd, fcntl.LOCK_SH)
+                # The file may have been taken by a flush in the meantime
+                if os.fstat(fd).st_ino == os.stat(self.path).st_ino:
+                    os.write(fd, line)
+                    return
+            except FileNotFoundError:
+                pass
+            finally:
+                os.close(fd)
+
+    def _claim(self, queue_file):
+        """
+        Lock `queue_file` and return its fd, or None if it is being flushed, or
+        has already been flushed, by another process.
+        """
+        try:
+            fd = os.open(queue_file, os.O_RDONLY)
+        except FileNotFoundError:
+            return None
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            os.close(fd)
+            return None
+        if os.fstat(fd).st_nlink == 0:
+            os.close(fd)
+            return None
+        return fd
+
+    def _pop(self):
+        pack_views, site_visits = Counter(), Counter()
+
+        try:
+            os.rename(
+                self.path,
+                self.path.with_name(f"{self.path.name}.{uuid.uuid4().hex}.flushing"),
+            )
+        except FileNotFoundError:
+            pass
+
+        for queue_file in self.path.parent.glob(f"{self.path.name}.*.flushing"):
+            fd = self._claim(queue_file)
+            if fd is None:
+                continue
+            self._claimed.append((fd, queue_file))
+
+            with os.fdopen(os.dup(fd), "r", encoding="utf-8") as f_in:
+                for line in f_in:
+                    pack_id, _, month = line.rstrip("\n").partition("|")
+                    if pack_id:
+                        pack_views[(pack_id, month)] += 1
+                    elif month:
+                        site_visits[month] += 1
+
+        return pack_views, site_visits
+
+    def _release(self, delete):
+        for fd, queue_file in self._claimed:
+            if delete:
+                os.unlink(queue_file)
+            os.close(fd)
+        self._claimed = []
+
+    def _done(self):
+        self._release(delete=True)
+
+    def _restore(self, pack_views, site_visits):
+        self._release(delete=False)
+
+
+@cache
+def get_analytics_buffer():
+    """
+    Return the analytics buffer of the current process.
+    """
+    return analytics_buffer_from_settings()
+
+
+def analytics_buffer_from_settings():
+    conf = settings.ANALYTICS_BUFFER
+    if conf["backend"] == "memory":
+        buffer = MemoryAnalyticsBuffer(conf["flush_interval"], conf["flush_threshold"])
+    elif conf["backend"] == "file":
+        buffer = FileAnalyticsBuffer(
+            conf["path"], conf["flush_interval"], conf["flush_threshold"]
+        )
+    else:
+        return DirectAnalytics()
+
+    # Do not lose buffered hits when the worker is stopped
+    atexit.register(buffer.flush)
+    return buffer
+
+
+def record_pack_view(pack_id, month):
+    """
+    Record a view for the pack `pack_id`. Return False if the pack does not
+    exist.
+    """
+    return get_analytics_buffer().record_pack_view(pack_id, month)
+
+
+def record_site_visit(month):
+    """
+    Record a visit of the homepage.
+    """
+    get_analytics_buffer().record_site_visit(month)
@@ -5,6 +5,10 @@ from django.contrib.admin import apps
 class CoreConfig(AppConfig):
     name = "core"
 
+    def ready(self):
+        # pylint: disable=import-outside-toplevel,unused-import
+        from core import signals
+
 
 class CustomAdmin(apps.AdminConfig):
     default_site = "core.adminsite.CustomAdmin"
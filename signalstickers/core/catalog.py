@@ -0,0 +1,163 @@
+from dataclasses import dataclass
+from datetime import datetime
+from datetime import timezone as dt_timezone
+import hashlib
+import threading
+import time
+import uuid
+
+from core.cdn import schedule_purge
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+CATALOG_VERSION_KEY = "catalog:version"
+CATALOG_MODIFIED_KEY = "catalog:modified"
+STATUS_VERSION_KEY = "catalog:status:version"
+STATUS_MODIFIED_KEY = "catalog:status:modified"
+
+# Snapshots are rendered at most once per catalog version and per process, and
+# kept in memory: they are too big to be (un)pickled from the cache on every
+# request. Only the (tiny) version marker is shared between workers.
+_snapshots = {}
+_snapshots_lock = threading.Lock()
+
+
+@dataclass(frozen=True)
+class CatalogSnapshot:
+    name: str
+    version: str
+    content: bytes
+    etag: str
+    built_at: datetime
+
+
+def get_catalog_version():
+    """
+    Return the current catalog version. The version changes each time a Pack or
+    a Tag is modified.
+    """
+    return cache.get_or_set(CATALOG_VERSION_KEY, lambda: uuid.uuid4().hex, None)
+
+
+def get_catalog_last_modified():
+    """
+    Return the (aware) datetime of the last modification of the catalog: the
+    last change of a Pack or a Tag, or the start of the current stats period
+    (see `get_stats_period()`), whichever is the latest.
+    """
+    modified = cache.get_or_set(CATALOG_MODIFIED_KEY, time.time, None)
+    period_start = get_stats_period() * settings.CATALOG_SNAPSHOT_TIMEOUT
+    return datetime.fromtimestamp(max(modified, period_start), tz=dt_timezone.utc)
+
+
+def get_stats_period():
+    """
+    Return the number of the current stats period. Views counters are not a
+    catalog change: catalogs show the views of the beginning of the period, and
+    are refreshed at the next one (every CATALOG_SNAPSHOT_TIMEOUT seconds).
+    """
+    return int(time.time() // settings.CATALOG_SNAPSHOT_TIMEOUT)
+
+
+def get_status_version():
+    """
+    Return the current version of the statuses of the packs. It changes with
+    the catalog version, and each time a pack not in the catalog (contribution,
+    review) is modified.
+    """
+    return cache.get_or_set(STATUS_VERSION_KEY, lambda: uuid.uuid4().hex, None)
+
+
+def get_status_last_modified():
+    """
+    Return the (aware) datetime of the last change of the statuses of the packs.
+    """
+    modified = cache.get_or_set(STATUS_MODIFIED_KEY, time.time, None)
+    return datetime.fromtimestamp(modified, tz=dt_timezone.utc)
+
+
+def _bump_status_version():
+    cache.set_many(
+        {STATUS_VERSION_KEY: uuid.uuid4().hex, STATUS_MODIFIED_KEY: time.time()},
+        None,
+    )
+
+
+def bump_status_version():
+    """
+    Mark the statuses of the packs as modified, without changing the catalog:
+    for the packs not in the catalog. Bumped again once the current transaction
+    is committed, like the catalog version.
+    """
+    _bump_status_version()
+    transaction.on_commit(_bump_status_version)
+
+
+def _bump_catalog_version():
+    now = time.time()
+    cache.set_many(
+        {
+            CATALOG_VERSION_KEY: uuid.uuid4().hex,
+            CATALOG_MODIFIED_KEY: now,
+            STATUS_VERSION_KEY: uuid.uuid4().hex,
+            STATUS_MODIFIED_KEY: now,
+        },
+        None,
+    )
+
+
+def bump_catalog_version():
+    """
+    Mark the catalog (and the statuses of the packs) as modified: all snapshots
+    will be rebuilt on their next access. The version is bumped again once the current transaction is
+    committed, so that a snapshot built from uncommitted data can not survive.
+    The catalogs cached by the CDN are purged then.
+    """
+    _bump_catalog_version()
+    transaction.on_commit(_bump_catalog_version)
+    schedule_purge()
+
+
+def build_catalog_snapshot(name, version=None):
+    """
+    Render the catalog `name` (see `settings.CATALOG_RENDERERS`) and return it
+    as a `CatalogSnapshot`.
+    """
+    version = version or get_catalog_version()
+    content = import_string(settings.CATALOG_RENDERERS[name])()
+    snapshot = CatalogSnapshot(
+        name=name,
+        version=version,
+        content=content,
+        etag=hashlib.sha256(content).hexdigest()[:32],
+        built_at=timezone.now(),
+    )
+    _snapshots[name] = snapshot
+    return snapshot
+
+
+def _is_fresh(snapshot, version):
+    if snapshot is None or snapshot.version != version:
+        return False
+    built_period = snapshot.built_at.timestamp() // settings.CATALOG_SNAPSHOT_TIMEOUT
+    return built_period == get_stats_period()
+
+
+def get_catalog_snapshot(name):
+    """
+    Return an up-to-date snapshot of the catalog `name`, building it if needed.
+    """
+    version = get_catalog_version()
+    snapshot = _snapshots.get(name)
+    if _is_fresh(snapshot, version):
+        return snapshot
+
+    with _snapshots_lock:
+        # Another thread may have rebuilt it while we were waiting
+        snapshot = _snapshots.get(name)
+        if _is_fresh(snapshot, version):
+            return snapshot
+        return build_catalog_snapshot(name, version)
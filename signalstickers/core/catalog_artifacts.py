@@ -0,0 +1,158 @@
+"""
+Catalogs written to disk as static files, so that nginx or the CDN can serve
+them without Python: `packs.<hash>.json`, precompressed as `packs.<hash>.json.gz`
+and `packs.<hash>.json.br`, in `settings.CATALOG_ARTIFACTS["path"]/<catalog>/`.
+Files are named after their content and written atomically: once published, a
+file never changes. The API then redirects to the files of the current catalog
+version (see `artifact_response()`).
+"""
+
+from dataclasses import dataclass
+import gzip
+import logging
+import os
+from pathlib import Path
+import threading
+import uuid
+
+import brotli
+from core.catalog import get_catalog_snapshot, get_catalog_version, get_stats_period
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection
+from django.http import HttpResponse, HttpResponseRedirect
+
+logger = logging.getLogger("main")
+
+ARTIFACT_KEY = "catalog:artifact:{}"
+BUILD_LOCK_KEY = "catalog:artifact:{}:building"
+BUILD_LOCK_TIMEOUT = 5 * 60
+
+# Catalogs written as files: the JSON lists, not the columnar formats
+ARTIFACT_CATALOGS = ("v1", "v2")
+
+
+@dataclass(frozen=True)
+class CatalogArtifact:
+    name: str
+    version: str
+    period: int
+    filename: str
+
+    @property
+    def url(self):
+        base_url = settings.CATALOG_ARTIFACTS["url"].rstrip("/")
+        return f"{base_url}/{self.name}/{self.filename}"
+
+    def is_fresh(self):
+        current = (get_catalog_version(), get_stats_period())
+        return (self.version, self.period) == current
+
+
+def _write_atomic(path, content):
+    if path.exists():  # same name, same content: only mark it as built again
+        os.utime(path)
+        return
+    tmp_path = path.with_name(f"{path.name}.{uuid.uuid4().hex}.tmp")
+    tmp_path.write_bytes(content)
+    os.replace(tmp_path, path)
+
+
+def _remove_old_builds(directory, keep):
+    """
+    Remove the files of the builds older than the `keep` most recent ones.
+    """
+    builds = {}
+    for path in directory.glob("packs.*.json*"):
+        if path.name.endswith(".tmp"):
+            continue
+        digest = path.name.split(".")[1]
+        builds[digest] = max(builds.get(digest, 0), path.stat().st_mtime)
+
+    for digest in sorted(builds, key=builds.get, reverse=True)[keep:]:
+        for path in directory.glob(f"packs.{digest}.json*"):
+            path.unlink(missing_ok=True)
+
+
+def build_catalog_artifact(name):
+    """
+    Write the files of the catalog `name` (see `settings.CATALOG_RENDERERS`),
+    and publish them. Return the `CatalogArtifact`.
+    """
+    snapshot = get_catalog_snapshot(name)
+    directory = Path(settings.CATALOG_ARTIFACTS["path"]) / name
+    directory.mkdir(parents=True, exist_ok=True)
+    filename = f"packs.{snapshot.etag[:16]}.json"
+
+    # The precompressed files first: they must be there once the JSON is
+    content = snapshot.content
+    _write_atomic(
+        directory / f"{filename}.gz", gzip.compress(content, compresslevel=9, mtime=0)
+    )
+    _write_atomic(directory / f"{filename}.br", brotli.compress(content))
+    _write_atomic(directory / filename, content)
+
+    artifact = CatalogArtifact(
+        name=name,
+        version=snapshot.version,
+        period=int(snapshot.built_at.timestamp() // settings.CATALOG_SNAPSHOT_TIMEOUT),
+        filename=filename,
+    )
+    cache.set(ARTIFACT_KEY.format(name), artifact, None)
+    _remove_old_builds(directory, settings.CATALOG_ARTIFACTS["keep"])
+    return artifact
+
+
+def schedule_artifact_build(name):
+    """
+    Build the files of the catalog `name` in a background thread, unless they
+    are already being built (by any process).
+    """
+    lock_key = BUILD_LOCK_KEY.format(name)
+    if not cache.add(lock_key, True, BUILD_LOCK_TIMEOUT):
+        return
+
+    def build():
+        try:
+            build_catalog_artifact(name)
+        except Exception:  # pylint: disable=broad-except
+            logger.exception("Error when building the catalog artifact %s", name)
+        finally:
+            cache.delete(lock_key)
+            connection.close()
+
+    threading.Thread(target=build, name=f"catalog-{name}", daemon=True).start()
+
+
+def get_catalog_artifact(name):
+    """
+    Return the `CatalogArtifact` of the catalog `name` if it is up to date, or
+    None (and schedule a new build).
+    """
+    artifact = cache.get(ARTIFACT_KEY.format(name))
+    if artifact is not None and artifact.is_fresh():
+        return artifact
+    schedule_artifact_build(name)
+    return None
+
+
+def artifact_response(name):
+    """
+    Return a response handing the catalog `name` over to its static files, as
+    configured in `settings.CATALOG_ARTIFACTS["serve"]`. Return None if the
+    catalog must be served by the API: artifacts disabled, or not up to date.
+    """
+    serve = settings.CATALOG_ARTIFACTS["serve"]
+    if not serve:
+        return None
+    artifact = get_catalog_artifact(name)
+    if artifact is None:
+        return None
+
+    if serve == "redirect":
+        return HttpResponseRedirect(artifact.url)
+    # Empty body: nginx serves the file, already serialized, in place
+    # pylint: disable-next=http-response-with-content-type-json
+    response = HttpResponse(content_type="application/json; charset=utf-8")
+    response["X-Accel-Redirect"] = artifact.url
+    return response
@@ -0,0 +1,239 @@
+"""
+Targeted purges of the CDN (Cloudflare). Instead of purging the whole zone,
+only the cached URLs affected by a change are purged: the catalogs and the
+feeds for any change of a Pack or a Tag, plus the status of the packs changed.
+"""
+
+import atexit
+from functools import cache
+import logging
+import threading
+import time
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.core.cache import cache as django_cache
+from django.db import transaction
+from django.urls import reverse
+from django.utils import timezone
+import requests
+
+logger = logging.getLogger("main")
+
+# Cloudflare accepts at most 30 URLs per purge request
+PURGE_BATCH_SIZE = 30
+
+LAST_AUTO_PURGE_KEY = "cdn:last_auto_purge"
+
+
+class CdnPurgeError(Exception):
+    pass
+
+
+def cloudflare_purge(data):
+    """
+    Send a purge request (`data`, see Cloudflare's `purge_cache`) for the zone
+    of `settings.CLOUDFLARE_CONF`. Return the response text, or raise a
+    `CdnPurgeError`.
+    """
+    url = (
+        f'{settings.CDN_PURGE["api_base"]}/zones/'
+        f'{settings.CLOUDFLARE_CONF["zone_id"]}/purge_cache'
+    )
+    headers = {"Authorization": f'Bearer {settings.CLOUDFLARE_CONF["token"]}'}
+    try:
+        resp = requests.post(url, json=data, headers=headers, timeout=45)
+    except requests.RequestException as exc:
+        raise CdnPurgeError(str(exc)) from exc
+    if resp.status_code not in range(200, 300):
+        raise CdnPurgeError(resp.text)
+    return resp.text
+
+
+def _public_url(path):
+    return settings.CDN_PURGE["public_url"].rstrip("/") + path
+
+
+def catalog_urls():
+    """
+    Return the cached URLs showing the whole catalog.
+    """
+    return {
+        _public_url(reverse("api_v1:packs")),
+        _public_url(reverse("api_v2:get_all_packs")),
+        _public_url(reverse("api_v2:get_all_packs") + "?role_preload=true"),
+        _public_url(reverse("api_v2:get_all_packs") + "?format=columnar"),
+        _public_url(reverse("api_v2:get_all_packs") + "?format=msgpack"),
+        _public_url(reverse("feed_rss")),
+        _public_url(reverse("feed_atom")),
+    }
+
+
+def pack_urls(pack_id, pack_key, in_catalog=True):
+    """
+    Return the cached URLs showing the pack `pack_id`: its status, plus the
+    catalogs and the feeds if it is (or was) in the catalog.
+    """
+    status_query = urlencode({"id": pack_id, "key": pack_key})
+    status_url = _public_url(f'{reverse("api_v2:get_pack_status")}?{status_query}')
+    if not in_catalog:
+        return {status_url}
+    return catalog_urls() | {status_url}
+
+
+def purge_urls(urls):
+    """
+    Purge `urls` from the CDN, PURGE_BATCH_SIZE at a time. Errors are logged;
+    return the URLs that could not be purged.
+    """
+    urls = sorted(urls)
+    failed = []
+    for start in range(0, len(urls), PURGE_BATCH_SIZE):
+        batch = urls[start : start + PURGE_BATCH_SIZE]
+        try:
+            cloudflare_purge({"files": batch})
+        except CdnPurgeError as exc:
+            logger.error("Error when purging %d URLs from the CDN: %s", len(batch), exc)
+            failed.extend(batch)
+    return failed
+
+
+class PurgePlanner:
+    """
+    Collect the URLs affected by changes, to purge them all at once. Purges are
+    debounced: `flush()` only purges once `debounce` seconds have passed since
+    the first change collected, so that a burst of changes (e.g. a batch of
+    approvals) is purged with a few requests.
+    """
+
+    def __init__(self, debounce=None):
+        if debounce is None:
+            debounce = settings.CDN_PURGE["debounce"]
+        self.debounce = debounce
+        self._urls = set()
+        self._first_change = None
+        self._lock = threading.Lock()
+
+    def add_urls(self, urls):
+        with self._lock:
+            if not self._urls:
+                self._first_change = time.monotonic()
+            self._urls.update(urls)
+
+    def add_catalog(self):
+        self.add_urls(catalog_urls())
+
+    def add_pack(self, pack):
+        self.add_urls(pack_urls(pack.pack_id, pack.pack_key, pack.is_in_catalog()))
+
+    def add_tag(self, _):
+        # Tags are shown in the catalogs and the feeds, not in the statuses
+        self.add_catalog()
+
+    @property
+    def pending(self):
+        with self._lock:
+            return sorted(self._urls)
+
+    def is_due(self):
+        with self._lock:
+            return bool(self._urls) and (
+                time.monotonic() - self._first_change >= self.debounce
+            )
+
+    def flush(self, force=False):
+        """
+        Purge the URLs collected, if the debounce delay has passed (or if
+        `force`). URLs that could not be purged are kept for the next flush.
+        Return the URLs purged.
+        """
+        if not force and not self.is_due():
+            return []
+        with self._lock:
+            urls, self._urls = self._urls, set()
+
+        failed = purge_urls(urls)
+        if failed:
+            self.add_urls(failed)
+        return sorted(set(urls) - set(failed))
+
+
+class BackgroundPurger(PurgePlanner):
+    """
+    Planner flushed by a background thread: URLs are purged `debounce` seconds
+    after a change, together with all the changes made meanwhile. Successful
+    purges are recorded in the cache (see `get_last_auto_purge()`).
+    """
+
+    def __init__(self, debounce=None):
+        super().__init__(debounce)
+        self._wakeup = threading.Event()
+        self._flusher = None
+
+    def add_urls(self, urls):
+        super().add_urls(urls)
+        if self._flusher is None:
+            self._start_flusher()
+        self._wakeup.set()
+
+    def _start_flusher(self):
+        with self._lock:
+            if self._flusher is not None:
+                return
+            self._flusher = threading.Thread(
+                target=self._run_flusher, name="cdn-purger", daemon=True
+            )
+            self._flusher.start()
+
+    def _run_flusher(self):
+        while True:
+            self._wakeup.wait()
+            time.sleep(self.debounce)
+            self._wakeup.clear()
+            try:
+                self.flush(force=True)
+            except Exception:  # pylint: disable=broad-except
+                logger.exception("Error when purging the CDN")
+
+    def flush(self, force=False):
+        purged = super().flush(force)
+        if purged and not self.pending:
+            django_cache.set(
+                LAST_AUTO_PURGE_KEY,
+                {"time": timezone.now(), "nb_urls": len(purged)},
+                None,
+            )
+        return purged
+
+
+@cache
+def get_purge_planner():
+    """
+    Return the background purger of the current process.
+    """
+    purger = BackgroundPurger()
+    # Do not lose pending purges when the process is stopped
+    atexit.register(purger.flush, force=True)
+    return purger
+
+
+def schedule_purge(pack=None):
+    """
+    Purge the catalogs and the feeds, plus the URLs of `pack` if given, once
+    the current transaction is committed. Purges are sent in the background,
+    and only if `settings.CDN_PURGE["automatic"]`.
+    """
+    if not settings.CDN_PURGE["automatic"]:
+        return
+    if pack is None:
+        urls = catalog_urls()
+    else:
+        urls = pack_urls(pack.pack_id, pack.pack_key, pack.is_in_catalog())
+    transaction.on_commit(lambda: get_purge_planner().add_urls(urls))
+
+
+def get_last_auto_purge():
+    """
+    Return the last automatic purge, as a dict (time, nb_urls), or None.
+    """
+    return django_cache.get(LAST_AUTO_PURGE_KEY)
@@ -1,12 +1,7 @@
-from core.models import AdminAction, Pack, Report
+from core.status_summary import get_status_summary
 
 
 def admin_navbar(request):
     if request.user.is_staff:
-        return {
-            "packs_to_review": Pack.objects.in_review_count(),
-            "packs_escalated": Pack.objects.escalated_count(),
-            "reports_to_process": Report.objects.to_process_count(),
-            "caches_dirty": AdminAction.caches_dirty(),
-        }
+        return get_status_summary()
     return {}
@@ -0,0 +1,76 @@
+"""
+Files cached on disk, bounded in size: once the cache is full, the least
+recently used files are evicted first.
+"""
+
+import os
+from pathlib import Path
+import time
+import uuid
+
+# Once the cache is full, evict files until it is below this ratio of its size
+EVICTION_TARGET = 0.9
+
+
+def touch(path):
+    # The mtime is the last use of the file. Set it from a precise clock, so
+    # that files used one after the other do not get the same (coarse) mtime.
+    now = time.time_ns()
+    os.utime(path, ns=(now, now))
+
+
+class DiskCache:
+    """
+    Base of the caches of files in the directory `path`. Files are written with
+    `_write()`, and their mtime is their last use (see `touch()`).
+    """
+
+    def __init__(self, path, max_size):
+        self.path = Path(path)
+        self.max_size = max_size
+        self._size = None  # approximate size of the cache, computed lazily
+
+    def _write(self, path, content):
+        if self._size is None:
+            self._size = sum(size for _, size, _ in self._files())
+
+        # Atomic: readers never see a partial file
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_name(f"{path.name}.{uuid.uuid4().hex}.tmp")
+        tmp_path.write_bytes(content)
+        os.replace(tmp_path, path)
+        touch(path)
+        self._size += len(content)
+
+    def _files(self):
+        """
+        Yield (mtime, size, path) for each file of the cache.
+        """
+        for dirpath, _, filenames in os.walk(self.path):
+            for filename in filenames:
+                if filename.endswith(".tmp"):
+                    continue
+                path = Path(dirpath) / filename
+                try:
+                    stat = path.stat()
+                except FileNotFoundError:
+                    continue
+                yield stat.st_mtime, stat.st_size, path
+
+    def evict(self):
+        """
+        Remove the least recently used files, until the cache is below its
+        maximum size. Return the number of files removed.
+        """
+        files = sorted(self._files())
+        self._size = sum(size for _, size, _ in files)
+        target = self.max_size * EVICTION_TARGET
+        nb_removed = 0
+
+        for _, size, path in files:
+            if self._size <= target:
+                break
+            path.unlink(missing_ok=True)
+            self._size -= size
+            nb_removed += 1
+        return nb_removed
@@ -0,0 +1,68 @@
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import json
+import threading
+
+
+class FakeCloudflare:
+    """
+    Local stand-in for the Cloudflare API, to test the CDN purges offline. Set
+    `settings.CDN_PURGE["api_base"]` to `api_base`. Purge requests are recorded
+    in `requests` (path, authorization header, JSON body), and answered with
+    `status` (200 by default). `on_request`, if set, is called with each one.
+    """
+
+    def __init__(self, port=0, on_request=None):
+        self.requests = []
+        self.status = 200
+        self.on_request = on_request
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):  # pylint: disable=invalid-name
+                body = self.rfile.read(int(self.headers["Content-Length"]))
+                request = {
+                    "path": self.path,
+                    "authorization": self.headers["Authorization"],
+                    "json": json.loads(body),
+                }
+                fake.requests.append(request)
+                if fake.on_request:
+                    fake.on_request(request)
+
+                response = json.dumps(
+                    {
+                        "success": fake.status == 200,
+                        "errors": [],
+                        "messages": [],
+                        "result": {"id": "fake"},
+                    }
+                ).encode()
+                self.send_response(fake.status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(response)))
+                self.end_headers()
+                self.wfile.write(response)
+
+            def log_message(self, *_):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", port), Handler)
+        self.api_base = f"http://127.0.0.1:{self.server.server_port}/client/v4"
+
+    def start(self):
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *_):
+        self.stop()
+
+    @property
+    def purged_files(self):
+        return [url for req in self.requests for url in req["json"].get("files", [])]
@@ -1,6 +1,8 @@
+from core.http_cache import catalog_cache
 from core.models.pack import Pack
 from core.utils import is_url
 from django.contrib.syndication.views import Feed
+from django.utils.decorators import method_decorator
 from django.utils.feedgenerator import Atom1Feed
 
 
@@ -11,6 +13,10 @@ class RssPackFeed(Feed):
 
     description_template = "feeds/item_description.html"
 
+    @method_decorator(catalog_cache("feeds"))
+    def __call__(self, request, *args, **kwargs):
+        return super().__call__(request, *args, **kwargs)
+
     def items(self):
         return Pack.objects.onlines()[:10]
 
@@ -0,0 +1,80 @@
+"""
+HTTP caching of the public read endpoints. Their responses only depend on the
+catalog: ETag and Last-Modified are derived from the catalog version, so that
+conditional requests are answered with a `304 Not Modified` before the view
+runs. The statuses of the packs also cover the packs not in the catalog, and
+have their own version. `Cache-Control` comes from the policies of
+`settings.HTTP_CACHE_POLICIES`.
+"""
+
+from functools import wraps
+import hashlib
+
+from core.catalog import (
+    get_catalog_last_modified,
+    get_catalog_version,
+    get_stats_period,
+    get_status_last_modified,
+    get_status_version,
+)
+from django.conf import settings
+from django.utils.cache import patch_cache_control
+from django.views.decorators.http import condition
+
+
+def catalog_etag(request, *_, **__):
+    """
+    Return the ETag of a response rendered from the catalog: it changes with the
+    catalog version, the stats period and the URL (query string included).
+    """
+    key = f"{get_catalog_version()}:{get_stats_period()}:{request.get_full_path()}"
+    return hashlib.sha256(key.encode()).hexdigest()[:32]
+
+
+def catalog_last_modified(*_, **__):
+    return get_catalog_last_modified()
+
+
+def status_etag(request, *_, **__):
+    """
+    Return the ETag of a pack status response: it changes with the status
+    version and the URL (query string included).
+    """
+    key = f"{get_status_version()}:{request.get_full_path()}"
+    return hashlib.sha256(key.encode()).hexdigest()[:32]
+
+
+def status_last_modified(*_, **__):
+    return get_status_last_modified()
+
+
+def catalog_cache(
+    policy, etag_func=catalog_etag, last_modified_func=catalog_last_modified
+):
+    """
+    Decorator for the views rendered from the catalog: answer the conditional
+    requests, and add the `Cache-Control` of `policy` to the responses.
+    """
+
+    def decorator(view):
+        conditional_view = condition(
+            etag_func=etag_func, last_modified_func=last_modified_func
+        )(view)
+
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            response = conditional_view(request, *args, **kwargs)
+            if response.status_code in (200, 304):
+                patch_cache_control(response, **settings.HTTP_CACHE_POLICIES[policy])
+            return response
+
+        return wrapper
+
+    return decorator
+
+
+def status_cache():
+    """
+    Decorator for the views showing the status of a pack (see `catalog_cache()`).
+    """
+    return catalog_cache("status", status_etag, status_last_modified)
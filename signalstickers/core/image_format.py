@@ -0,0 +1,166 @@
+"""
+Identification of the sticker images (PNG/APNG, GIF, WebP) from their structure.
+Only the headers of the chunks (or of the GIF blocks) are read: the payloads are
+skipped, never scanned, so that compressed data can not be mistaken for a chunk.
+"""
+
+from dataclasses import dataclass
+import struct
+from typing import Optional
+
+PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+GIF_SIGNATURES = (b"GIF87a", b"GIF89a")
+
+# Flag of the VP8X chunk set for animated WebP
+WEBP_ANIMATION_FLAG = 0x02
+
+
+@dataclass(frozen=True)
+class ImageInfo:
+    format: str  # "png", "gif", "webp" or "unknown"
+    animated: bool = False
+    frames: int = 1
+    width: Optional[int] = None
+    height: Optional[int] = None
+
+    @property
+    def extension(self):
+        return "bin" if self.format == "unknown" else self.format
+
+
+UNKNOWN_IMAGE = ImageInfo("unknown", frames=0)
+
+
+def inspect_image(data):
+    """
+    Return the `ImageInfo` of the image `data` (bytes). Images of an unknown
+    format, or too truncated to read their header, are "unknown".
+    """
+    data = memoryview(data)
+    try:
+        if data[:8] == PNG_SIGNATURE:
+            return _inspect_png(data)
+        if data[:6] in GIF_SIGNATURES:
+            return _inspect_gif(data)
+        if data[:4] == b"RIFF" and data[8:12] == b"WEBP":
+            return _inspect_webp(data)
+    except (IndexError, struct.error):
+        pass
+    return UNKNOWN_IMAGE
+
+
+def _inspect_png(data):
+    """
+    Walk the chunks until the image data: the acTL chunk of the APNG must come
+    before it, and holds the number of frames.
+    """
+    width = height = None
+    nb_frames = None
+    pos = len(PNG_SIGNATURE)
+    while pos + 8 <= len(data):
+        length, chunk_type = struct.unpack_from(">I4s", data, pos)
+        if chunk_type == b"IHDR":
+            width, height = struct.unpack_from(">II", data, pos + 8)
+        elif chunk_type == b"acTL":
+            (nb_frames,) = struct.unpack_from(">I", data, pos + 8)
+        elif chunk_type in (b"IDAT", b"IEND"):
+            break
+        pos += 12 + length  # length, type, data, CRC
+
+    if nb_frames is None:
+        return ImageInfo("png", width=width, height=height)
+    return ImageInfo("png", animated=True, frames=nb_frames, width=width, height=height)
+
+
+def _skip_sub_blocks(data, pos):
+    """
+    Return the position following the data sub-blocks starting at `pos`.
+    """
+    while data[pos]:
+        pos += data[pos] + 1
+    return pos + 1
+
+
+def _inspect_gif(data):
+    """
+    Walk the blocks to count the frames (image descriptors). Frames of truncated
+    images are counted up to the truncation.
+    """
+    width, height, flags = struct.unpack_from("<HHB", data, 6)
+    pos = 13
+    if flags & 0x80:  # global color table
+        pos += 3 * 2 ** ((flags & 0x07) + 1)
+
+    nb_frames = 0
+    try:
+        while data[pos] != 0x3B:  # trailer
+            if data[pos] == 0x21:  # extension: label, sub-blocks
+                pos = _skip_sub_blocks(data, pos + 2)
+            elif data[pos] == 0x2C:  # image descriptor
+                nb_frames += 1
+                flags = data[pos + 9]
+                pos += 10
+                if flags & 0x80:  # local color table
+                    pos += 3 * 2 ** ((flags & 0x07) + 1)
+                pos = _skip_sub_blocks(data, pos + 1)  # LZW code size, sub-blocks
+            else:
+                break
+    except IndexError:
+        pass
+
+    return ImageInfo(
+        "gif", animated=nb_frames > 1, frames=nb_frames, width=width, height=height
+    )
+
+
+def _uint24(data, pos):
+    return data[pos] | data[pos + 1] << 8 | data[pos + 2] << 16
+
+
+def _bitstream_size(chunk_type, data, pos):
+    """
+    Return the (width, height) of the VP8 (lossy) or VP8L (lossless) bitstream
+    starting at `pos`.
+    """
+    if chunk_type == b"VP8L":
+        # Signature byte, then 14 bits for each dimension (minus one)
+        (bits,) = struct.unpack_from("<I", data, pos + 1)
+        return (bits & 0x3FFF) + 1, (bits >> 14 & 0x3FFF) + 1
+    # Frame tag (3 bytes), start code (3 bytes), then 14 bits for each dimension
+    width, height = struct.unpack_from("<HH", data, pos + 6)
+    return width & 0x3FFF, height & 0x3FFF
+
+
+def _inspect_webp(data):
+    """
+    Walk the RIFF chunks: the dimensions are in the VP8X chunk (extended format)
+    or in the header of the bitstream (VP8, VP8L), and each frame of an animated
+    WebP is in an ANMF chunk.
+    """
+    width = height = None
+    animated = False
+    nb_frames = 0
+    pos = 12
+    while pos + 8 <= len(data):
+        chunk_type, length = struct.unpack_from("<4sI", data, pos)
+        payload = pos + 8
+        if chunk_type == b"VP8X":
+            flags = data[payload]
+            animated = bool(flags & WEBP_ANIMATION_FLAG)
+            width = _uint24(data, payload + 4) + 1
+            height = _uint24(data, payload + 7) + 1
+        elif chunk_type == b"ANIM":
+            animated = True
+        elif chunk_type == b"ANMF":
+            nb_frames += 1
+        elif chunk_type in (b"VP8 ", b"VP8L") and width is None:
+            width, height = _bitstream_size(chunk_type, data, payload)
+        pos = payload + length + (length & 1)  # chunks are padded to an even size
+
+    return ImageInfo(
+        "webp",
+        animated=animated,
+        frames=max(nb_frames, 1),
+        width=width,
+        height=height,
+    )
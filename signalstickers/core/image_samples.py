@@ -0,0 +1,89 @@
+"""
+Sample images, valid enough for `core.image_format` to inspect them.
+"""
+
+import os
+import struct
+import zlib
+
+
+def _png_chunk(chunk_type, data):
+    return (
+        struct.pack(">I", len(data))
+        + chunk_type
+        + data
+        + struct.pack(">I", zlib.crc32(chunk_type + data))
+    )
+
+
+def make_png(width=512, height=512, frames=1, frame_size=16):
+    """
+    Return a PNG, or an APNG if `frames` > 1. Each frame holds `frame_size`
+    random bytes as image data.
+    """
+    ihdr = struct.pack(">IIBBBBB", width, height, 8, 6, 0, 0, 0)
+    chunks = [_png_chunk(b"IHDR", ihdr)]
+    if frames > 1:
+        chunks.append(_png_chunk(b"acTL", struct.pack(">II", frames, 0)))
+    for frame in range(frames):
+        if frames > 1:
+            fctl = struct.pack(
+                ">IIIIIHHBB", 2 * frame, width, height, 0, 0, 1, 10, 0, 0
+            )
+            chunks.append(_png_chunk(b"fcTL", fctl))
+        if frame == 0:
+            chunks.append(_png_chunk(b"IDAT", os.urandom(frame_size)))
+        else:
+            seq = struct.pack(">I", 2 * frame + 1)
+            chunks.append(_png_chunk(b"fdAT", seq + os.urandom(frame_size)))
+    chunks.append(_png_chunk(b"IEND", b""))
+    return b"\x89PNG\r\n\x1a\n" + b"".join(chunks)
+
+
+def make_gif(width=512, height=512, frames=1, frame_size=16):
+    """
+    Return a GIF of `frames` frames, each holding `frame_size` random bytes as
+    image data.
+    """
+    # Header, logical screen descriptor, global color table of 2 colors
+    gif = b"GIF89a" + struct.pack("<HHBBB", width, height, 0x80, 0, 0) + bytes(6)
+    for _ in range(frames):
+        # Graphic control extension, then the image descriptor and its data
+        gif += b"\x21\xf9\x04\x00\x0a\x00\x00\x00"
+        gif += b"\x2c" + struct.pack("<HHHHB", 0, 0, width, height, 0) + b"\x02"
+        data = os.urandom(frame_size)
+        for start in range(0, len(data), 255):
+            block = data[start : start + 255]
+            gif += bytes([len(block)]) + block
+        gif += b"\x00"
+    return gif + b"\x3b"
+
+
+def _riff_chunk(chunk_type, data):
+    return chunk_type + struct.pack("<I", len(data)) + data + bytes(len(data) & 1)
+
+
+def make_webp(width=512, height=512, frames=1, frame_size=16):
+    """
+    Return a (lossy) WebP, animated if `frames` > 1. Each frame holds
+    `frame_size` random bytes as image data.
+    """
+
+    def vp8():
+        header = b"\x10\x02\x00\x9d\x01\x2a" + struct.pack("<HH", width, height)
+        return _riff_chunk(b"VP8 ", header + os.urandom(frame_size))
+
+    def uint24(value):
+        return struct.pack("<I", value)[:3]
+
+    if frames > 1:
+        size = uint24(width - 1) + uint24(height - 1)
+        chunks = _riff_chunk(b"VP8X", b"\x02" + bytes(3) + size)
+        chunks += _riff_chunk(b"ANIM", bytes(6))
+        for _ in range(frames):
+            # Offset, size, duration, flags, then the frame bitstream
+            anmf = bytes(6) + size + uint24(100) + b"\x00"
+            chunks += _riff_chunk(b"ANMF", anmf + vp8())
+    else:
+        chunks = vp8()
+    return b"RIFF" + struct.pack("<I", len(chunks) + 4) + b"WEBP" + chunks
@@ -0,0 +1,55 @@
+import time
+
+from core.image_format import inspect_image
+from core.image_samples import make_png
+from django.core.management.base import BaseCommand
+
+
+def _legacy_is_animated(image_data):
+    # Former implementation: substring searches over the whole image
+    if b"\x61\x63\x54\x4c" in image_data:  # APNG acTL chunk
+        return True
+    if image_data.startswith(b"\x47\x49\x46\x38\x39\x61"):  # GIF89a
+        return True
+    return b"\x41\x4e\x49\x4d" in image_data and b"\x57\x45\x42\x50" in image_data
+
+
+def _inspect_is_animated(image_data):
+    return inspect_image(image_data).animated
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare the time taken to tell whether stickers are animated, with the "
+        "chunk inspector and with the former substring searches. Static PNG are "
+        "the worst case of the former implementation: the whole image is read."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--frames", type=int, default=60, help="Frames per APNG")
+        parser.add_argument(
+            "--frame-size", type=int, default=16 * 1024, help="Bytes per frame"
+        )
+        parser.add_argument("--runs", type=int, default=200)
+
+    def handle(self, *_, **options):
+        images = {
+            "APNG": make_png(
+                frames=options["frames"], frame_size=options["frame_size"]
+            ),
+            "PNG": make_png(frame_size=options["frames"] * options["frame_size"]),
+        }
+
+        for name, image_data in images.items():
+            self.stdout.write(f"{name}, {len(image_data) / 1024:.0f} KiB:")
+            for label, is_animated in (
+                ("legacy", _legacy_is_animated),
+                ("inspector", _inspect_is_animated),
+            ):
+                start = time.perf_counter()
+                for _ in range(options["runs"]):
+                    is_animated(image_data)
+                elapsed = time.perf_counter() - start
+                self.stdout.write(
+                    f"  {label}: {elapsed / options['runs'] * 1e6:.1f} µs per image"
+                )
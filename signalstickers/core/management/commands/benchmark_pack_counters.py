@@ -0,0 +1,84 @@
+import threading
+import time
+
+from core.models import Pack
+from core.utils import get_current_ym_date
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+
+def _atomic_hit(pack_id, month):
+    Pack.objects.increment_views(pack_id, month)
+
+
+def _legacy_hit(pack_id, month):
+    # Former implementation: read-modify-write of the whole stats dict
+    pack = Pack.objects.get(pack_id=pack_id)
+    pack.stats[month] = pack.stats.get(month, 0) + 1
+    pack.save(update_fields=["stats"])
+
+
+class Command(BaseCommand):
+    help = (
+        "Hit the views counter of a pack from many concurrent clients, and "
+        "report the throughput and the number of lost updates. The views added "
+        "by the benchmark are removed at the end."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--clients", type=int, default=16)
+        parser.add_argument("--hits", type=int, default=200, help="Hits per client")
+        parser.add_argument(
+            "--pack-id", help="Pack to use (default: the oldest pack in the DB)"
+        )
+        parser.add_argument(
+            "--legacy",
+            action="store_true",
+            help="Use the former read-modify-write implementation",
+        )
+
+    def handle(self, *_, **options):
+        pack = (
+            Pack.objects.filter(pack_id=options["pack_id"])
+            if options["pack_id"]
+            else Pack.objects.order_by("id")
+        ).first()
+        if not pack:
+            raise CommandError("No pack to run the benchmark on.")
+
+        month = get_current_ym_date()
+        hit = _legacy_hit if options["legacy"] else _atomic_hit
+        start_barrier = threading.Barrier(options["clients"] + 1)
+
+        def client():
+            try:
+                start_barrier.wait()
+                for _ in range(options["hits"]):
+                    hit(pack.pack_id, month)
+            finally:
+                connection.close()
+
+        views_before = Pack.objects.get(id=pack.id).stats.get(month, 0)
+
+        threads = [threading.Thread(target=client) for _ in range(options["clients"])]
+        for thread in threads:
+            thread.start()
+        start_barrier.wait()
+        start = time.perf_counter()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - start
+
+        views_after = Pack.objects.get(id=pack.id).stats.get(month, 0)
+        expected = options["clients"] * options["hits"]
+        counted = views_after - views_before
+
+        # Remove the benchmark views
+        Pack.objects.increment_views(pack.pack_id, month, -counted)
+
+        self.stdout.write(
+            f"Pack: {pack.pack_id}\n"
+            f"Clients: {options['clients']}, hits per client: {options['hits']}\n"
+            f"Elapsed: {elapsed:.2f}s, throughput: {expected / elapsed:.0f} hits/s\n"
+            f"Expected: {expected}, counted: {counted}, lost: {expected - counted}"
+        )
@@ -0,0 +1,23 @@
+from core.catalog_artifacts import ARTIFACT_CATALOGS, build_catalog_artifact
+from django.core.management.base import BaseCommand
+
+
+class Command(BaseCommand):
+    help = (
+        "Write the catalogs as static files (JSON, gzip and brotli), named after "
+        "their content, in CATALOG_ARTIFACTS['path']. Out-of-date files are also "
+        "rebuilt in the background when the API is requested."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--catalog",
+            action="append",
+            choices=ARTIFACT_CATALOGS,
+            help="Catalog to build (default: all); may be repeated",
+        )
+
+    def handle(self, *_, **options):
+        for name in options["catalog"] or ARTIFACT_CATALOGS:
+            artifact = build_catalog_artifact(name)
+            self.stdout.write(f"{name}: {artifact.url}")
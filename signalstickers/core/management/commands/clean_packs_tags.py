@@ -1,31 +1,84 @@
+from core.catalog import bump_catalog_version
+from core.models.catalog_change import CatalogChange
 from core.models.pack import Pack
 from core.models.pack_status import PackStatus
-from core.models.tag import Tag
+from core.models.tag import Tag, normalize_tag_name
 from django.core.management.base import BaseCommand
+from django.db import transaction
 
 
 class Command(BaseCommand):
-    help = "Look for wrong or malformed tags in packs and correct them."
+    help = (
+        "Look for malformed tags in packs (e.g. '#pastel #unicorn') and replace "
+        "them by the tags they contain. Malformed tags left without any pack "
+        "are deleted."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Report what would be cleaned, but do not change anything",
+        )
 
     def handle(self, *args, **options):
-        # Get all packs except REFUSED ones
-        packs = (
-            Pack.objects.exclude(status=PackStatus.REFUSED.name)
-            .prefetch_related("tags")
-            .order_by("-id")
+        through = Pack.tags.through
+
+        # Malformed tag as "#pastel #unicorn #flowers" should be 3 separated tags
+        new_names = {}
+        malformed = Tag.objects.filter(name__contains="#").values_list("id", "name")
+        for tag_id, tag_name in malformed:
+            names = (normalize_tag_name(name) for name in tag_name.split("#"))
+            new_names[tag_id] = [name for name in dict.fromkeys(names) if name]
+
+        # Links of refused packs are left as they are
+        links = list(
+            through.objects.filter(tag_id__in=list(new_names))
+            .exclude(pack__status=PackStatus.REFUSED.name)
+            .values_list("id", "pack_id", "tag_id")
+        )
+        all_names = {name for _, _, tag_id in links for name in new_names[tag_id]}
+        nb_existing = Tag.objects.filter(name__in=all_names).count()
+        pack_ids = {pack_id for _, pack_id, _ in links}
+
+        self.stdout.write(
+            f"Malformed tags: {len(new_names)}, used by {len(pack_ids)} packs "
+            f"({len(links)} links). Tags to create: {len(all_names) - nb_existing}."
         )
+        if options["dry_run"]:
+            self.stdout.write("Dry run, nothing changed.")
+            return
+        if not links:
+            return
+
+        with transaction.atomic():
+            all_names = list(all_names)
+            tag_ids = dict(zip(all_names, Tag.objects.resolve(all_names)))
+            # Packs may already have some of the new tags
+            through.objects.bulk_create(
+                [
+                    through(pack_id=pack_id, tag_id=tag_ids[name])
+                    for _, pack_id, tag_id in links
+                    for name in new_names[tag_id]
+                ],
+                ignore_conflicts=True,
+            )
+            link_ids = [link_id for link_id, _, _ in links]
+            through.objects.filter(id__in=link_ids).delete()
+
+            # Malformed tags still used (by refused packs) are kept
+            orphans = Tag.objects.filter(id__in=list(new_names), packs=None)
+            nb_deleted, _ = orphans.delete()
 
-        for pack in packs:
-            pack_tags = pack.tags.all()
-
-            for tag in pack_tags:
-                # Malformed tag as "#pastel #unicorn #flowers" should be 3 separated tags
-                if "#" in tag.name:
-                    new_names = tag.name.split("#")
-                    for new_name in new_names:
-                        if new_name:
-                            new_tag, _ = Tag.objects.get_or_create(
-                                name=new_name.strip()
-                            )
-                            pack.tags.add(new_tag)
-                    tag.delete()
+            # Bulk operations do not send the m2m signals
+            Pack.objects.update_search_vectors(pack_ids)
+            online_packs = Pack.objects.filter(
+                id__in=pack_ids, status=PackStatus.ONLINE.name
+            )
+            CatalogChange.objects.record(online_packs.values_list("pack_id", flat=True))
+        bump_catalog_version()
+
+        self.stdout.write(
+            f"All done! Cleaned: {len(pack_ids)} packs. "
+            f"Malformed tags deleted: {nb_deleted}."
+        )
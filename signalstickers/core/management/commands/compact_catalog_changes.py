@@ -0,0 +1,13 @@
+from core.models import CatalogChange
+from django.core.management.base import BaseCommand
+
+
+class Command(BaseCommand):
+    help = (
+        "Delete the catalog changes followed by a later change of the same pack. "
+        "The changes returned to the clients are the same: run it regularly."
+    )
+
+    def handle(self, *_, **__):
+        nb_deleted = CatalogChange.objects.compact()
+        self.stdout.write(f"Compacted: {nb_deleted} changes deleted.")
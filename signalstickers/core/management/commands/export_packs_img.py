@@ -1,49 +1,246 @@
+import asyncio
+from collections import Counter
+from contextlib import ExitStack
+import io
+import json
+import logging
+from pathlib import Path
+import queue
 import re
 import sys
+import tarfile
+import threading
+import time
+import zipfile
 
-from core.models import Pack
-from core.utils import get_pack_from_signal
+from core.image_format import inspect_image
+from core.models import Pack, PackStatus
+from core.signal_client import SignalClient, SignalError
+from django.conf import settings
 from django.core.management.base import BaseCommand
 
+logger = logging.getLogger("main")
+
+# In the output directory: the files of the packs already exported
+MANIFEST_NAME = ".export_manifest.json"
+
+
+class DirectoryWriter:
+    """
+    Write the files in a directory. The packs exported are listed in a manifest,
+    so that they are skipped by the next exports.
+    """
+
+    save_every = 50  # packs
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self.path.mkdir(parents=True, exist_ok=True)
+        self.manifest_path = self.path / MANIFEST_NAME
+        try:
+            self.exported = json.loads(self.manifest_path.read_text(encoding="utf-8"))
+        except FileNotFoundError:
+            self.exported = {}
+        self._nb_unsaved = 0
+        self._lock = threading.Lock()
+
+    def is_exported(self, pack_id):
+        return pack_id in self.exported and all(
+            (self.path / filename).exists() for filename in self.exported[pack_id]
+        )
+
+    def write_pack(self, pack_id, files):
+        for filename, data in files:
+            tmp_path = self.path / f"{filename}.tmp"
+            tmp_path.write_bytes(data)
+            tmp_path.replace(self.path / filename)
+
+        with self._lock:
+            self.exported[pack_id] = [filename for filename, _ in files]
+            self._nb_unsaved += 1
+            if self._nb_unsaved >= self.save_every:
+                self._save_manifest()
+
+    def _save_manifest(self):
+        tmp_path = self.manifest_path.with_name(f"{MANIFEST_NAME}.tmp")
+        tmp_path.write_text(json.dumps(self.exported), encoding="utf-8")
+        tmp_path.replace(self.manifest_path)
+        self._nb_unsaved = 0
+
+    def close(self):
+        with self._lock:
+            self._save_manifest()
+
+
+class ArchiveWriter:
+    """
+    Write the files in a tar (optionally compressed) or zip archive. `path` "-"
+    streams a tar archive to stdout.
+    """
+
+    def __init__(self, path):
+        self._lock = threading.Lock()
+        # The archive is closed by close()
+        self._stack = ExitStack()
+        self._tar = self._zip = None
+        if path == "-":
+            self._tar = self._stack.enter_context(
+                tarfile.open(fileobj=sys.stdout.buffer, mode="w|")
+            )
+        elif path.endswith(".zip"):
+            # Images are already compressed
+            self._zip = self._stack.enter_context(
+                zipfile.ZipFile(path, "w", compression=zipfile.ZIP_STORED)
+            )
+        else:
+            mode = "w:gz" if path.endswith((".tar.gz", ".tgz")) else "w"
+            self._tar = self._stack.enter_context(tarfile.open(path, mode=mode))
+
+    def is_exported(self, _):
+        return False
+
+    def write_pack(self, _, files):
+        with self._lock:
+            for filename, data in files:
+                if self._zip:
+                    self._zip.writestr(filename, data)
+                else:
+                    info = tarfile.TarInfo(filename)
+                    info.size = len(data)
+                    info.mtime = int(time.time())
+                    self._tar.addfile(info, io.BytesIO(data))
+
+    def close(self):
+        self._stack.close()
+
 
 class Command(BaseCommand):
-    help = "Export stickers img to files."
+    help = (
+        "Export stickers img to files. Packs are fetched concurrently, and "
+        "written by separate workers. In a directory, the packs already "
+        "exported are skipped. Packs are fetched from Signal, without going "
+        "through the local cache."
+    )
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._stats = Counter()
+        self._stats_lock = threading.Lock()
+
+    def add_arguments(self, parser):
+        parser.add_argument("--output-dir", default="/tmp/export_sst")  # nosec
+        parser.add_argument(
+            "--archive",
+            help=(
+                "Write to this archive (.tar, .tar.gz or .zip) instead of the "
+                "output directory; '-' streams a tar archive to stdout"
+            ),
+        )
+        parser.add_argument(
+            "--status",
+            action="append",
+            choices=[status.name for status in PackStatus],
+            help="Only export the packs with this status (repeatable)",
+        )
+        parser.add_argument(
+            "--concurrency", type=int, default=8, help="Packs fetched at once"
+        )
+        parser.add_argument("--writers", type=int, default=2)
 
     def handle(self, *args, **options):
-        nb_exported = 0
-
-        for pack in Pack.objects.all():
-            pack_data = get_pack_from_signal(pack.pack_id, pack.pack_key)
-
-            for sticker in pack_data.stickers:
-
-                img = sticker.image_data
-                sticker_id = int(sticker.id)
-                if b"\x61\x63\x54\x4c" in img:  # APNG acTL chunk
-                    ext = "png"
-                elif img.startswith(b"\x89\x50\x4e\x47\x0d\x0a\x1a\x0a"):  # PNG
-                    ext = "png"
-                elif img.startswith(b"\x47\x49\x46\x38\x39\x61"):
-                    ext = "gif"
-                elif (
-                    img.startswith(b"\x52\x49\x46\x46")
-                    and img[8:12] == b"\x57\x45\x42\x50"
-                ):
-                    ext = "webp"
-                else:
-                    print("Unknown file type")
-                    ext = ""
+        # With a tar on stdout, report on stderr
+        out = self.stderr if options["archive"] == "-" else self.stdout
+        if options["archive"]:
+            writer = ArchiveWriter(options["archive"])
+        else:
+            writer = DirectoryWriter(options["output_dir"])
+
+        packs = Pack.objects.order_by("id")
+        if options["status"]:
+            packs = packs.filter(status__in=options["status"])
+        packs = packs.values_list("pack_id", "pack_key")
+        nb_packs = len(packs)
+        packs = [pack for pack in packs if not writer.is_exported(pack[0])]
+
+        files_queue = queue.Queue(maxsize=options["concurrency"] * 2)
+        writers = [
+            threading.Thread(target=self._write_packs, args=(writer, files_queue, out))
+            for _ in range(options["writers"])
+        ]
+        for thread in writers:
+            thread.start()
+
+        # A client of its own: the shared one is limited in concurrency, and
+        # caches every pack (evicting the packs of the admin panel)
+        client = SignalClient(settings.SIGNAL_CLIENT["timeout"], options["concurrency"])
+        start = time.perf_counter()
+        try:
+            asyncio.run(self._fetch_packs(client, packs, files_queue, out))
+        finally:
+            client.close()
+            for _ in writers:
+                files_queue.put(None)
+            for thread in writers:
+                thread.join()
+            writer.close()
+        elapsed = time.perf_counter() - start
+
+        stats = self._stats
+        out.write(
+            f"\nAll done! Exported: {stats['files']} files "
+            f"({stats['bytes'] / 1024 / 1024:.1f} MB) from {stats['packs']} packs "
+            f"in {elapsed:.1f}s ({stats['packs'] / elapsed:.1f} packs/s). "
+            f"Skipped (already exported): {nb_packs - len(packs)} packs, "
+            f"failed: {len(packs) - stats['packs']} packs."
+        )
+
+    @staticmethod
+    async def _fetch_packs(client, packs, files_queue, out):
+        async def fetch(pack_id, pack_key):
+            if not re.match(r"^[a-z0-9]{32}$", pack_id):
+                # Should never happend but hey
+                out.write(f"Pack {pack_id}: forbidden char in pack id")
+                return
+
+            # The client limits the number of concurrent fetches
+            try:
+                pack_data = await client.aget_pack(pack_id, pack_key)
+                files = []
+                for sticker in pack_data.stickers:
+                    ext = inspect_image(sticker.image_data).extension
+                    filename = f"{pack_id}_{int(sticker.id)}.{ext}"
+                    files.append((filename, sticker.image_data))
+            except SignalError as exc:
+                out.write(f"Pack {pack_id}: could not be fetched ({exc})")
+                return
+            except Exception as exc:  # pylint: disable=broad-except
+                # Whatever the error, the other packs are still exported
+                logger.exception("Could not export pack %s", pack_id)
+                out.write(f"Pack {pack_id}: could not be exported ({exc})")
+                return
 
-                nb_exported += 1
+            # Blocks while the writers are busy
+            await asyncio.to_thread(files_queue.put, (pack_id, files))
 
-                if not re.match(r"^[a-z0-9]{32}$", pack.pack_id):
-                    # Should never happend but hey
-                    print("Forbidden char in pack id ")
-                    sys.exit()
+        await asyncio.gather(*(fetch(*pack) for pack in packs))
 
-                filename = f"/tmp/export_sst/{pack.pack_id}_{sticker_id}.{ext}"  # nosec
+    def _write_packs(self, writer, files_queue, out):
+        while True:
+            item = files_queue.get()
+            if item is None:
+                return
 
-                with open(filename, "bw") as f_out:
-                    f_out.write(img)
+            # Whatever the error, keep draining the queue: the fetchers wait
+            # for room in it
+            pack_id, files = item
+            try:
+                writer.write_pack(pack_id, files)
+            except Exception as exc:  # pylint: disable=broad-except
+                logger.exception("Could not write pack %s", pack_id)
+                out.write(f"Pack {pack_id}: could not be written ({exc})")
+                continue
 
-        self.stdout.write(f"\nAll done! Exported: {nb_exported} files.")
+            with self._stats_lock:
+                self._stats["packs"] += 1
+                self._stats["files"] += len(files)
+                self._stats["bytes"] += sum(len(data) for _, data in files)
@@ -0,0 +1,27 @@
+import json
+
+from core.fake_cloudflare import FakeCloudflare
+from django.core.management.base import BaseCommand
+
+
+class Command(BaseCommand):
+    help = (
+        "Run a fake Cloudflare API locally, printing the purge requests it "
+        "receives. For development only: set CDN_PURGE['api_base'] to its URL."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--port", type=int, default=8787)
+
+    def handle(self, *args, **options):
+        fake = FakeCloudflare(
+            options["port"],
+            on_request=lambda request: self.stdout.write(json.dumps(request)),
+        )
+        self.stdout.write(f"Fake Cloudflare API at {fake.api_base}. Quit with CTRL-C.")
+        try:
+            fake.server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            fake.server.server_close()
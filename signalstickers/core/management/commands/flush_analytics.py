@@ -0,0 +1,12 @@
+from core.analytics import analytics_buffer_from_settings
+from django.core.management.base import BaseCommand
+
+
+class Command(BaseCommand):
+    help = "Write the buffered analytics (queue file) to the DB."
+
+    def handle(self, *_, **__):
+        nb_pack_views, nb_site_visits = analytics_buffer_from_settings().flush()
+        self.stdout.write(
+            f"Flushed: {nb_pack_views} pack views, {nb_site_visits} site visits."
+        )
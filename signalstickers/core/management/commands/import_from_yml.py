@@ -1,8 +1,78 @@
-from core.models import Pack, PackStatus
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice, repeat
+
+from core.catalog import bump_catalog_version
+from core.models import CatalogChange, Pack, PackStatus, Tag
+from django.conf import settings
 from django.core.exceptions import ValidationError
-from django.core.management.base import BaseCommand
-from django.db.utils import IntegrityError
-from yaml import Loader, load
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+import yaml
+
+try:
+    from yaml import CSafeLoader as SafeLoader
+except ImportError:  # pragma: no cover
+    from yaml import SafeLoader
+
+
+def _is_pack_line(line):
+    # Packs are the top-level keys of the mapping
+    return not line.startswith("---") and line[:1] not in ("", " ", "\t", "\n", "#")
+
+
+def count_packs(f_in):
+    """
+    Return the number of packs of a YAML mapping of packs, without parsing it.
+    """
+    return sum(1 for line in f_in if _is_pack_line(line))
+
+
+def read_packs(f_in, chunk_size=500):
+    """
+    Yield (pack_id, pack_data) from a YAML mapping of packs. The file is split
+    on its top-level keys, and parsed `chunk_size` packs at a time, so that the
+    whole document is never parsed at once.
+    """
+    lines = []
+    nb_packs = 0
+
+    for line in f_in:
+        if line.startswith("---"):
+            continue
+        if _is_pack_line(line):
+            if nb_packs == chunk_size:
+                yield from (yaml.load("".join(lines), Loader=SafeLoader) or {}).items()
+                lines = []
+                nb_packs = 0
+            nb_packs += 1
+        lines.append(line)
+
+    yield from (yaml.load("".join(lines), Loader=SafeLoader) or {}).items()
+
+
+def reserve_pack_ids(nb_packs):
+    """
+    Return `nb_packs` new database ids for packs, in decreasing order.
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT nextval(pg_get_serial_sequence('packs', 'id')) "
+            "FROM generate_series(1, %s)",
+            [nb_packs],
+        )
+        return sorted((row[0] for row in cursor.fetchall()), reverse=True)
+
+
+def validate(pack):
+    """
+    Run `pack.clean()` (fetches the pack from Signal). Return None if the pack
+    is valid, or the `ValidationError`.
+    """
+    try:
+        pack.clean()
+    except ValidationError as exc:
+        return exc
+    return None
 
 
 class Command(BaseCommand):
@@ -10,46 +80,144 @@ class Command(BaseCommand):
 
     def add_arguments(self, parser):
         parser.add_argument("input_file", type=open)
+        parser.add_argument(
+            "--concurrency",
+            type=int,
+            default=settings.SIGNAL_CLIENT["max_concurrency"],
+            help=(
+                "Packs validated at once; at most SIGNAL_CLIENT['max_concurrency'], "
+                "the packs being fetched with the shared Signal client"
+            ),
+        )
+        parser.add_argument("--batch-size", type=int, default=500)
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Validate the packs, but do not import them",
+        )
 
     def handle(self, *args, **options):
-
+        max_concurrency = settings.SIGNAL_CLIENT["max_concurrency"]
+        if options["concurrency"] > max_concurrency:
+            raise CommandError(
+                "--concurrency can not exceed SIGNAL_CLIENT['max_concurrency'] "
+                f"({max_concurrency})."
+            )
         nb_imported = 0
-        data = load(options["input_file"], Loader=Loader)
-
-        for pack_id, pack_data in dict(reversed(list(data.items()))).items():
-
-            try:
-                tags = pack_data.get("tags", None)
-                if tags:
-                    tags = tags[:40]
-
-                pack = Pack.objects.new(
-                    pack_id=pack_id,
-                    pack_key=pack_data["key"],
-                    source=pack_data.get("source", ""),
-                    status=PackStatus.ONLINE.name,
-                    nsfw=pack_data.get("nsfw", False),
-                    original=pack_data.get("original", False),
-                    tags=tags,
-                    editorschoice=data.get("editorschoice", False),
-                )
+        seen_ids = set()
+
+        # The first packs of the file are the most recent ones: they get the
+        # highest ids. Ids are reserved beforehand, so that the file is streamed
+        # in order, one batch at a time.
+        input_file = options["input_file"]
+        nb_packs = count_packs(input_file)
+        input_file.seek(0)
+        if options["dry_run"]:
+            db_ids = repeat(None)
+        else:
+            db_ids = iter(reserve_pack_ids(nb_packs))
+
+        entries = read_packs(input_file, options["batch_size"])
+        with ThreadPoolExecutor(max_workers=options["concurrency"]) as executor:
+            while batch := list(islice(entries, options["batch_size"])):
+                batch = [(next(db_ids), *entry) for entry in batch]
+                packs = self._validate_batch(batch, executor)
+                packs = self._remove_duplicates(packs, seen_ids)
 
-                nb_imported += 1
+                if not options["dry_run"]:
+                    self._import_batch(packs)
+                nb_imported += len(packs)
                 self.stdout.write(f"\rImported: {nb_imported} ", ending="")
 
-                if pack.animated_detected != pack_data.get(
-                    "animated", False
-                ):  # pragma: no cover
-                    self.stdout.write(
-                        f"Animated detection failed for pack {pack_id} (detected: {pack.animated_detected}, YML: {pack_data.get('animated', False)}). Using detection value."
-                    )
+        if nb_imported and not options["dry_run"]:
+            bump_catalog_version()
 
-            except IntegrityError:
-                self.stdout.write(f"Pack {pack_id} not imported (duplicate)")
+        if options["dry_run"]:
+            self.stdout.write(f"\nDry run, nothing imported. Valid: {nb_imported}")
+        else:
+            self.stdout.write(f"\nAll done! Imported: {nb_imported}")
 
-            except ValidationError as e:
+    def _validate_batch(self, batch, executor):
+        """
+        Return (pack, tags) for the valid packs of `batch`, a list of (database
+        id, pack id, pack data). Packs are validated concurrently.
+        """
+        packs = []
+        for db_id, pack_id, pack_data in batch:
+            pack = Pack(
+                id=db_id,
+                pack_id=str(pack_id).strip(),
+                pack_key=str(pack_data["key"]).strip(),
+                source=(pack_data.get("source") or "").strip(),
+                status=PackStatus.ONLINE.name,
+                nsfw=pack_data.get("nsfw", False),
+                original=pack_data.get("original", False),
+                editorschoice=pack_data.get("editorschoice", False),
+            )
+            tag_list = (pack_data.get("tags") or [])[:40]
+            tags = {str(tag).strip().lower() for tag in tag_list}
+            tags.discard("")
+            packs.append((pack, tags, pack_data))
+
+        valid_packs = []
+        errors = executor.map(validate, [pack for pack, _, _ in packs])
+        for (pack, tags, pack_data), error in zip(packs, errors):
+            if error:
                 self.stdout.write(
-                    f"Pack {pack_id} not imported (key: {pack_data['key']}): {e}"
+                    f"Pack {pack.pack_id} not imported (key: {pack.pack_key}): {error}"
                 )
+                continue
+
+            if pack.animated_detected != pack_data.get(
+                "animated", False
+            ):  # pragma: no cover
+                self.stdout.write(
+                    f"Animated detection failed for pack {pack.pack_id} (detected: {pack.animated_detected}, YML: {pack_data.get('animated', False)}). Using detection value."
+                )
+            valid_packs.append((pack, tags))
+        return valid_packs
+
+    def _remove_duplicates(self, packs, seen_ids):
+        """
+        Remove the packs already in the DB, or already seen in the file.
+        """
+        existing_ids = set(
+            Pack.objects.filter(
+                pack_id__in=[pack.pack_id for pack, _ in packs]
+            ).values_list("pack_id", flat=True)
+        )
+
+        new_packs = []
+        for pack, tags in packs:
+            if pack.pack_id in existing_ids or pack.pack_id in seen_ids:
+                self.stdout.write(f"Pack {pack.pack_id} not imported (duplicate)")
+                continue
+            seen_ids.add(pack.pack_id)
+            new_packs.append((pack, tags))
+        return new_packs
+
+    @staticmethod
+    def _import_batch(packs):
+        """
+        Insert the packs, their tags and the links between them. Bulk inserts do
+        not send signals: the search vectors and the catalog changes are updated
+        here.
+        """
+        if not packs:
+            return
+
+        tag_names = list(set().union(*(tags for _, tags in packs)))
+        with transaction.atomic():
+            Pack.objects.bulk_create([pack for pack, _ in packs])
+
+            tag_ids = dict(zip(tag_names, Tag.objects.resolve(tag_names)))
+            Pack.tags.through.objects.bulk_create(
+                [
+                    Pack.tags.through(pack_id=pack.id, tag_id=tag_ids[name])
+                    for pack, tags in packs
+                    for name in tags
+                ]
+            )
 
-        self.stdout.write(f"\nAll done! Imported: {nb_imported}")
+            Pack.objects.update_search_vectors([pack.id for pack, _ in packs])
+            CatalogChange.objects.record(pack.pack_id for pack, _ in packs)
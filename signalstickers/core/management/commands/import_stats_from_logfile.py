@@ -1,91 +1,231 @@
-import csv
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime
+import gzip
+import io
+import multiprocessing
+import os
 import re
-import sys
 
-from core.models import Pack, SiteStat
-from django.core.management.base import BaseCommand
+from core.catalog import bump_catalog_version
+from core.models import Pack, PackMonthlyStat, SiteStat
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+
+PACK_URL_RE = re.compile(rb"https://signalstickers.org/pack/([a-z0-9]{32})")
+
+# Uncompressed logs are split in shards of this size, parsed in parallel
+SHARD_SIZE = 64 * 1024 * 1024
+
+
+def is_gzip(path):
+    with open(path, "rb") as f_in:
+        return f_in.read(2) == b"\x1f\x8b"
+
+
+def plan_shards(paths, shard_size=SHARD_SIZE):
+    """
+    Return the shards (path, start, end) to parse. Compressed logs can not be
+    split: they are parsed in one piece (`end` is None).
+    """
+    shards = []
+    for path in paths:
+        if is_gzip(path):
+            shards.append((path, 0, None))
+            continue
+        size = os.path.getsize(path)
+        shards.extend(
+            (path, start, min(start + shard_size, size))
+            for start in range(0, max(size, 1), shard_size)
+        )
+    return shards
+
+
+def parse_shard(shard):
+    """
+    Count the pings of the lines starting in the shard (path, start, end).
+    Return (pack_views, site_visits, nb_lines), `pack_views` mapping
+    (pack_id, month) to a number of views, and `site_visits` a month to a
+    number of visits. Runs in a worker process: no DB access.
+    """
+    path, start, end = shard
+    pack_views, site_visits = Counter(), Counter()
+    nb_lines = 0
+    months = {}  # timestamp // 60 -> YYYY_MM
+
+    opener = gzip.open if end is None else open
+    with opener(path, "rb") as f_in:
+        if start:
+            # Skip the line started in the previous shard
+            f_in.seek(start - 1)
+            f_in.readline()
+        pos = f_in.tell()
+
+        for line in f_in:
+            if end is not None and pos >= end:
+                break
+            pos += len(line)
+
+            # timestamp|request|referer|...
+            fields = line.split(b"|", 3)
+            if len(fields) < 3 or not fields[1].startswith(b"POST /ping"):
+                continue
+            try:
+                minute = int(fields[0]) // 60
+            except ValueError:
+                continue
+            if minute not in months:
+                months[minute] = datetime.fromtimestamp(minute * 60).strftime("%Y_%m")
+            month = months[minute]
+
+            match = PACK_URL_RE.match(fields[2])
+            if match:
+                pack_views[(match.group(1).decode(), month)] += 1
+            else:
+                site_visits[month] += 1
+            nb_lines += 1
+
+    return pack_views, site_visits, nb_lines
 
 
 class Command(BaseCommand):
-    help = "Import stats from Apache logfile for all packs."
+    help = (
+        "Import stats from Apache logfiles (plain or gzipped) for all packs. By "
+        "default, the stats of the packs found in the logs are replaced; with "
+        "--merge, the views of the logs are added to the existing stats."
+    )
 
     def add_arguments(self, parser):
-        parser.add_argument("input_file", type=open)
+        parser.add_argument("input_files", nargs="+")
+        parser.add_argument(
+            "--merge",
+            action="store_true",
+            help="Add the views to the existing stats instead of replacing them",
+        )
+        parser.add_argument(
+            "--processes",
+            type=int,
+            default=os.cpu_count(),
+            help="Number of processes parsing the logs",
+        )
+        parser.add_argument(
+            "--noinput",
+            "--no-input",
+            action="store_false",
+            dest="interactive",
+            help="Do not ask for confirmation",
+        )
 
     def handle(self, *_, **options):
-
-        print("""
+        if not options["merge"] and options["interactive"]:
+            self.stdout.write("""
                 #################
                 #### WARNING ####
                 #################
 
-This command will DELETE AND REPLACE ALL EXISTING STATS
-ON THE APPLICATION. Use it WITH CAUTION.
+This command will DELETE AND REPLACE THE EXISTING STATS
+of the packs found in the logs. Use it WITH CAUTION
+(or use --merge).
 
 """)
-
-        reply = str(
-            input("Are you sure you want to continue? Type 'yes replace all': ")
+            reply = str(
+                input("Are you sure you want to continue? Type 'yes replace all': ")
+            )
+            if reply != "yes replace all":
+                raise CommandError("Aborting.")
+
+        pack_views, site_visits, nb_lines = self._parse(
+            options["input_files"], options["processes"]
+        )
+        self.stdout.write(
+            f"\nParsed: {nb_lines} stats items, "
+            f"{len(pack_views)} pack-months, {len(site_visits)} months."
         )
-        if reply != "yes replace all":
-            print("Aborting.")
-            sys.exit()
-        print("You can still abort during initial parsing with Ctrl+C.\n")
-
-        nb_lines_imported = 0
-        packs_stats = {}
-        site_stats = {}
-
-        logreader = csv.reader(options["input_file"], delimiter="|")
-        for line in logreader:
-            if not line:
-                continue
-
-            if not line[1].startswith("POST /ping"):
-                continue
-
-            visit_date = datetime.fromtimestamp(int(line[0]))
-            visit_date = visit_date.strftime("%Y_%m")
 
-            try:
-                # Packs
-                pack_id = re.match(
-                    "https://signalstickers.org/pack/([a-z0-9]{32})", line[2]
-                ).group(1)
-
-                if pack_id not in packs_stats:
-                    packs_stats[pack_id] = {}
-
-                if visit_date in packs_stats[pack_id]:
-                    packs_stats[pack_id][visit_date] += 1
-                else:
-                    packs_stats[pack_id][visit_date] = 1
-
-            except AttributeError:
-                # Visits
-                if visit_date in site_stats:
-                    site_stats[visit_date] += 1
-                else:
-                    site_stats[visit_date] = 1
-
-            nb_lines_imported += 1
-            if nb_lines_imported % 10000 == 0:
-                self.stdout.write(f"\rParsed: {nb_lines_imported} ", ending="")
-
-        print("\n\n##### It is now too late to abort. #####")
-
-        # Save pack stats
-        for pack_id, stats in packs_stats.items():
-            try:
-                Pack.objects.filter(pack_id=pack_id).update(stats=stats)
-            except Pack.DoesNotExist:
-                continue
+        with transaction.atomic():
+            pack_ids = self._save_pack_views(pack_views, options["merge"])
+            self._save_site_visits(site_visits, options["merge"])
+        bump_catalog_version()
 
-        # Save global visit stats
-        for month, visits in site_stats.items():
-            month_visit = SiteStat.objects.get_or_create(month=month)[0]
-            month_visit.visits = visits
-            month_visit.save()
+        self.stdout.write(
+            f"All done! Imported: {nb_lines} stats items ({len(pack_ids)} packs)."
+        )
 
-        self.stdout.write(f"\nAll done! Imported: {nb_lines_imported} stats items.")
+    def _parse(self, paths, nb_processes):
+        shards = plan_shards(paths)
+        pack_views, site_visits = Counter(), Counter()
+        nb_lines = 0
+
+        if nb_processes > 1 and len(shards) > 1:
+            # fork: the workers do not need to set Django up again
+            executor = ProcessPoolExecutor(
+                max_workers=nb_processes, mp_context=multiprocessing.get_context("fork")
+            )
+            results = executor.map(parse_shard, shards)
+        else:
+            executor = None
+            results = map(parse_shard, shards)
+
+        try:
+            for shard_pack_views, shard_site_visits, shard_nb_lines in results:
+                pack_views.update(shard_pack_views)
+                site_visits.update(shard_site_visits)
+                nb_lines += shard_nb_lines
+                self.stdout.write(f"\rParsed: {nb_lines} ", ending="")
+        finally:
+            if executor:
+                executor.shutdown()
+
+        return pack_views, site_visits, nb_lines
+
+    @staticmethod
+    def _save_pack_views(pack_views, merge):
+        """
+        Write the views with a single COPY and a single UPDATE. Return the ids of
+        the packs updated.
+        """
+        rows = io.StringIO()
+        for (pack_id, month), views in pack_views.items():
+            rows.write(f"{pack_id}\t{month}\t{views}\n")
+        rows.seek(0)
+
+        if merge:
+            new_views = "i.views + COALESCE((p.stats->>i.month)::integer, 0)"
+            new_stats = "COALESCE(packs.stats, '{}'::jsonb) || s.stats"
+        else:
+            new_views = "i.views"
+            new_stats = "s.stats"
+
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "CREATE TEMPORARY TABLE import_pack_views "
+                "(pack_id varchar(32), month varchar(7), views integer) "
+                "ON COMMIT DROP"
+            )
+            cursor.copy_expert("COPY import_pack_views FROM STDIN", rows)
+            cursor.execute(
+                f"UPDATE packs SET stats = {new_stats} "  # nosec
+                "FROM ("
+                f"SELECT i.pack_id, jsonb_object_agg(i.month, {new_views}) AS stats "
+                "FROM import_pack_views i JOIN packs p ON p.pack_id = i.pack_id "
+                "GROUP BY i.pack_id"
+                ") s WHERE packs.pack_id = s.pack_id RETURNING packs.id"
+            )
+            pack_ids = [row[0] for row in cursor.fetchall()]
+            # Dropped now: the command may run again in the same transaction
+            cursor.execute("DROP TABLE import_pack_views")
+
+        # Bulk updates skip Pack.save(): resync what is computed from stats
+        PackMonthlyStat.objects.sync_from_packs(pack_ids)
+        Pack.objects.refresh_views(pack_ids)
+        return pack_ids
+
+    @staticmethod
+    def _save_site_visits(site_visits, merge):
+        for month, visits in site_visits.items():
+            if merge:
+                SiteStat.objects.increment_visits(month, visits)
+            else:
+                SiteStat.objects.update_or_create(
+                    month=month, defaults={"visits": visits}
+                )
@@ -0,0 +1,43 @@
+from core.cdn import PurgePlanner
+from core.models import Pack
+from django.core.management.base import BaseCommand, CommandError
+
+
+class Command(BaseCommand):
+    help = (
+        "Purge from the CDN the cached URLs of some packs (their status, the "
+        "catalogs and the feeds), or only the catalogs and the feeds."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--pack-id",
+            action="append",
+            help="Purge the URLs of this pack (repeatable)",
+        )
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Print the URLs that would be purged, but do not purge them",
+        )
+
+    def handle(self, *args, **options):
+        planner = PurgePlanner(debounce=0)
+        if options["pack_id"]:
+            packs = Pack.objects.filter(pack_id__in=options["pack_id"])
+            for pack in packs.only("pack_id", "pack_key", "status"):
+                planner.add_pack(pack)
+        else:
+            planner.add_catalog()
+
+        if options["dry_run"]:
+            for url in planner.pending:
+                self.stdout.write(url)
+            return
+
+        purged = planner.flush(force=True)
+        if planner.pending:
+            raise CommandError(
+                f"{len(planner.pending)} URLs could not be purged (see the logs)."
+            )
+        self.stdout.write(f"All done! Purged: {len(purged)} URLs.")
@@ -0,0 +1,9 @@
+from core.catalog import bump_catalog_version
+from django.core.management.base import BaseCommand
+
+
+class Command(BaseCommand):
+    help = "Force the catalog snapshots to be rebuilt (e.g. to refresh views)."
+
+    def handle(self, *_, **__):
+        bump_catalog_version()
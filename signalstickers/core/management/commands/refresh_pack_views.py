@@ -0,0 +1,14 @@
+from core.catalog import bump_catalog_version
+from core.models import Pack
+from django.core.management.base import BaseCommand
+
+
+class Command(BaseCommand):
+    help = (
+        "Recompute the total and hot views of all packs. Run it when the month "
+        "changes, as hot views only count this month and last month."
+    )
+
+    def handle(self, *_, **__):
+        Pack.objects.refresh_views()
+        bump_catalog_version()
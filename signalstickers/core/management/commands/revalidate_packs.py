@@ -0,0 +1,179 @@
+import asyncio
+from collections import Counter
+import json
+from pathlib import Path
+import time
+
+from core.catalog import bump_catalog_version
+from core.models import CatalogChange, Pack, PackStatus
+from core.models.pack import SIGNAL_FIELDS
+from core.signal_cache import get_signal_cache
+from core.signal_client import (
+    SignalClient,
+    SignalError,
+    SignalInvalidPack,
+    SignalPackNotFound,
+)
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+
+class Command(BaseCommand):
+    help = (
+        "Check that packs still exist on Signal, and refresh their title, "
+        "author, cover and animated status. Packs are processed in batches, by "
+        "increasing id; with --checkpoint, an interrupted run can be resumed."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--status",
+            action="append",
+            choices=[status.name for status in PackStatus],
+            help="Only re-validate the packs with this status (repeatable)",
+        )
+        parser.add_argument(
+            "--pack-id", action="append", help="Only re-validate this pack (repeatable)"
+        )
+        parser.add_argument(
+            "--concurrency", type=int, default=16, help="Packs fetched at once"
+        )
+        parser.add_argument("--batch-size", type=int, default=500)
+        parser.add_argument(
+            "--checkpoint",
+            type=Path,
+            help="File where the progress is saved, and resumed from if it exists",
+        )
+        parser.add_argument(
+            "--use-cache",
+            action="store_true",
+            help=(
+                "Use the packs of the local cache instead of fetching them again "
+                "(faster, but does not check that they still exist on Signal)"
+            ),
+        )
+
+    def handle(self, *_, **options):
+        packs = Pack.objects.order_by("id").only(
+            "pack_id", "pack_key", "status", "animated_mode", *SIGNAL_FIELDS
+        )
+        if options["status"]:
+            packs = packs.filter(status__in=options["status"])
+        if options["pack_id"]:
+            packs = packs.filter(pack_id__in=options["pack_id"])
+
+        last_id = self._load_checkpoint(options["checkpoint"])
+        total = packs.filter(id__gt=last_id).count()
+        client = SignalClient(settings.SIGNAL_CLIENT["timeout"], options["concurrency"])
+        stats = Counter()
+        start = time.perf_counter()
+
+        try:
+            while True:
+                batch = list(packs.filter(id__gt=last_id)[: options["batch_size"]])
+                if not batch:
+                    break
+
+                results = asyncio.run(
+                    self._fetch_packs(client, batch, options["use_cache"])
+                )
+                self._update_packs(batch, results, stats)
+
+                last_id = batch[-1].id
+                self._save_checkpoint(options["checkpoint"], last_id)
+
+                elapsed = time.perf_counter() - start
+                self.stdout.write(
+                    f"{stats['processed']}/{total} packs "
+                    f"({stats['processed'] / elapsed:.1f} packs/s): "
+                    f"{stats['updated']} updated, {stats['missing']} missing, "
+                    f"{stats['invalid']} invalid, {stats['errors']} errors"
+                )
+        finally:
+            client.close()
+
+        if options["checkpoint"]:
+            options["checkpoint"].unlink(missing_ok=True)
+        self.stdout.write(f"All done in {time.perf_counter() - start:.1f}s.")
+
+    @staticmethod
+    async def _fetch_packs(client, batch, use_cache):
+        """
+        Return, for each pack of `batch`, the pack fetched from Signal, or the
+        `SignalError` raised when fetching it.
+        """
+        signal_cache = get_signal_cache()
+
+        async def fetch(pack):
+            if use_cache:
+                cached = signal_cache.get(pack.pack_id, pack.pack_key)
+                if cached:
+                    return cached
+            try:
+                lib_pack = await client.aget_pack(pack.pack_id, pack.pack_key)
+            except SignalError as exc:
+                return exc
+            signal_cache.put(pack.pack_id, pack.pack_key, lib_pack)
+            return lib_pack
+
+        # The client limits the number of concurrent fetches
+        return await asyncio.gather(*(fetch(pack) for pack in batch))
+
+    def _update_packs(self, batch, results, stats):
+        updated_packs = []
+
+        for pack, result in zip(batch, results):
+            stats["processed"] += 1
+
+            if isinstance(result, SignalPackNotFound):
+                stats["missing"] += 1
+                self.stdout.write(f"Pack {pack.pack_id}: not found on Signal")
+                continue
+            if isinstance(result, SignalInvalidPack):
+                stats["invalid"] += 1
+                self.stdout.write(f"Pack {pack.pack_id}: invalid key or content")
+                continue
+            if isinstance(result, SignalError):
+                stats["errors"] += 1
+                self.stdout.write(f"Pack {pack.pack_id}: {result}")
+                continue
+
+            before = [getattr(pack, field) for field in SIGNAL_FIELDS]
+            try:
+                pack.update_from_signal(result)
+            except ValidationError as exc:
+                stats["invalid"] += 1
+                self.stdout.write(f"Pack {pack.pack_id}: {exc.message}")
+                continue
+            if [getattr(pack, field) for field in SIGNAL_FIELDS] != before:
+                updated_packs.append(pack)
+
+        if not updated_packs:
+            return
+
+        # bulk_update() does not send signals
+        with transaction.atomic():
+            Pack.objects.bulk_update(updated_packs, SIGNAL_FIELDS)
+            Pack.objects.update_search_vectors([pack.id for pack in updated_packs])
+            CatalogChange.objects.record(
+                pack.pack_id
+                for pack in updated_packs
+                if pack.status == PackStatus.ONLINE.name
+            )
+        bump_catalog_version()
+        stats["updated"] += len(updated_packs)
+
+    @staticmethod
+    def _load_checkpoint(path):
+        if path and path.exists():
+            return json.loads(path.read_text(encoding="utf-8"))["last_id"]
+        return 0
+
+    @staticmethod
+    def _save_checkpoint(path, last_id):
+        if path:
+            tmp_path = path.with_name(f"{path.name}.tmp")
+            tmp_path.write_text(json.dumps({"last_id": last_id}), encoding="utf-8")
+            tmp_path.replace(path)
@@ -0,0 +1,61 @@
+# Generated by Django 5.2.14 on 2026-10-18 10:12
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0012_aireview"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="PackMonthlyStat",
+            fields=[
+                (
+                    "id",
+                    models.AutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("month", models.CharField(max_length=7)),
+                ("views", models.PositiveIntegerField(default=0)),
+                (
+                    "pack",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="monthly_stats",
+                        to="core.pack",
+                    ),
+                ),
+            ],
+            options={
+                "db_table": "pack_monthly_stats",
+                "default_permissions": (),
+                "indexes": [
+                    models.Index(
+                        fields=["month", "-views"], name="pack_monthly_stats_top"
+                    )
+                ],
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("pack", "month"), name="pack_monthly_stats_pack_month"
+                    )
+                ],
+            },
+        ),
+        # Backfill from the packs' stats JSON
+        migrations.RunSQL(
+            sql="""
+            INSERT INTO pack_monthly_stats (pack_id, month, views)
+            SELECT packs.id, stats.key, stats.value::integer
+            FROM packs, jsonb_each_text(packs.stats) AS stats
+            """,
+            reverse_sql=migrations.RunSQL.noop,
+        ),
+    ]
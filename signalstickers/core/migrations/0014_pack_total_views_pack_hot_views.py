@@ -0,0 +1,44 @@
+# Generated by Django 5.2.14 on 2026-10-18 11:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0013_packmonthlystat"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="pack",
+            name="total_views",
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name="pack",
+            name="hot_views",
+            field=models.PositiveIntegerField(default=0),
+        ),
+        # Backfill from the monthly stats
+        migrations.RunSQL(
+            sql="""
+            UPDATE packs SET
+                total_views = COALESCE(
+                    (SELECT SUM(views) FROM pack_monthly_stats
+                     WHERE pack_monthly_stats.pack_id = packs.id),
+                    0
+                ),
+                hot_views = COALESCE(
+                    (SELECT SUM(views) FROM pack_monthly_stats
+                     WHERE pack_monthly_stats.pack_id = packs.id
+                     AND month IN (
+                        to_char(now(), 'YYYY_MM'),
+                        to_char(date_trunc('month', now()) - interval '1 day', 'YYYY_MM')
+                     )),
+                    0
+                )
+            """,
+            reverse_sql=migrations.RunSQL.noop,
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 5.2.14 on 2026-10-18 11:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0014_pack_total_views_pack_hot_views"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="pack",
+            index=models.Index(
+                condition=models.Q(("status", "ONLINE")),
+                fields=["-total_views", "-id"],
+                name="packs_online_popular",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="pack",
+            index=models.Index(
+                condition=models.Q(("status", "ONLINE")),
+                fields=["-hot_views", "-id"],
+                name="packs_online_hot",
+            ),
+        ),
+    ]
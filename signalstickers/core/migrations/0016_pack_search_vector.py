@@ -0,0 +1,43 @@
+# Generated by Django 5.2.14 on 2026-10-18 12:05
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0015_pack_online_sort_indexes"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="pack",
+            name="search_vector",
+            field=django.contrib.postgres.search.SearchVectorField(
+                editable=False, null=True
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="pack",
+            index=django.contrib.postgres.indexes.GinIndex(
+                fields=["search_vector"], name="packs_search_vector"
+            ),
+        ),
+        # Backfill, same as PackManager.update_search_vectors()
+        migrations.RunSQL(
+            sql="""
+            UPDATE packs SET search_vector =
+                setweight(to_tsvector('simple', COALESCE(title, '')), 'A')
+                || setweight(to_tsvector('simple', COALESCE(
+                    (SELECT string_agg(tags.name, ' ') FROM packs_tags
+                     JOIN tags ON tags.id = packs_tags.tag_id
+                     WHERE packs_tags.pack_id = packs.id),
+                    ''
+                )), 'B')
+                || setweight(to_tsvector('simple', COALESCE(author, '')), 'C')
+            """,
+            reverse_sql=migrations.RunSQL.noop,
+        ),
+    ]
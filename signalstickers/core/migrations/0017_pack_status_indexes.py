@@ -0,0 +1,33 @@
+# Generated by Django 5.2.14 on 2026-10-18 21:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0016_pack_search_vector"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="pack",
+            index=models.Index(fields=["status", "-id"], name="packs_status_id"),
+        ),
+        migrations.AddIndex(
+            model_name="pack",
+            index=models.Index(
+                condition=models.Q(("status", "ONLINE")),
+                fields=["-id"],
+                name="packs_online_newest",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="pack",
+            index=models.Index(
+                condition=models.Q(("editorschoice", True)),
+                fields=["-id"],
+                name="packs_editorschoice",
+            ),
+        ),
+    ]
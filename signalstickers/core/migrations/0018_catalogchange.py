@@ -0,0 +1,25 @@
+# Generated by Django 5.2.14 on 2026-10-18 16:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0017_pack_status_indexes"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="CatalogChange",
+            fields=[
+                ("id", models.BigAutoField(primary_key=True, serialize=False)),
+                ("pack_id", models.CharField(db_index=True, max_length=32)),
+                ("changed_at", models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                "db_table": "catalog_changes",
+                "default_permissions": (),
+            },
+        ),
+    ]
@@ -2,6 +2,7 @@ from core.models.admin_permissions import AdminPermissions
 from core.models.ai_review import AIReview, AIReviewStatus
 from core.models.api_key import ApiKey
 from core.models.bot_prevention_questions import BotPreventionQuestion
+from core.models.catalog_change import CatalogChange
 from core.models.contribution_request import ContributionRequest
 from core.models.logs_utils import (
     LOG_ADDITION,
@@ -11,8 +12,9 @@ from core.models.logs_utils import (
     LOGENTRY_TEXT,
     AdminAction,
 )
-from core.models.pack import Pack
+from core.models.pack import PACK_ORDERINGS, Pack
 from core.models.pack_animated_mode import PackAnimatedMode
+from core.models.pack_monthly_stat import PackMonthlyStat
 from core.models.pack_status import PackStatus
 from core.models.report import Report, ReportStatus
 from core.models.site_stat import SiteStat
@@ -0,0 +1,83 @@
+from core.models.pack import Pack
+from django.db import connection, models, transaction
+from django.db.models import Exists, Max, OuterRef
+
+# Key of the advisory lock serializing the transactions recording changes
+CHANGES_LOCK_KEY = 0x636174616C6F67  # "catalog"
+
+
+class CatalogChangeManager(models.Manager):
+    def record(self, pack_ids):
+        """
+        Record a change of the packs `pack_ids` (Signal pack ids). The
+        transactions recording changes are serialized until they are committed,
+        so that changes become visible in the order of their sequence numbers:
+        a client never skips a change committed after it synced.
+        """
+        pack_ids = set(pack_ids)
+        if not pack_ids:
+            return
+        with transaction.atomic():
+            with connection.cursor() as cursor:
+                cursor.execute("SELECT pg_advisory_xact_lock(%s)", [CHANGES_LOCK_KEY])
+            CatalogChange.objects.bulk_create(
+                [CatalogChange(pack_id=pack_id) for pack_id in sorted(pack_ids)]
+            )
+
+    def last_seq(self):
+        return CatalogChange.objects.aggregate(last=Max("id"))["last"] or 0
+
+    def since(self, seq):
+        """
+        Return the changes of the catalog after the sequence number `seq`, as
+        (last sequence number, ONLINE packs changed, ids of the packs removed).
+        Only the changes of packs ONLINE (before or after the change) are
+        recorded: the packs removed are packs that left the catalog. Packs are
+        returned as they are now. With `seq` 0, all the ONLINE packs are
+        returned, and no removals.
+        """
+        last_seq = self.last_seq()
+        if not seq:
+            return last_seq, list(Pack.objects.onlines()), []
+
+        pack_ids = set(
+            CatalogChange.objects.filter(id__gt=seq, id__lte=last_seq).values_list(
+                "pack_id", flat=True
+            )
+        )
+        upserts = list(Pack.objects.onlines().filter(pack_id__in=pack_ids))
+        removals = sorted(pack_ids - {pack.pack_id for pack in upserts})
+        return last_seq, upserts, removals
+
+    def compact(self):
+        """
+        Delete the changes followed by a later change of the same pack: only
+        the last change of each pack matters. Return the number of changes
+        deleted.
+        """
+        later_change = CatalogChange.objects.filter(
+            pack_id=OuterRef("pack_id"), id__gt=OuterRef("id")
+        )
+        nb_deleted, _ = CatalogChange.objects.filter(Exists(later_change)).delete()
+        return nb_deleted
+
+
+class CatalogChange(models.Model):
+    """
+    Change of a pack shown in the catalog (approval, refusal, edition, deletion,
+    tags...). The id is the sequence number of the change. Views counters are
+    not changes.
+    """
+
+    objects = CatalogChangeManager()
+
+    id = models.BigAutoField(primary_key=True)
+    pack_id = models.CharField(max_length=32, db_index=True)
+    changed_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        db_table = "catalog_changes"
+        default_permissions = ()
+
+    def __str__(self):
+        return f"Change {self.id} of pack {self.pack_id}"
@@ -1,8 +1,10 @@
+from core.cdn import get_last_auto_purge
 from django.contrib.admin.models import ADDITION as logentry_add
 from django.contrib.admin.models import CHANGE as logentry_change
 from django.contrib.admin.models import DELETION as logentry_deletion
 from django.contrib.admin.models import LogEntry
 from django.contrib.contenttypes.models import ContentType
+from django.core.cache import cache
 from django.db import models
 from django.db.models import Q
 
@@ -14,6 +16,8 @@ LOG_CHANGE = logentry_change
 LOG_DELETION = logentry_deletion
 LOG_CLEAR_CACHES = 13371
 
+CACHES_STATE_KEY = "admin:caches_state"
+
 LOGENTRY_TEXT = {
     LOG_ADDITION: "Added",
     LOG_CHANGE: "Changed",
@@ -31,28 +35,54 @@ class AdminAction(models.Model):
         managed = False
 
     @staticmethod
-    def caches_dirty():
-        try:
-            last_cleared_date = (
-                LogEntry.objects.filter(
-                    action_flag=LOG_CLEAR_CACHES,
-                    change_message__icontains='"success":true',
-                )
-                .order_by("action_time")
-                .last()
-                .action_time
-            )
+    def caches_state():
+        """
+        Return (last change of a pack or a tag in the admin, last successful
+        manual clear of the caches), each one None if there is none. Read from
+        LogEntry, and cached until the next LogEntry is saved.
+        """
+        state = cache.get(CACHES_STATE_KEY)
+        if state is not None:
+            return state
 
-            last_modification = (
-                LogEntry.objects.filter(
-                    Q(content_type=ContentType.objects.get_for_model(Pack).pk)
-                    | Q(content_type=ContentType.objects.get_for_model(Tag).pk)
-                )
-                .order_by("action_time")
-                .last()
-                .action_time
+        last_cleared = (
+            LogEntry.objects.filter(
+                action_flag=LOG_CLEAR_CACHES,
+                change_message__icontains='"success":true',
             )
+            .order_by("action_time")
+            .last()
+        )
+        last_modification = (
+            LogEntry.objects.filter(
+                Q(content_type=ContentType.objects.get_for_model(Pack).pk)
+                | Q(content_type=ContentType.objects.get_for_model(Tag).pk)
+            )
+            .order_by("action_time")
+            .last()
+        )
+        state = (
+            last_modification.action_time if last_modification else None,
+            last_cleared.action_time if last_cleared else None,
+        )
+        cache.set(CACHES_STATE_KEY, state, None)
+        return state
+
+    @staticmethod
+    def clear_caches_state():
+        cache.delete(CACHES_STATE_KEY)
+
+    @staticmethod
+    def caches_dirty():
+        last_modification, last_cleared_date = AdminAction.caches_state()
+
+        # Caches are also purged automatically on changes
+        last_auto_purge = get_last_auto_purge()
+        if last_auto_purge and (
+            last_cleared_date is None or last_auto_purge["time"] > last_cleared_date
+        ):
+            last_cleared_date = last_auto_purge["time"]
 
-            return last_modification > last_cleared_date
-        except AttributeError:
+        if last_modification is None or last_cleared_date is None:
             return None
+        return last_modification > last_cleared_date
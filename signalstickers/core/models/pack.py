@@ -1,7 +1,8 @@
-from base64 import b64encode
+from collections import defaultdict
 import re
 
 from core.models.pack_animated_mode import PackAnimatedMode
+from core.models.pack_monthly_stat import PackMonthlyStat
 from core.models.pack_status import PackStatus
 from core.models.tag import Tag
 from core.utils import (
@@ -10,11 +11,62 @@ from core.utils import (
     get_last_month_ym_date,
     get_pack_from_signal,
 )
+from django.contrib.postgres.aggregates import StringAgg
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import (
+    SearchQuery,
+    SearchRank,
+    SearchVector,
+    SearchVectorField,
+)
 from django.core.exceptions import ValidationError
 from django.core.validators import RegexValidator
-from django.db import models, transaction
-from django.db.models import Prefetch, Sum
-from django.db.models.expressions import RawSQL
+from django.db import connection, models, transaction
+from django.db.models import F, OuterRef, Prefetch, Q, Subquery, Sum
+from django.db.models.functions import Coalesce
+
+# Fields updated along with the views counters
+STATS_FIELDS = frozenset({"stats", "total_views", "hot_views"})
+
+# Fields computed from the pack on Signal, see `Pack.update_from_signal()`
+SIGNAL_FIELDS = ("title", "author", "id_cover", "animated_detected", "animated")
+
+# Sort orders of the paginated list of packs (all descending), with the columns
+# of their keyset: the last one is unique, so that the order is total.
+PACK_ORDERINGS = {
+    "newest": ("id",),
+    "popular": ("total_views", "id"),
+    "hot": ("hot_views", "id"),
+}
+
+
+# Text search configuration: packs are in many languages, so no stemming
+SEARCH_CONFIG = "simple"
+
+
+def _hot_months():
+    return get_current_ym_date(), get_last_month_ym_date()
+
+
+def _sum_views_subquery(monthly_stats):
+    return Subquery(
+        monthly_stats.values("pack").annotate(total=Sum("views")).values("total")
+    )
+
+
+def _search_vector():
+    tag_names = (
+        Tag.objects.filter(packs=OuterRef("pk"))
+        .order_by()
+        .values("packs")
+        .annotate(names=StringAgg("name", delimiter=" "))
+        .values("names")
+    )
+    return (
+        SearchVector("title", weight="A", config=SEARCH_CONFIG)
+        + SearchVector(Subquery(tag_names), weight="B", config=SEARCH_CONFIG)
+        + SearchVector("author", weight="C", config=SEARCH_CONFIG)
+    )
 
 
 class PackManager(models.Manager):
@@ -23,13 +75,34 @@ class PackManager(models.Manager):
         Return only packs "ONLINE", last packs first.
         """
         return (
-            Pack.objects.filter(status=PackStatus.ONLINE.name).order_by("-id")
-            # .prefetch_related("tags")
+            Pack.objects.filter(status=PackStatus.ONLINE.name)
+            .order_by("-id")
+            .defer("stats")
             .prefetch_related(
                 Prefetch("tags", queryset=Tag.objects.all().order_by("name"))
             )
         )
 
+    def onlines_sorted(self, sort, after=None):
+        """
+        Return ONLINE packs sorted by `sort` (see `PACK_ORDERINGS`). If `after`
+        is set (as returned by `Pack.keyset()`), only return the packs that come
+        after it, so that pages can be fetched using the indexes, whatever their
+        depth.
+        """
+        fields = PACK_ORDERINGS[sort]
+        packs = self.onlines().order_by(*(f"-{field}" for field in fields))
+        if after is None:
+            return packs
+
+        # (a, b) < (x, y)  <=>  a < x OR (a = x AND b < y)
+        keyset_filter = Q()
+        for i, field in enumerate(fields):
+            keyset_filter |= Q(
+                **dict(zip(fields[:i], after[:i])), **{f"{field}__lt": after[i]}
+            )
+        return packs.filter(keyset_filter)
+
     def in_review(self):
         """
         Return packs with status "IN REVIEW".
@@ -62,13 +135,117 @@ class PackManager(models.Manager):
         """
         return Pack.objects.escalated().count()
 
+    def increment_views(self, pack_id, month=None, count=1):
+        """
+        Add `count` views to the pack `pack_id` for the given `month` (YYYY_MM,
+        defaults to the current month), in a single atomic statement that only
+        touches the views columns (and the monthly stats row). Return the number
+        of packs updated (0 if the pack does not exist).
+        """
+        month = month or get_current_ym_date()
+        hot_count = count if month in _hot_months() else 0
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "WITH updated AS ("
+                "UPDATE packs SET stats = jsonb_set("
+                "COALESCE(stats, '{}'::jsonb), %s, "
+                "to_jsonb(COALESCE((stats->>%s)::integer, 0) + %s)), "
+                "total_views = total_views + %s, hot_views = hot_views + %s "
+                "WHERE pack_id = %s RETURNING id) "
+                "INSERT INTO pack_monthly_stats (pack_id, month, views) "
+                "SELECT id, %s, %s FROM updated "
+                "ON CONFLICT (pack_id, month) "
+                "DO UPDATE SET views = pack_monthly_stats.views + EXCLUDED.views",
+                [[month], month, count, count, hot_count, pack_id, month, count],
+            )
+            return cursor.rowcount
+
+    def bulk_increment_views(self, views):
+        """
+        Add views to many packs at once. `views` maps (pack_id, month) to a
+        number of views. Issue a single statement per month.
+        """
+        views_by_month = defaultdict(list)
+        for (pack_id, month), count in views.items():
+            views_by_month[month].extend((pack_id, count))
+
+        with connection.cursor() as cursor:
+            for month, values in views_by_month.items():
+                placeholders = ", ".join(["(%s, %s)"] * (len(values) // 2))
+                cursor.execute(
+                    f"WITH v(pack_id, views) AS (VALUES {placeholders}), "  # nosec
+                    "updated AS ("
+                    "UPDATE packs SET stats = jsonb_set("
+                    "COALESCE(packs.stats, '{}'::jsonb), %s, "
+                    "to_jsonb(COALESCE((packs.stats->>%s)::integer, 0) + v.views)), "
+                    "total_views = packs.total_views + v.views, "
+                    "hot_views = packs.hot_views + v.views * %s "
+                    "FROM v WHERE packs.pack_id = v.pack_id "
+                    "RETURNING packs.id, v.views) "
+                    "INSERT INTO pack_monthly_stats (pack_id, month, views) "
+                    "SELECT id, %s, views FROM updated "
+                    "ON CONFLICT (pack_id, month) "
+                    "DO UPDATE SET views = pack_monthly_stats.views + EXCLUDED.views",
+                    [*values, [month], month, int(month in _hot_months()), month],
+                )
+
+    def refresh_views(self, pack_ids=None):
+        """
+        Recompute `total_views` and `hot_views` from the monthly stats, for the
+        packs `pack_ids` (database ids; all packs if None). To be run when the
+        month changes, as hot views only count this month and last month.
+        """
+        packs = Pack.objects.all()
+        if pack_ids is not None:
+            packs = packs.filter(id__in=pack_ids)
+        monthly_stats = PackMonthlyStat.objects.filter(pack=OuterRef("pk"))
+        packs.update(
+            total_views=Coalesce(_sum_views_subquery(monthly_stats), 0),
+            hot_views=Coalesce(
+                _sum_views_subquery(monthly_stats.filter(month__in=_hot_months())),
+                0,
+            ),
+        )
+
+    def update_search_vectors(self, pack_ids=None):
+        """
+        Recompute the search vector (title, tags and author) of the packs
+        `pack_ids` (database ids; all packs if None).
+        """
+        packs = Pack.objects.all()
+        if pack_ids is not None:
+            packs = packs.filter(id__in=pack_ids)
+        packs.update(search_vector=_search_vector())
+
+    def search(self, text, packs=None):
+        """
+        Return the packs among `packs` (all packs if None) whose title, tags or
+        author contain words starting with the words of `text`, best matches
+        first.
+        """
+        packs = Pack.objects.all() if packs is None else packs
+        words = re.findall(r"\w+", text.lower())
+        if not words:
+            return packs.none()
+
+        query = SearchQuery(
+            " & ".join(f"{word}:*" for word in words),
+            search_type="raw",
+            config=SEARCH_CONFIG,
+        )
+        return (
+            packs.filter(search_vector=query)
+            .annotate(rank=SearchRank(F("search_vector"), query))
+            .order_by("-rank", "-id")
+        )
+
     def most_popular_for_month(self, month, nbr=10):
         """
         Return the top `nbr` packs for a given `month` (YYYY_MM)
         """
         return (
-            Pack.objects.filter(stats__has_key=month)
-            .annotate(stats_month=RawSQL("stats->%s", (month,)))
+            Pack.objects.filter(monthly_stats__month=month)
+            .annotate(stats_month=F("monthly_stats__views"))
             .order_by("-stats_month")[:nbr]
         )
 
@@ -76,38 +253,22 @@ class PackManager(models.Manager):
         """
         Return the total pack views for a given `month` (YYYY_MM)
         """
-        return (
-            Pack.objects.filter(stats__has_key=month)
-            .annotate(views_month=RawSQL("(stats->%s)::INTEGER", (month,)))
-            .aggregate(Sum("views_month"))["views_month__sum"]
-        )
+        return PackMonthlyStat.objects.filter(month=month).aggregate(
+            total=Sum("views")
+        )["total"]
 
     def most_viewed_packs(self, nbr=10):
         """
         Return the `nbr` most viewed packs ever
         """
-        # TODO do this with aggregation in DB
-        packs = Pack.objects.all()
-        all_packs_sumviews = []
-        for pack in packs:
-            all_packs_sumviews.append({"pack": pack, "views": sum(pack.stats.values())})
-
-        return sorted(all_packs_sumviews, key=lambda k: k["views"], reverse=True)[:nbr]
+        packs = Pack.objects.order_by("-total_views", "id").defer("stats")[:nbr]
+        return [{"pack": pack, "views": pack.total_views} for pack in packs]
 
     def total_packviews(self):
         """
         Return pack views by month for all month
         """
-        # TODO do this with aggregation in DB
-        stats = Pack.objects.all().values("stats")
-        stats_month = {}
-        for pack_stats in stats:
-            for month, stats in pack_stats["stats"].items():
-                if month in stats_month:
-                    stats_month[month] += stats
-                else:
-                    stats_month[month] = stats
-        return stats_month
+        return PackMonthlyStat.objects.views_by_month()
 
     def new(
         self,
@@ -153,13 +314,9 @@ class PackManager(models.Manager):
         with transaction.atomic():
             pack.save()
 
-            tags_obj_list = []
-            for tag in tags:
-                tag_obj, _ = Tag.objects.get_or_create(name=tag.lower())
-                tags_obj_list.append(tag_obj)
-
-            if tags_obj_list:
-                pack.tags.add(*tags_obj_list)
+            tag_ids = Tag.objects.resolve(tags)
+            if tag_ids:
+                pack.tags.add(*tag_ids)
 
         return pack
 
@@ -167,6 +324,13 @@ class PackManager(models.Manager):
 class Pack(models.Model):
     objects = PackManager()
 
+    # Status in DB, to tell whether saving the pack changes the catalog: set
+    # when the pack is loaded or saved, None for new packs
+    _loaded_status = None
+    # Stats as loaded or saved: a full save only writes the stats (and the views
+    # counters) if they were changed since
+    _loaded_stats = None
+
     # Pack info
     pack_id = models.CharField(
         max_length=32,
@@ -213,6 +377,12 @@ class Pack(models.Model):
 
     # Stats
     stats = models.JSONField(default=dict, blank=True, null=True)
+    # Computed from stats, and updated along with them
+    total_views = models.PositiveIntegerField(default=0)
+    hot_views = models.PositiveIntegerField(default=0)  # this month and last month
+
+    # Search, computed from the title, the author and the tags
+    search_vector = SearchVectorField(null=True, editable=False)
 
     # Review
     status = models.CharField(
@@ -223,31 +393,106 @@ class Pack(models.Model):
     status_comments = models.TextField(blank=True)
     submitter_comments = models.TextField(blank=True)
 
-    @property
-    def total_views(self):
-        """
-        Return the total number of views for the current pack
-        TODO do this with aggregation in DB
-        """
-        return sum(self.stats.values())
-
-    @property
-    def hot_views(self):
-        """
-        Return the number of views from this month and last month for the
-        current pack
-        TODO do this with aggregation in DB
-        """
-        this_month_views = self.stats.get(get_current_ym_date(), 0)
-        last_month_views = self.stats.get(get_last_month_ym_date(), 0)
-        return this_month_views + last_month_views
-
     class Meta:
         db_table = "packs"
+        indexes = [
+            # In review, escalated... packs, and their counts
+            models.Index(fields=["status", "-id"], name="packs_status_id"),
+            models.Index(
+                fields=["-id"],
+                name="packs_online_newest",
+                condition=Q(status=PackStatus.ONLINE.name),
+            ),
+            models.Index(
+                fields=["-id"],
+                name="packs_editorschoice",
+                condition=Q(editorschoice=True),
+            ),
+            models.Index(
+                fields=["-total_views", "-id"],
+                name="packs_online_popular",
+                condition=Q(status=PackStatus.ONLINE.name),
+            ),
+            models.Index(
+                fields=["-hot_views", "-id"],
+                name="packs_online_hot",
+                condition=Q(status=PackStatus.ONLINE.name),
+            ),
+            GinIndex(fields=["search_vector"], name="packs_search_vector"),
+        ]
 
     def __str__(self):
         return self.title
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        pack = super().from_db(db, field_names, values)
+        # pylint: disable=protected-access
+        if "status" in field_names:
+            pack._loaded_status = pack.status
+        else:
+            # Deferred: the pack is assumed to have been ONLINE
+            pack._loaded_status = PackStatus.ONLINE.name
+        if "stats" in field_names:
+            pack._loaded_stats = dict(pack.stats or {})
+        return pack
+
+    def refresh_from_db(self, using=None, fields=None, from_queryset=None):
+        super().refresh_from_db(using, fields, from_queryset)
+        if fields is None or "stats" in fields:
+            self._loaded_stats = dict(self.stats or {})
+
+    def is_in_catalog(self):
+        """
+        Return whether the pack is ONLINE, or was before its last save: its
+        changes are catalog changes. If its former status is unknown (deferred
+        when loaded), the pack is assumed to have been ONLINE.
+        """
+        return PackStatus.ONLINE.name in (self.status, self._loaded_status)
+
+    def save(self, *args, **kwargs):
+        update_fields = kwargs.get("update_fields")
+        if update_fields is None:
+            stats_changed = self._state.adding or self._stats_changed()
+            if not stats_changed:
+                # Views are counted by atomic updates (`increment_views()`): the
+                # stats loaded with the pack may be outdated, and are not written
+                deferred = self.get_deferred_fields()
+                kwargs["update_fields"] = [
+                    field.name
+                    for field in self._meta.concrete_fields
+                    if not field.primary_key
+                    and field.name not in STATS_FIELDS
+                    and field.attname not in deferred
+                ]
+        else:
+            stats_changed = "stats" in update_fields
+
+        if stats_changed:
+            stats = self.stats or {}
+            self.total_views = sum(stats.values())
+            self.hot_views = sum(stats.get(month, 0) for month in _hot_months())
+            if update_fields is not None:
+                kwargs["update_fields"] = {*update_fields, *STATS_FIELDS}
+
+        # The row lock taken by the save holds back the concurrent views updates
+        # (`increment_views()`) until the monthly stats are rebuilt
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            if stats_changed:
+                PackMonthlyStat.objects.sync_from_packs([self.id])
+        self._loaded_status = self.status
+        if stats_changed:
+            self._loaded_stats = dict(self.stats or {})
+
+    def _stats_changed(self):
+        """
+        Return whether the stats were set on the pack since it was loaded.
+        """
+        if "stats" in self.get_deferred_fields():
+            return False
+        return self._loaded_stats is None or self.stats != self._loaded_stats
+
     def clean(self):
 
         # Basic validation
@@ -265,6 +510,13 @@ class Pack(models.Model):
         if not pack:
             raise ValidationError("The pack does not exists on Signal, or is invalid.")
 
+        self.update_from_signal(pack)
+
+    def update_from_signal(self, pack):
+        """
+        Update the fields computed from `pack`, as fetched from Signal. Raise a
+        `ValidationError` if the pack is invalid.
+        """
         self.title = pack.title
         self.author = pack.author
         self.id_cover = pack.cover.id
@@ -287,22 +539,23 @@ class Pack(models.Model):
     @property
     def stickers_preview(self):  # pragma: no cover
         """
-        Return a list of all stickers image data and their emoji. Used for
-        viewing packs in the admin panel.
-        TODO cache the images
+        Return the ids and emojis of the stickers, as a list of dicts {id,
+        emoji}. Used for viewing packs in the admin panel, where images are
+        served as thumbnails.
         """
-        stickers = []  # contains dict {emoji, img}
         pack = get_pack_from_signal(self.pack_id, self.pack_key)
 
         if not pack:
-            return {}
+            return []
 
-        for sticker in pack.stickers:
-            stickers.append(
-                {"emoji": sticker.emoji, "img": b64encode(sticker.image_data).decode()}
-            )
+        return [{"id": sticker.id, "emoji": sticker.emoji} for sticker in pack.stickers]
 
-        return stickers
+    def keyset(self, sort):
+        """
+        Return the values of the keyset columns of `sort` for this pack, to
+        fetch the packs that come after it (see `PackManager.onlines_sorted()`).
+        """
+        return [getattr(self, field) for field in PACK_ORDERINGS[sort]]
 
     def get_model_name(self):
         return self._meta.model_name
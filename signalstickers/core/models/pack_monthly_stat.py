@@ -0,0 +1,71 @@
+from django.db import connection, models, transaction
+from django.db.models import Sum
+
+# Rebuild `pack_monthly_stats` rows from the `stats` JSON of the packs
+SYNC_FROM_PACKS_SQL = """
+INSERT INTO pack_monthly_stats (pack_id, month, views)
+SELECT packs.id, stats.key, stats.value::integer
+FROM packs, jsonb_each_text(packs.stats) AS stats
+"""
+
+
+class PackMonthlyStatManager(models.Manager):
+    def sync_from_packs(self, pack_ids=None):
+        """
+        Rebuild the monthly stats of the packs `pack_ids` (database ids; all
+        packs if None) from their `stats` JSON, in a transaction: the rows of a
+        pack are never seen missing.
+        """
+        with transaction.atomic(), connection.cursor() as cursor:
+            if pack_ids is None:
+                cursor.execute("DELETE FROM pack_monthly_stats")
+                cursor.execute(SYNC_FROM_PACKS_SQL)
+            else:
+                cursor.execute(
+                    "DELETE FROM pack_monthly_stats WHERE pack_id = ANY(%s)",
+                    [list(pack_ids)],
+                )
+                cursor.execute(
+                    SYNC_FROM_PACKS_SQL + "WHERE packs.id = ANY(%s)", [list(pack_ids)]
+                )
+
+    def views_by_month(self):
+        """
+        Return the total pack views by month
+        """
+        return dict(
+            PackMonthlyStat.objects.values("month")
+            .annotate(total=Sum("views"))
+            .order_by("month")
+            .values_list("month", "total")
+        )
+
+
+class PackMonthlyStat(models.Model):
+    """
+    Views of a pack for a month. Kept in sync with `Pack.stats`, to compute
+    stats with aggregations in DB.
+    """
+
+    objects = PackMonthlyStatManager()
+
+    pack = models.ForeignKey(
+        "core.pack", on_delete=models.CASCADE, related_name="monthly_stats"
+    )
+    month = models.CharField(max_length=7)  # YYYY_MM
+    views = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        db_table = "pack_monthly_stats"
+        default_permissions = ()
+        constraints = [
+            models.UniqueConstraint(
+                fields=["pack", "month"], name="pack_monthly_stats_pack_month"
+            )
+        ]
+        indexes = [
+            models.Index(fields=["month", "-views"], name="pack_monthly_stats_top"),
+        ]
+
+    def __str__(self):
+        return f"Stats for {self.pack_id} ({self.month})"
@@ -1,7 +1,26 @@
 from django.db import models
+from django.db.models import F
 
 
 class SiteStatsManager(models.Manager):
+    def increment_visits(self, month, count=1):
+        """
+        Add `count` visits for the given `month` (YYYY_MM), without reading
+        the current value.
+        """
+        updated = SiteStat.objects.filter(month=month).update(
+            visits=F("visits") + count
+        )
+        if updated:
+            return
+
+        _, created = SiteStat.objects.get_or_create(
+            month=month, defaults={"visits": count}
+        )
+        if not created:
+            # Created by a concurrent request in the meantime
+            SiteStat.objects.filter(month=month).update(visits=F("visits") + count)
+
     def get_visits_by_month(self):
         return {
             data["month"]: data["visits"]
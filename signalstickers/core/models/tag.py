@@ -1,7 +1,119 @@
-from django.db import models
+from collections import OrderedDict
+import threading
+import uuid
+
+from django.core.cache import cache
+from django.db import models, transaction
+
+TAGS_VERSION_KEY = "tags:version"
+
+# Tag names already resolved by this process are cached (see `TagIdsCache`)
+TAG_IDS_CACHE_SIZE = 10_000
+
+
+class TagIdsCache:
+    """
+    Tag names already resolved by this process (name -> id), least recently used
+    first. Tags are renamed or deleted seldom: the whole cache is dropped when
+    the version stored in `TAGS_VERSION_KEY` (shared by all workers) changes.
+    """
+
+    def __init__(self, size):
+        self.size = size
+        self.ids = OrderedDict()
+        self.version = None
+        self.lock = threading.Lock()
+
+    def get(self, names, version):
+        """
+        Return the cached ids of the tags `names`, as a dict.
+        """
+        with self.lock:
+            if version != self.version:
+                self.ids.clear()
+                self.version = version
+            tag_ids = {}
+            for name in names:
+                if name in self.ids:
+                    self.ids.move_to_end(name)
+                    tag_ids[name] = self.ids[name]
+            return tag_ids
+
+    def put(self, tag_ids, version):
+        with self.lock:
+            if version != self.version:
+                return
+            self.ids.update(tag_ids)
+            while len(self.ids) > self.size:
+                self.ids.popitem(last=False)
+
+    def discard(self, names):
+        with self.lock:
+            for name in names:
+                self.ids.pop(name, None)
+
+
+_tag_ids = TagIdsCache(TAG_IDS_CACHE_SIZE)
+
+
+def normalize_tag_name(name):
+    return str(name).strip().lower()
+
+
+class TagManager(models.Manager):
+    def resolve(self, names):
+        """
+        Return the ids of the tags `names`, creating the missing ones. Names
+        are normalized and deduplicated (the first occurrence is kept), and
+        empty names are ignored. Safe against concurrent creations of the same
+        tag.
+        """
+        names = [normalize_tag_name(name) for name in names]
+        names = [name for name in dict.fromkeys(names) if name]
+        if not names:
+            return []
+
+        version = cache.get_or_set(TAGS_VERSION_KEY, lambda: uuid.uuid4().hex, None)
+        tag_ids = _tag_ids.get(names, version)
+        if tag_ids:
+            # Tags may be deleted or renamed without signals (raw SQL, restores):
+            # the cached ids still in the database are checked in one query
+            existing = set(
+                self.filter(id__in=list(tag_ids.values())).values_list("name", "id")
+            )
+            stale = [name for name in tag_ids if (name, tag_ids[name]) not in existing]
+            _tag_ids.discard(stale)
+            for name in stale:
+                del tag_ids[name]
+
+        missing = [name for name in names if name not in tag_ids]
+        if missing:
+            # Tags created meanwhile by another request are fetched back below
+            self.bulk_create(
+                [Tag(name=name) for name in missing], ignore_conflicts=True
+            )
+            fetched = dict(self.filter(name__in=missing).values_list("name", "id"))
+            tag_ids.update(fetched)
+            # Tags created by a transaction rolled back later must not be cached
+            transaction.on_commit(lambda: _tag_ids.put(fetched, version))
+
+        return [tag_ids[name] for name in names]
+
+    @staticmethod
+    def invalidate_cache():
+        """
+        Drop the name -> id cache of all processes. To be called when a tag is
+        renamed or deleted. Dropped again once the current transaction is
+        committed, as other processes may have cached the uncommitted names.
+        """
+        cache.set(TAGS_VERSION_KEY, uuid.uuid4().hex, None)
+        transaction.on_commit(
+            lambda: cache.set(TAGS_VERSION_KEY, uuid.uuid4().hex, None)
+        )
 
 
 class Tag(models.Model):
+    objects = TagManager()
 
     name = models.CharField(max_length=128, unique=True)
 
@@ -10,7 +122,7 @@ class Tag(models.Model):
         ordering = ["name"]
 
     def save(self, *args, **kwargs):
-        self.name = self.name.strip().lower()
+        self.name = normalize_tag_name(self.name)
         super().save(*args, **kwargs)
 
     def __str__(self):
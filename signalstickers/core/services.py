@@ -3,6 +3,7 @@ import logging
 import random
 import re
 
+from core.cdn import cloudflare_purge
 from core.models import ApiKey, BotPreventionQuestion, ContributionRequest, Pack
 from django.conf import settings
 from django.contrib.admin.models import LogEntry
@@ -10,7 +11,6 @@ from django.contrib.auth import get_user_model
 from django.core.exceptions import ObjectDoesNotExist
 from django.core.mail import EmailMessage
 from django.utils.timezone import now
-import requests
 
 logger = logging.getLogger("main")
 
@@ -26,26 +26,18 @@ def clear_contribution_requests():
 
 def invalidate_cdn():
     """
-    Send an invalidation request to the CDN
+    Send an invalidation request to the CDN, for the whole zone. Prefer the
+    targeted purges of `core.cdn`.
     """
 
     try:
-
-        url = f'https://api.cloudflare.com/client/v4/zones/{settings.CLOUDFLARE_CONF["zone_id"]}/purge_cache'
-        headers = {"Authorization": f'Bearer {settings.CLOUDFLARE_CONF["token"]}'}
-        data = {"purge_everything": True}
-
-        resp = requests.post(url, json=data, headers=headers, timeout=45)
-
-        if resp.status_code not in range(200, 300):
-            raise Exception(resp.text)  # pylint: disable=broad-exception-raised
-
+        output = cloudflare_purge({"purge_everything": True})
     except Exception as e:  # pylint: disable=broad-except
         mess = f"Error when invalidating caches: {e}"
         logger.error(mess)
         return False, str(e)
 
-    return True, resp.text
+    return True, output
 
 
 def send_email_on_pack_propose(pack):
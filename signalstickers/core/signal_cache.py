@@ -0,0 +1,123 @@
+"""
+Local on-disk cache of the packs fetched from Signal: decrypted manifests and
+sticker images. Packs are immutable on Signal, so entries never expire; the
+cache is only bounded in size, the least recently used files being evicted
+first.
+
+Layout, in `settings.SIGNAL_CACHE["path"]`:
+    manifests/<pack_id>.<hash of the pack key>.json
+    images/<sha256[:2]>/<sha256>  (content-addressed, shared between packs)
+"""
+
+from functools import cache
+import hashlib
+import json
+import logging
+
+from core.disk_cache import DiskCache, touch
+from django.conf import settings
+
+logger = logging.getLogger("main")
+
+
+class CachedSticker:
+    """
+    A sticker read from the cache, same interface as signalstickers_client's.
+    """
+
+    def __init__(self, sticker_id, emoji, image_data):
+        self.id = sticker_id
+        self.emoji = emoji
+        self.image_data = image_data
+
+
+class CachedPack:
+    """
+    A pack read from the cache, same interface as signalstickers_client's.
+    """
+
+    def __init__(self, pack_id, pack_key, title, author, cover, stickers):
+        self.id = pack_id
+        self.key = pack_key
+        self.title = title
+        self.author = author
+        self.cover = cover
+        self.stickers = stickers
+
+    @property
+    def nb_stickers(self):
+        return len(self.stickers)
+
+
+class SignalCache(DiskCache):
+    def _manifest_path(self, pack_id, pack_key):
+        # The key is part of the cache key: a wrong key must not hit the cache
+        key_hash = hashlib.sha256(pack_key.encode()).hexdigest()[:16]
+        return self.path / "manifests" / f"{pack_id}.{key_hash}.json"
+
+    def _image_path(self, digest):
+        return self.path / "images" / digest[:2] / digest
+
+    def get(self, pack_id, pack_key):
+        """
+        Return the pack from the cache as a `CachedPack`, or None if it is not
+        (entirely) cached.
+        """
+        manifest_path = self._manifest_path(pack_id, pack_key)
+        try:
+            manifest = json.loads(manifest_path.read_bytes())
+            stickers = [self._read_sticker(sticker) for sticker in manifest["stickers"]]
+            cover = self._read_sticker(manifest["cover"])
+            touch(manifest_path)
+        except (OSError, ValueError, KeyError):
+            return None
+
+        return CachedPack(
+            pack_id, pack_key, manifest["title"], manifest["author"], cover, stickers
+        )
+
+    def _read_sticker(self, sticker):
+        image_data = None
+        if sticker["sha256"]:
+            image_path = self._image_path(sticker["sha256"])
+            image_data = image_path.read_bytes()
+            touch(image_path)
+        return CachedSticker(sticker["id"], sticker["emoji"], image_data)
+
+    def put(self, pack_id, pack_key, pack):
+        """
+        Store a pack fetched from Signal. Errors are logged, and ignored.
+        """
+        try:
+            manifest = {
+                "title": pack.title,
+                "author": pack.author,
+                "cover": self._write_sticker(pack.cover),
+                "stickers": [self._write_sticker(sticker) for sticker in pack.stickers],
+            }
+            self._write(
+                self._manifest_path(pack_id, pack_key), json.dumps(manifest).encode()
+            )
+            if self._size > self.max_size:
+                self.evict()
+        except OSError:
+            logger.warning("Could not cache pack %s", pack_id, exc_info=True)
+
+    def _write_sticker(self, sticker):
+        digest = None
+        if sticker.image_data is not None:
+            digest = hashlib.sha256(sticker.image_data).hexdigest()
+            image_path = self._image_path(digest)
+            if image_path.exists():
+                touch(image_path)
+            else:
+                self._write(image_path, sticker.image_data)
+        return {"id": sticker.id, "emoji": sticker.emoji, "sha256": digest}
+
+
+@cache
+def get_signal_cache():
+    """
+    Return the cache configured in `settings.SIGNAL_CACHE`.
+    """
+    return SignalCache(settings.SIGNAL_CACHE["path"], settings.SIGNAL_CACHE["max_size"])
@@ -0,0 +1,142 @@
+"""
+Shared client for the Signal stickers CDN. A single `StickersClient` (and its
+pool of keep-alive connections) lives in a background event loop, used by all
+the fetches of the process, from sync code (`get_pack()`) as well as from any
+other event loop (`aget_pack()`).
+"""
+
+import asyncio
+import atexit
+from contextlib import AsyncExitStack
+from functools import cache
+import threading
+
+from cryptography.exceptions import InvalidSignature
+from django.conf import settings
+from google.protobuf.message import DecodeError
+import httpx
+from signalstickers_client import StickersClient
+from signalstickers_client.errors import HTTPException, NotFound
+
+
+class SignalError(Exception):
+    """
+    Base class for the errors when fetching a pack from Signal.
+    """
+
+
+class SignalPackNotFound(SignalError):
+    pass
+
+
+class SignalInvalidPack(SignalError):
+    """
+    The pack could not be decrypted (wrong key) or decoded.
+    """
+
+
+class SignalTimeout(SignalError):
+    pass
+
+
+class SignalUnavailable(SignalError):
+    """
+    Network error, or unexpected response from Signal.
+    """
+
+
+class SignalClient:
+    def __init__(self, timeout, max_concurrency):
+        self.timeout = timeout
+        self.max_concurrency = max_concurrency
+        self._loop = None
+        self._opened = None  # task opening the client, in the event loop
+        self._stack = None
+        self._client = None
+        self._semaphore = None
+        self._lock = threading.Lock()
+
+    def _get_loop(self):
+        """
+        Return the event loop of the client, starting it on first use. The
+        client is opened in the loop, without waiting for it: the fetches do.
+        """
+        with self._lock:
+            if self._loop is None:
+                loop = asyncio.new_event_loop()
+                # The loop is not running yet: the task can be created here
+                self._opened = loop.create_task(self._open())
+                threading.Thread(
+                    target=loop.run_forever, name="signal-client", daemon=True
+                ).start()
+                self._loop = loop
+                atexit.register(self.close)
+        return self._loop
+
+    async def _open(self):
+        self._stack = AsyncExitStack()
+        self._client = await self._stack.enter_async_context(StickersClient())
+        self._semaphore = asyncio.Semaphore(self.max_concurrency)
+
+    async def _close(self):
+        await asyncio.wait([self._opened])
+        await self._stack.aclose()
+
+    def close(self):
+        """
+        Close the connections, and stop the event loop.
+        """
+        with self._lock:
+            if self._loop is None:
+                return
+            asyncio.run_coroutine_threadsafe(self._close(), self._loop).result()
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._loop = None
+
+    async def _get_pack(self, pack_id, pack_key, timeout):
+        await self._opened
+        # Waiting for a slot does not count in the timeout
+        async with self._semaphore:
+            try:
+                return await asyncio.wait_for(
+                    self._client.get_pack(pack_id, pack_key),
+                    self.timeout if timeout is None else timeout,
+                )
+            except asyncio.TimeoutError as exc:
+                raise SignalTimeout(f"Timeout when fetching pack {pack_id}") from exc
+            except NotFound as exc:
+                raise SignalPackNotFound(f"Unknown pack {pack_id}") from exc
+            except (InvalidSignature, DecodeError, ValueError) as exc:
+                raise SignalInvalidPack(f"Invalid pack {pack_id}") from exc
+            except (HTTPException, httpx.HTTPError) as exc:
+                raise SignalUnavailable(f"Could not fetch pack {pack_id}") from exc
+
+    def get_pack(self, pack_id, pack_key, timeout=None):
+        """
+        Fetch a pack (manifest and stickers) from Signal. `timeout` (seconds)
+        defaults to the client's one. Raise a `SignalError` on failure.
+        """
+        return asyncio.run_coroutine_threadsafe(
+            self._get_pack(pack_id, pack_key, timeout), self._get_loop()
+        ).result()
+
+    async def aget_pack(self, pack_id, pack_key, timeout=None):
+        """
+        Same as `get_pack()`, to be awaited from any event loop.
+        """
+        return await asyncio.wrap_future(
+            asyncio.run_coroutine_threadsafe(
+                self._get_pack(pack_id, pack_key, timeout), self._get_loop()
+            )
+        )
+
+
+@cache
+def get_signal_client():
+    """
+    Return the client of the current process, configured in
+    `settings.SIGNAL_CLIENT`.
+    """
+    return SignalClient(
+        settings.SIGNAL_CLIENT["timeout"], settings.SIGNAL_CLIENT["max_concurrency"]
+    )
@@ -0,0 +1,94 @@
+from core.catalog import bump_catalog_version, bump_status_version
+from core.cdn import schedule_purge
+from core.models import AdminAction, CatalogChange, Pack, PackStatus, Report, Tag
+from core.models.pack import STATS_FIELDS
+from core.status_summary import invalidate_status_summary
+from django.contrib.admin.models import LogEntry
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete
+from django.dispatch import receiver
+
+
+@receiver(post_save, sender=Pack)
+def pack_saved(instance, update_fields=None, **__):
+    # Stats are not a catalog change: they are refreshed with the snapshots TTL
+    if update_fields and set(update_fields) <= STATS_FIELDS:
+        return
+    Pack.objects.update_search_vectors([instance.id])
+    # Packs never ONLINE (contributions, reviews) are not in the catalog
+    if instance.is_in_catalog():
+        CatalogChange.objects.record([instance.pack_id])
+        bump_catalog_version()
+    else:
+        bump_status_version()
+    schedule_purge(instance)
+
+
+@receiver(post_delete, sender=Pack)
+def pack_deleted(instance, **__):
+    if instance.is_in_catalog():
+        CatalogChange.objects.record([instance.pack_id])
+        bump_catalog_version()
+    else:
+        bump_status_version()
+    schedule_purge(instance)
+
+
+def _record_changes(pack_ids):
+    # Changes are recorded with the Signal pack ids, for the packs in the catalog
+    packs = Pack.objects.filter(id__in=pack_ids, status=PackStatus.ONLINE.name)
+    CatalogChange.objects.record(packs.values_list("pack_id", flat=True))
+
+
+@receiver(m2m_changed, sender=Pack.tags.through)
+def pack_tags_changed(instance, action, reverse, pk_set, **__):
+    # Changed from the tag side (`tag.packs`): `pk_set` holds pack ids
+    if action == "pre_clear" and reverse:
+        instance.cleared_pack_ids = list(instance.packs.values_list("id", flat=True))
+    if action not in ("post_add", "post_remove", "post_clear"):
+        return
+
+    if not reverse:
+        pack_ids = [instance.id]
+    elif action == "post_clear":
+        pack_ids = instance.cleared_pack_ids
+    else:
+        pack_ids = pk_set
+    Pack.objects.update_search_vectors(pack_ids)
+    _record_changes(pack_ids)
+    bump_catalog_version()
+
+
+@receiver(pre_delete, sender=Tag)
+def tag_deleting(instance, **__):
+    # The links to the packs are gone once the tag is deleted
+    instance.deleted_pack_ids = list(instance.packs.values_list("id", flat=True))
+
+
+@receiver(post_save, sender=Tag)
+@receiver(post_delete, sender=Tag)
+def tag_changed(instance, created=False, **__):
+    pack_ids = getattr(instance, "deleted_pack_ids", None)
+    if pack_ids is None and not created:
+        pack_ids = list(instance.packs.values_list("id", flat=True))
+    if pack_ids:
+        Pack.objects.update_search_vectors(pack_ids)
+        _record_changes(pack_ids)
+    if not created:
+        # Renamed or deleted
+        Tag.objects.invalidate_cache()
+    bump_catalog_version()
+
+
+@receiver(post_save, sender=Pack)
+@receiver(post_delete, sender=Pack)
+@receiver(post_save, sender=Report)
+@receiver(post_delete, sender=Report)
+@receiver(post_save, sender=LogEntry)
+def review_action(**__):
+    # Reviews, reports, and admin changes (caches to clear)
+    invalidate_status_summary()
+
+
+@receiver(post_save, sender=LogEntry)
+def log_entry_saved(**__):
+    AdminAction.clear_caches_state()
@@ -0,0 +1,57 @@
+"""
+Summary of what is waiting for the admins (packs to review, escalated packs,
+reports to process, caches to clear), shown on every admin page. It is cached
+for ADMIN_STATUS_SUMMARY_TIMEOUT seconds, and dropped on each review action.
+"""
+
+from core.models import AdminAction, Pack, PackStatus, Report, ReportStatus
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import CharField, Count, Value
+
+STATUS_SUMMARY_KEY = "admin:status_summary"
+
+
+def _count_by_status():
+    """
+    Return {(model, status): count} for the packs and the reports waiting for
+    the admins, with a single query.
+    """
+    packs = (
+        Pack.objects.filter(
+            status__in=[PackStatus.IN_REVIEW.name, PackStatus.ESCALATED.name]
+        )
+        .order_by()
+        .values("status")
+        .annotate(model=Value("pack", output_field=CharField()), nb=Count("id"))
+        .values_list("status", "model", "nb")
+    )
+    reports = (
+        Report.objects.filter(status=ReportStatus.TO_PROCESS.name)
+        .order_by()
+        .values("status")
+        .annotate(model=Value("report", output_field=CharField()), nb=Count("id"))
+        .values_list("status", "model", "nb")
+    )
+    rows = packs.union(reports, all=True)
+    return {(model, status): nb for status, model, nb in rows}
+
+
+def get_status_summary():
+    summary = cache.get(STATUS_SUMMARY_KEY)
+    if summary is None:
+        counts = _count_by_status()
+        summary = {
+            "packs_to_review": counts.get(("pack", PackStatus.IN_REVIEW.name), 0),
+            "packs_escalated": counts.get(("pack", PackStatus.ESCALATED.name), 0),
+            "reports_to_process": counts.get(
+                ("report", ReportStatus.TO_PROCESS.name), 0
+            ),
+            "caches_dirty": AdminAction.caches_dirty(),
+        }
+        cache.set(STATUS_SUMMARY_KEY, summary, settings.ADMIN_STATUS_SUMMARY_TIMEOUT)
+    return summary
+
+
+def invalidate_status_summary():
+    cache.delete(STATUS_SUMMARY_KEY)
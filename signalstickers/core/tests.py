@@ -1,27 +1,77 @@
-from io import StringIO
+import asyncio
+from collections import Counter
+import gzip
+from io import BytesIO, StringIO
+from pathlib import Path
+import shutil
 import tempfile
+import threading
+import time
 from unittest.mock import patch
+import zipfile
 
+from PIL import Image
 from core import utils
+from core.analytics import (
+    FileAnalyticsBuffer,
+    MemoryAnalyticsBuffer,
+    analytics_buffer_from_settings,
+)
+from core.catalog import get_catalog_version, get_status_version
+from core.cdn import (
+    LAST_AUTO_PURGE_KEY,
+    BackgroundPurger,
+    PurgePlanner,
+    get_last_auto_purge,
+)
+from core.fake_cloudflare import FakeCloudflare
+from core.image_format import UNKNOWN_IMAGE, ImageInfo, inspect_image
+from core.image_samples import make_gif, make_png, make_webp
+from core.management.commands.import_stats_from_logfile import (
+    parse_shard,
+    plan_shards,
+)
 from core.models import (
+    AdminAction,
     AIReview,
     AIReviewStatus,
+    CatalogChange,
     Pack,
     PackAnimatedMode,
+    PackMonthlyStat,
     PackStatus,
+    Report,
+    SiteStat,
     Tag,
 )
+from core.services import invalidate_cdn
+from core.signal_cache import SignalCache
+from core.signal_client import (
+    SignalClient,
+    SignalInvalidPack,
+    SignalPackNotFound,
+    SignalTimeout,
+)
+from core.status_summary import STATUS_SUMMARY_KEY, get_status_summary
+from core.thumbnails import StickerThumbnails, get_sticker_thumbnails
 from core.utils import get_current_ym_date, get_last_month_ym_date
+from cryptography.exceptions import InvalidSignature
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
 from django.core.exceptions import ValidationError
-from django.core.management import call_command
-from django.db import IntegrityError
-from django.test import TestCase
+from django.core.management import CommandError, call_command
+from django.db import DatabaseError, IntegrityError, connection
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+import httpx
+from signalstickers_client.errors import NotFound
 
-from signalstickers.tests_common import TestPack
+from signalstickers.tests_common import TestPack, logging_enabled
 
 
 @patch("core.models.pack.get_pack_from_signal", autospec=True)
-class PackTestCase(TestCase):
+class PackTestCase(TestCase):  # pylint: disable=too-many-public-methods
     def setUp(self):
 
         self.testpack = {
@@ -266,6 +316,141 @@ class PackTestCase(TestCase):
         base_pack.save()
         self.assertEqual(base_pack.hot_views, 7)
 
+    def test_increment_views(self, mocked_getpacklib):
+        mocked_getpacklib.return_value = TestPack("foo", "bar", b"\x00")
+
+        pack = Pack.objects.new(
+            pack_id="a" * 32, pack_key="b" * 64, status=PackStatus.ONLINE.name
+        )
+        pack.stats = {get_last_month_ym_date(): 12, get_current_ym_date(): 13}
+        pack.save()
+
+        # Only the stats column is written
+        Pack.objects.filter(id=pack.id).update(title="New title")
+
+        self.assertEqual(Pack.objects.increment_views("a" * 32), 1)
+        self.assertEqual(
+            Pack.objects.increment_views("a" * 32, month="1979_01", count=3), 1
+        )
+        self.assertEqual(Pack.objects.increment_views("c" * 32), 0)
+
+        pack.refresh_from_db()
+        self.assertEqual(
+            pack.stats,
+            {
+                "1979_01": 3,
+                get_last_month_ym_date(): 12,
+                get_current_ym_date(): 14,
+            },
+        )
+        self.assertEqual(pack.title, "New title")
+
+    def test_save_keeps_views(self, mocked_getpacklib):
+        """
+        Saving a pack loaded before views were counted does not lose them
+        """
+        mocked_getpacklib.return_value = TestPack("foo", "bar", b"\x00")
+
+        pack = Pack.objects.new(
+            pack_id="a" * 32, pack_key="b" * 64, status=PackStatus.ONLINE.name
+        )
+        stale_pack = Pack.objects.get(id=pack.id)
+        Pack.objects.increment_views("a" * 32, count=3)
+
+        stale_pack.title = "New title"
+        stale_pack.save()
+
+        pack.refresh_from_db()
+        self.assertEqual(pack.title, "New title")
+        self.assertEqual(pack.stats, {get_current_ym_date(): 3})
+        self.assertEqual(pack.total_views, 3)
+        self.assertEqual(pack.hot_views, 3)
+        self.assertEqual(
+            dict(
+                PackMonthlyStat.objects.filter(pack=pack).values_list("month", "views")
+            ),
+            {get_current_ym_date(): 3},
+        )
+
+    def test_catalog_version(self, mocked_getpacklib):
+        """
+        Only the changes of the packs that are or were ONLINE change the catalog,
+        and are recorded as catalog changes
+        """
+        mocked_getpacklib.return_value = TestPack("foo", "bar", b"\x00")
+
+        version = get_catalog_version()
+        pack = Pack.objects.new(
+            pack_id="a" * 32, pack_key="b" * 64, status=PackStatus.IN_REVIEW.name
+        )
+        status_version = get_status_version()
+        pack.refuse()
+        pack = Pack.objects.get(id=pack.id)
+        pack.status_comments = "Refused"
+        pack.save()
+        self.assertEqual(get_catalog_version(), version)
+        # The status of the pack changed
+        self.assertNotEqual(get_status_version(), status_version)
+        self.assertFalse(CatalogChange.objects.exists())
+
+        pack.approve()
+        self.assertNotEqual(get_catalog_version(), version)
+        self.assertEqual(CatalogChange.objects.count(), 1)
+
+        # Taken offline: the pack leaves the catalog
+        version = get_catalog_version()
+        pack = Pack.objects.get(id=pack.id)
+        pack.refuse()
+        self.assertNotEqual(get_catalog_version(), version)
+        self.assertEqual(CatalogChange.objects.count(), 2)
+
+    def test_monthly_stats(self, mocked_getpacklib):
+        """
+        Monthly stats are kept in sync with the stats JSON, and used to annotate
+        the views of online packs
+        """
+        mocked_getpacklib.return_value = TestPack("foo", "bar", b"\x00")
+
+        pack = Pack.objects.new(
+            pack_id="a" * 32, pack_key="b" * 64, status=PackStatus.ONLINE.name
+        )
+        pack.stats = {"1979_01": 1, get_last_month_ym_date(): 2}
+        pack.save()
+
+        Pack.objects.increment_views("a" * 32)
+        Pack.objects.bulk_increment_views(
+            {("a" * 32, get_current_ym_date()): 3, ("c" * 32, "1979_01"): 1}
+        )
+
+        self.assertEqual(
+            dict(
+                PackMonthlyStat.objects.filter(pack=pack).values_list("month", "views")
+            ),
+            {"1979_01": 1, get_last_month_ym_date(): 2, get_current_ym_date(): 4},
+        )
+
+        online_pack = Pack.objects.onlines().get()
+        self.assertEqual(online_pack.total_views, 7)
+        self.assertEqual(online_pack.hot_views, 6)
+
+    def test_refresh_pack_views(self, mocked_getpacklib):
+        mocked_getpacklib.return_value = TestPack("foo", "bar", b"\x00")
+
+        pack = Pack.objects.new(
+            pack_id="a" * 32, pack_key="b" * 64, status=PackStatus.ONLINE.name
+        )
+        pack.stats = {"1979_01": 1, get_current_ym_date(): 5}
+        pack.save()
+
+        # Outdated counters (e.g. the month changed)
+        Pack.objects.filter(id=pack.id).update(total_views=0, hot_views=42)
+
+        call_command("refresh_pack_views")
+
+        pack.refresh_from_db()
+        self.assertEqual(pack.total_views, 6)
+        self.assertEqual(pack.hot_views, 5)
+
     def test_most_popular_for_month(self, mocked_getpacklib):
         mocked_getpacklib.return_value = TestPack("foo", "bar", b"\x00")
 
@@ -401,32 +586,676 @@ class PackTestCase(TestCase):
         pack.refuse()
         self.assertEqual(pack.status, PackStatus.REFUSED.name)
 
+    def test_search(self, mocked_getpacklib):
+        mocked_getpacklib.return_value = TestPack("Happy cats", "Jane", b"\x00")
+        cats = Pack.objects.new(
+            pack_id="a" * 32,
+            pack_key="b" * 64,
+            status=PackStatus.ONLINE.name,
+            tags=["Kitten"],
+        )
+        mocked_getpacklib.return_value = TestPack("Dogs", "Catherine", b"\x00")
+        dogs = Pack.objects.new(
+            pack_id="c" * 32,
+            pack_key="d" * 64,
+            status=PackStatus.ONLINE.name,
+            tags=["puppy"],
+        )
 
-class UtilsTestCase(TestCase):
-    def test_detect_animated_pack(self):
+        def search(text):
+            return list(Pack.objects.search(text))
 
-        self.assertTrue(
-            utils.detect_animated_pack(
-                TestPack("foo", "bar", b"\x61\x63\x54\x4c", b"\x61\x63\x54\x4c")
+        # Matches in the title rank above matches in the author
+        self.assertEqual(search("cat"), [cats, dogs])
+        self.assertEqual(search("Happy CAT"), [cats])
+        self.assertEqual(search("kitt"), [cats])
+        self.assertEqual(search("jane dogs"), [])
+        self.assertEqual(search(" !? "), [])
+
+        # The search index follows the tags
+        dogs.tags.add(Tag.objects.create(name="kittens"))
+        self.assertCountEqual(search("kitten"), [cats, dogs])
+
+        tag = Tag.objects.get(name="puppy")
+        tag.name = "doggo"
+        tag.save()
+        self.assertEqual(search("puppy"), [])
+        self.assertEqual(search("doggo"), [dogs])
+
+        Tag.objects.get(name="kitten").delete()
+        self.assertEqual(search("kitten"), [dogs])
+
+    def test_admin_search(self, mocked_getpacklib):
+        mocked_getpacklib.return_value = TestPack("Happy cats", "Jane", b"\x00")
+        cats = Pack.objects.new(
+            pack_id="a" * 32, pack_key="b" * 64, status=PackStatus.ONLINE.name
+        )
+        mocked_getpacklib.return_value = TestPack("Cafe", "John", b"\x00")
+        cafe = Pack.objects.new(
+            pack_id="c" * 32, pack_key="d" * 64, status=PackStatus.ONLINE.name
+        )
+        self.client.force_login(
+            get_user_model().objects.create_superuser(
+                "admin", "admin@example.com", "admin"
             )
         )
 
-        self.assertTrue(
-            utils.detect_animated_pack(
-                TestPack("foo", "bar", b"\x61\x63\x54\x4c", b"\x47\x49\x46\x38\x39\x61")
+        def search(text):
+            response = self.client.get(
+                reverse("admin:core_pack_changelist"), {"q": text}
             )
+            return list(response.context["cl"].result_list)
+
+        self.assertEqual(search("aaaa"), [cats])
+        self.assertEqual(search("d" * 64), [cafe])
+        self.assertEqual(search("happy"), [cats])
+        # Hex words are searched in the titles too
+        self.assertEqual(search("cafe"), [cafe])
+        self.assertEqual(search("cc"), [cafe])
+
+
+class TagTestCase(TestCase):
+    def setUp(self):
+        self.addCleanup(Tag.objects.invalidate_cache)
+
+    def test_resolve(self):
+        foo_tag = Tag.objects.create(name="foo")
+
+        with self.captureOnCommitCallbacks(execute=True):
+            with self.assertNumQueries(2):
+                tag_ids = Tag.objects.resolve([" Foo", "bar", "foo", "", "BAR "])
+        bar_tag = Tag.objects.get(name="bar")
+        self.assertEqual(tag_ids, [foo_tag.id, bar_tag.id])
+        self.assertEqual(Tag.objects.resolve([]), [])
+
+        # Cached: only checked
+        with self.assertNumQueries(1):
+            self.assertEqual(
+                Tag.objects.resolve(["bar", "foo"]), [bar_tag.id, foo_tag.id]
+            )
+
+        # Deleted tags are dropped from the cache, and created again
+        with connection.cursor() as cursor:
+            cursor.execute("DELETE FROM tags WHERE name = 'foo'")
+        with self.assertNumQueries(3):
+            (tag_id,) = Tag.objects.resolve(["foo"])
+        self.assertEqual(Tag.objects.get(name="foo").id, tag_id)
+
+        # The whole cache is dropped when a tag is deleted with signals
+        bar_tag.delete()
+        with self.assertNumQueries(2):
+            (tag_id,) = Tag.objects.resolve(["bar"])
+        self.assertEqual(Tag.objects.get(name="bar").id, tag_id)
+
+    def test_resolve_uncommitted(self):
+        """Tags are cached once their transaction is committed"""
+        with self.captureOnCommitCallbacks(execute=False):
+            Tag.objects.resolve(["foo"])
+        with self.assertNumQueries(2):
+            Tag.objects.resolve(["foo"])
+
+
+class PackIndexesTestCase(TestCase):
+    """
+    The status-filtered queries have their indexes. Whether the planner uses
+    them depends on the data and on the server, so only their definitions are
+    checked.
+    """
+
+    def test_status_indexes(self):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT indexname, indexdef FROM pg_indexes WHERE tablename = 'packs'"
+            )
+            indexes = dict(cursor.fetchall())
+
+        # In review and escalated packs, and the admin status filter
+        self.assertIn("(status, id DESC)", indexes["packs_status_id"])
+        # Pack.objects.onlines()
+        self.assertIn(
+            "(id DESC) WHERE ((status)::text = 'ONLINE'::text)",
+            indexes["packs_online_newest"],
         )
+        self.assertIn("(id DESC) WHERE editorschoice", indexes["packs_editorschoice"])
 
-        self.assertTrue(
-            utils.detect_animated_pack(
-                TestPack("foo", "bar", b"\x00\x00\x00\x00", b"\x47\x49\x46\x38\x39\x61")
+
+@patch("core.models.pack.get_pack_from_signal", autospec=True)
+class PackCountersConcurrencyTestCase(TransactionTestCase):
+    def test_no_lost_updates(self, mocked_getpacklib):
+        """
+        Concurrent increments of the same counter are all counted
+        """
+        mocked_getpacklib.return_value = TestPack("foo", "bar", b"\x00")
+        Pack.objects.new(
+            pack_id="a" * 32, pack_key="b" * 64, status=PackStatus.ONLINE.name
+        )
+
+        def client():
+            try:
+                for _ in range(25):
+                    Pack.objects.increment_views("a" * 32)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=client) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        pack = Pack.objects.get(pack_id="a" * 32)
+        self.assertEqual(pack.stats, {get_current_ym_date(): 200})
+
+
+@patch("core.models.pack.get_pack_from_signal", autospec=True)
+class StatusSummaryTestCase(TestCase):
+    def setUp(self):
+        cache.delete(STATUS_SUMMARY_KEY)
+        AdminAction.clear_caches_state()
+
+    def test_summary(self, mocked_getpacklib):
+        mocked_getpacklib.return_value = TestPack("Title", "Author", b"\x00")
+        for pack_id, status in (
+            ("a", PackStatus.IN_REVIEW),
+            ("b", PackStatus.IN_REVIEW),
+            ("c", PackStatus.ESCALATED),
+            ("d", PackStatus.ONLINE),
+        ):
+            pack = Pack.objects.new(
+                pack_id=pack_id * 32, pack_key="b" * 64, status=status.name
             )
+        Report.objects.create(pack=pack, content="Report")
+
+        # Once the caches state is known, a single query
+        AdminAction.caches_dirty()
+        with self.assertNumQueries(1):
+            summary = get_status_summary()
+        self.assertEqual(
+            summary,
+            {
+                "packs_to_review": 2,
+                "packs_escalated": 1,
+                "reports_to_process": 1,
+                "caches_dirty": None,
+            },
         )
-        self.assertTrue(
-            utils.detect_animated_pack(
-                TestPack("foo", "bar", b"\x00\x00\x00\x00", b"\x61\x63\x54\x4c")
+
+        # Cached
+        with self.assertNumQueries(0):
+            self.assertEqual(get_status_summary(), summary)
+
+        # Review action: updated
+        pack = Pack.objects.get(pack_id="a" * 32)
+        pack.status = PackStatus.ONLINE.name
+        pack.save()
+        self.assertEqual(get_status_summary()["packs_to_review"], 1)
+
+
+class AnalyticsBufferTestCase(TestCase):
+    def setUp(self):
+        with patch("core.models.pack.get_pack_from_signal") as mocked_getpacklib:
+            mocked_getpacklib.return_value = TestPack("foo", "bar", b"\x00")
+            self.pack = Pack.objects.new(
+                pack_id="a" * 32, pack_key="b" * 64, status=PackStatus.ONLINE.name
+            )
+        self.pack.stats = {"2021_01": 2}
+        self.pack.save()
+
+    def _record_hits(self, buffer):
+        self.assertTrue(buffer.record_pack_view("a" * 32, "2021_01"))
+        self.assertTrue(buffer.record_pack_view("a" * 32, "2021_02"))
+        self.assertTrue(buffer.record_pack_view("a" * 32, "2021_02"))
+        self.assertFalse(buffer.record_pack_view("c" * 32, "2021_02"))
+        buffer.record_site_visit("2021_02")
+
+    def _assert_flushed(self, buffer):
+        # Nothing is written until the buffer is flushed
+        self.pack.refresh_from_db()
+        self.assertEqual(self.pack.stats, {"2021_01": 2})
+        self.assertFalse(SiteStat.objects.exists())
+
+        self.assertEqual(buffer.flush(), (3, 1))
+
+        self.pack.refresh_from_db()
+        self.assertEqual(self.pack.stats, {"2021_01": 3, "2021_02": 2})
+        self.assertEqual(SiteStat.objects.get(month="2021_02").visits, 1)
+
+        # Nothing left
+        self.assertEqual(buffer.flush(), (0, 0))
+
+    def test_memory_buffer(self):
+        buffer = MemoryAnalyticsBuffer(flush_interval=3600, flush_threshold=1000)
+        self._record_hits(buffer)
+        self._assert_flushed(buffer)
+
+    def test_failed_flush(self):
+        """
+        If a flush fails, none of the hits are written, and they are all written
+        by the next flush
+        """
+        buffer = MemoryAnalyticsBuffer(flush_interval=3600, flush_threshold=1000)
+        self._record_hits(buffer)
+        with patch.object(
+            SiteStat.objects, "increment_visits", side_effect=DatabaseError
+        ):
+            with self.assertRaises(DatabaseError):
+                buffer.flush()
+        self._assert_flushed(buffer)
+
+    def test_file_buffer(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            buffer = FileAnalyticsBuffer(
+                Path(tmp_dir) / "analytics.queue",
+                flush_interval=3600,
+                flush_threshold=1000,
+            )
+            self._record_hits(buffer)
+            self._assert_flushed(buffer)
+            self.assertEqual(list(Path(tmp_dir).iterdir()), [])
+
+    def test_flush_analytics_command(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            conf = {
+                "backend": "file",
+                "path": Path(tmp_dir) / "analytics.queue",
+                "flush_interval": 3600,
+                "flush_threshold": 1000,
+            }
+            with self.settings(ANALYTICS_BUFFER=conf):
+                self._record_hits(analytics_buffer_from_settings())
+
+                out = StringIO()
+                call_command("flush_analytics", stdout=out)
+
+        self.assertIn("Flushed: 3 pack views, 1 site visits.", out.getvalue())
+        self.pack.refresh_from_db()
+        self.assertEqual(self.pack.stats, {"2021_01": 3, "2021_02": 2})
+
+
+class SignalCacheTestCase(TestCase):
+    def setUp(self):
+        tmp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmp_dir)
+        self.path = Path(tmp_dir)
+        self.signal_cache = SignalCache(self.path, max_size=2000)
+
+    def test_get_put(self):
+        self.assertIsNone(self.signal_cache.get("a" * 32, "b" * 64))
+
+        self.signal_cache.put(
+            "a" * 32, "b" * 64, TestPack("Title", "Author", b"\x01", b"\x02")
+        )
+        pack = self.signal_cache.get("a" * 32, "b" * 64)
+        self.assertEqual((pack.title, pack.author), ("Title", "Author"))
+        self.assertEqual((pack.cover.id, pack.cover.image_data), (42, b"\x00"))
+        self.assertEqual(
+            [(sticker.id, sticker.image_data) for sticker in pack.stickers],
+            [(1, b"\x01"), (2, b"\x02")],
+        )
+
+        # The key must match
+        self.assertIsNone(self.signal_cache.get("a" * 32, "c" * 64))
+
+        # Missing image: not cached
+        next((self.path / "images").glob("*/*")).unlink()
+        self.assertIsNone(self.signal_cache.get("a" * 32, "b" * 64))
+
+    def test_eviction(self):
+        def put(pack_id, image_data):
+            self.signal_cache.put(
+                pack_id * 32, "b" * 64, TestPack("T", "A", image_data * 300)
+            )
+
+        # About 550 bytes per pack
+        put("a", b"\x01")
+        put("b", b"\x02")
+        put("c", b"\x03")
+        self.assertIsNotNone(self.signal_cache.get("a" * 32, "b" * 64))
+        put("d", b"\x04")
+
+        # The least recently used pack has been evicted
+        size = sum(f.stat().st_size for f in self.path.glob("**/*") if f.is_file())
+        self.assertLessEqual(size, 2000)
+        self.assertIsNone(self.signal_cache.get("b" * 32, "b" * 64))
+        for pack_id in "acd":
+            self.assertIsNotNone(self.signal_cache.get(pack_id * 32, "b" * 64))
+
+
+def make_sticker_image(image_format, size=(300, 200), colors=("red",)):
+    """
+    Return an image decodable by Pillow, with a frame per color.
+    """
+    frames = [Image.new("RGBA", size, color) for color in colors]
+    image_data = BytesIO()
+    frames[0].save(
+        image_data, image_format, save_all=len(frames) > 1, append_images=frames[1:]
+    )
+    return image_data.getvalue()
+
+
+@patch("core.thumbnails.get_pack_from_signal", autospec=True)
+class StickerThumbnailsTestCase(TestCase):
+    def setUp(self):
+        tmp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmp_dir)
+        self.path = Path(tmp_dir)
+        self.thumbnails = StickerThumbnails(self.path, 10_000, 64, "webp")
+
+    def test_get(self, mocked_getpacklib):
+        mocked_getpacklib.return_value = TestPack(
+            "Title",
+            "Author",
+            make_sticker_image("PNG", colors=("red", "blue")),  # APNG
+            make_sticker_image("WEBP"),
+            b"\x00",
+        )
+
+        thumbnail = self.thumbnails.get("a" * 32, "b" * 64, 1)
+        with Image.open(BytesIO(thumbnail)) as image:
+            self.assertEqual((image.format, image.size), ("WEBP", (64, 43)))
+            # First frame
+            red, _, blue = image.convert("RGB").getpixel((32, 20))
+            self.assertGreater(red, 200)
+            self.assertLess(blue, 50)
+        self.assertEqual(
+            sorted(path.name for path in (self.path / ("a" * 32)).iterdir()),
+            ["1.webp", "2.webp"],
+        )
+
+        # The whole pack has been generated at once
+        self.assertIsNotNone(self.thumbnails.get("a" * 32, "b" * 64, 2))
+        self.assertEqual(mocked_getpacklib.call_count, 1)
+
+        # Undecodable sticker (and cover), unknown sticker
+        with logging_enabled(), self.assertLogs("main", "WARNING"):
+            self.assertIsNone(self.thumbnails.get("a" * 32, "b" * 64, 3))
+            self.assertIsNone(self.thumbnails.get("a" * 32, "b" * 64, 42))
+        self.assertIsNone(self.thumbnails.get("a" * 32, "b" * 64, 99))
+
+        mocked_getpacklib.return_value = None
+        self.assertIsNone(self.thumbnails.get("c" * 32, "b" * 64, 1))
+
+    def test_eviction(self, mocked_getpacklib):
+        for pack_id in "abc":
+            mocked_getpacklib.return_value = TestPack(
+                "T", "A", *(make_sticker_image("PNG") for _ in range(30))
+            )
+            self.thumbnails.get(pack_id * 32, "b" * 64, 1)
+
+        size = sum(f.stat().st_size for f in self.path.glob("**/*") if f.is_file())
+        self.assertLessEqual(size, 10_000)
+        # The most recent thumbnails are kept
+        self.assertTrue((self.path / ("c" * 32) / "30.webp").exists())
+
+    def test_admin_view(self, mocked_getpacklib):
+        mocked_getpacklib.return_value = TestPack(
+            "Title", "Author", make_sticker_image("PNG")
+        )
+        pack = Pack.objects.create(pack_id="a" * 32, pack_key="b" * 64)
+        get_sticker_thumbnails.cache_clear()
+        self.addCleanup(get_sticker_thumbnails.cache_clear)
+
+        url = reverse("admin:core_pack_thumbnail", args=(pack.pk, 1))
+        self.assertEqual(self.client.get(url).status_code, 302)  # login page
+
+        self.client.force_login(
+            get_user_model().objects.create_superuser(
+                "admin", "admin@example.com", "admin"
             )
         )
+        with override_settings(
+            STICKER_THUMBNAILS={
+                "path": self.path,
+                "max_size": 10_000,
+                "size": 64,
+                "format": "webp",
+            }
+        ):
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response["Content-Type"], "image/webp")
+            self.assertIn("immutable", response["Cache-Control"])
+            self.assertEqual(
+                self.client.get(
+                    reverse("admin:core_pack_thumbnail", args=(pack.pk, 99))
+                ).status_code,
+                404,
+            )
+
+
+class CdnPurgeTestCase(TestCase):
+    def setUp(self):
+        self.fake_cloudflare = FakeCloudflare()
+        self.fake_cloudflare.start()
+        self.addCleanup(self.fake_cloudflare.stop)
+        settings_override = override_settings(
+            CLOUDFLARE_CONF={"zone_id": "zone", "token": "token"},  # nosec
+            CDN_PURGE={
+                "api_base": self.fake_cloudflare.api_base,
+                "public_url": "https://api.example.org",
+                "debounce": 0,
+                "automatic": False,
+            },
+        )
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        cache.delete(LAST_AUTO_PURGE_KEY)
+
+    def test_purge_pack(self):
+        planner = PurgePlanner()
+
+        # Not in the catalog: only its status
+        planner.add_pack(Pack(pack_id="c" * 32, pack_key="d" * 64))
+        self.assertEqual(
+            planner.pending,
+            [f"https://api.example.org/v2/packs/status?id={'c' * 32}&key={'d' * 64}"],
+        )
+        planner.flush()
+
+        pack = Pack(pack_id="a" * 32, pack_key="b" * 64, status=PackStatus.ONLINE.name)
+        planner.add_pack(pack)
+        planner.add_tag(Tag(name="foo"))
+
+        self.assertEqual(
+            planner.flush(),
+            [
+                "https://api.example.org/feed/atom/",
+                "https://api.example.org/feed/rss/",
+                "https://api.example.org/v1/packs/",
+                "https://api.example.org/v2/packs/",
+                "https://api.example.org/v2/packs/?format=columnar",
+                "https://api.example.org/v2/packs/?format=msgpack",
+                "https://api.example.org/v2/packs/?role_preload=true",
+                f"https://api.example.org/v2/packs/status?id={'a' * 32}&key={'b' * 64}",
+            ],
+        )
+        self.assertEqual(len(self.fake_cloudflare.requests), 2)
+        request = self.fake_cloudflare.requests[1]
+        self.assertEqual(request["path"], "/client/v4/zones/zone/purge_cache")
+        self.assertEqual(request["authorization"], "Bearer token")
+        self.assertEqual(planner.pending, [])
+
+    def test_batches_and_debounce(self):
+        planner = PurgePlanner(debounce=60)
+        for pack_id in range(40):
+            planner.add_pack(
+                Pack(
+                    pack_id=f"{pack_id:032}",
+                    pack_key="b" * 64,
+                    status=PackStatus.ONLINE.name,
+                )
+            )
+
+        # Within the debounce delay
+        self.assertEqual(planner.flush(), [])
+        self.assertEqual(self.fake_cloudflare.requests, [])
+
+        self.assertEqual(len(planner.flush(force=True)), 47)
+        self.assertEqual(
+            [
+                len(request["json"]["files"])
+                for request in self.fake_cloudflare.requests
+            ],
+            [30, 17],
+        )
+
+    def test_failure(self):
+        self.fake_cloudflare.status = 500
+        planner = PurgePlanner()
+        planner.add_catalog()
+        with logging_enabled(), self.assertLogs("main", "ERROR"):
+            self.assertEqual(planner.flush(), [])
+
+        # Retried on the next flush
+        self.fake_cloudflare.status = 200
+        self.assertEqual(len(planner.flush()), 7)
+        self.assertEqual(planner.pending, [])
+
+    @patch("core.models.pack.get_pack_from_signal", autospec=True)
+    def test_automatic_purge(self, mocked_getpacklib):
+        mocked_getpacklib.return_value = TestPack("Title", "Author", b"\x00")
+        purger = BackgroundPurger(debounce=0.5)
+        patcher = patch("core.cdn.get_purge_planner", return_value=purger)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        with self.settings(CDN_PURGE={**settings.CDN_PURGE, "automatic": True}):
+            # Nothing is purged before the commit
+            with self.captureOnCommitCallbacks(execute=True):
+                pack = Pack.objects.new(
+                    pack_id="a" * 32,
+                    pack_key="b" * 64,
+                    status=PackStatus.ONLINE.name,
+                    tags=["foo"],
+                )
+                Tag.objects.create(name="bar")
+                self.assertEqual(purger.pending, [])
+        self.assertIn(pack.pack_id, purger.pending[-1])
+
+        # All the changes are purged at once
+        for _ in range(50):
+            if get_last_auto_purge():
+                break
+            time.sleep(0.1)
+        self.assertEqual(len(self.fake_cloudflare.requests), 1)
+        self.assertEqual(len(self.fake_cloudflare.purged_files), 8)
+        self.assertEqual(get_last_auto_purge()["nb_urls"], 8)
+
+    def test_invalidate_cdn(self):
+        success, _ = invalidate_cdn()
+        self.assertTrue(success)
+        self.assertEqual(
+            self.fake_cloudflare.requests[0]["json"], {"purge_everything": True}
+        )
+
+    @patch("core.models.pack.get_pack_from_signal", autospec=True)
+    def test_command(self, mocked_getpacklib):
+        mocked_getpacklib.return_value = TestPack("Title", "Author", b"\x00")
+        Pack.objects.new(
+            pack_id="a" * 32, pack_key="b" * 64, status=PackStatus.ONLINE.name
+        )
+
+        out = StringIO()
+        call_command("purge_cdn", pack_id=["a" * 32], dry_run=True, stdout=out)
+        self.assertEqual(len(out.getvalue().splitlines()), 8)
+        self.assertEqual(self.fake_cloudflare.requests, [])
+
+        out = StringIO()
+        call_command("purge_cdn", stdout=out)
+        self.assertIn("Purged: 7 URLs", out.getvalue())
+        self.assertEqual(len(self.fake_cloudflare.purged_files), 7)
+
+
+class FakeStickersClient:
+    running = 0
+    max_running = 0
+    open_delay = 0
+
+    async def __aenter__(self):
+        await asyncio.sleep(FakeStickersClient.open_delay)
+        return self
+
+    async def __aexit__(self, *_):
+        pass
+
+    async def get_pack(self, pack_id, _):
+        FakeStickersClient.running += 1
+        FakeStickersClient.max_running = max(
+            FakeStickersClient.max_running, FakeStickersClient.running
+        )
+        try:
+            await asyncio.sleep(1 if pack_id == "slow" else 0.01)
+            if pack_id == "unknown":
+                raise NotFound(httpx.Response(403), "Sticker pack not found")
+            if pack_id == "badkey":
+                raise InvalidSignature()
+            return TestPack(pack_id, "Author")
+        finally:
+            FakeStickersClient.running -= 1
+
+
+@patch("core.signal_client.StickersClient", FakeStickersClient)
+class SignalClientTestCase(TestCase):
+    def setUp(self):
+        self.signal_client = SignalClient(timeout=0.5, max_concurrency=2)
+        self.addCleanup(self.signal_client.close)
+
+    def test_get_pack(self):
+        self.assertEqual(
+            self.signal_client.get_pack("a" * 32, "b" * 64).title, "a" * 32
+        )
+
+        with self.assertRaises(SignalPackNotFound):
+            self.signal_client.get_pack("unknown", "b" * 64)
+        with self.assertRaises(SignalInvalidPack):
+            self.signal_client.get_pack("badkey", "b" * 64)
+        with self.assertRaises(SignalTimeout):
+            self.signal_client.get_pack("slow", "b" * 64)
+        with self.assertRaises(SignalTimeout):
+            self.signal_client.get_pack("a" * 32, "b" * 64, timeout=0.001)
+
+    def test_aget_pack_concurrency(self):
+        async def fetch_all():
+            return await asyncio.gather(
+                *(self.signal_client.aget_pack(str(i), "b" * 64) for i in range(6))
+            )
+
+        FakeStickersClient.max_running = 0
+        packs = asyncio.run(fetch_all())
+        self.assertEqual([pack.title for pack in packs], [str(i) for i in range(6)])
+        self.assertEqual(FakeStickersClient.max_running, 2)
+
+    @patch.object(FakeStickersClient, "open_delay", 0.5)
+    def test_aget_pack_does_not_block(self):
+        """
+        The client is opened in its own event loop, while the caller's one runs
+        """
+
+        async def fetch():
+            start = time.monotonic()
+            pack = asyncio.ensure_future(self.signal_client.aget_pack("a" * 32, "b"))
+            await asyncio.sleep(0.01)
+            return time.monotonic() - start, await pack
+
+        elapsed, pack = asyncio.run(fetch())
+        self.assertLess(elapsed, 0.25)
+        self.assertEqual(pack.title, "a" * 32)
+
+
+class UtilsTestCase(TestCase):
+    def test_detect_animated_pack(self):
+        apng, gif = make_png(frames=2), make_gif(frames=2)
+        self.assertTrue(utils.detect_animated_pack(TestPack("foo", "bar", apng, apng)))
+        self.assertTrue(utils.detect_animated_pack(TestPack("foo", "bar", apng, gif)))
+        self.assertTrue(
+            utils.detect_animated_pack(TestPack("foo", "bar", make_png(), gif))
+        )
+        self.assertTrue(
+            utils.detect_animated_pack(TestPack("foo", "bar", b"\x00\x00\x00", apng))
+        )
+        self.assertFalse(
+            utils.detect_animated_pack(TestPack("foo", "bar", make_png(), make_gif()))
+        )
         self.assertFalse(
             utils.detect_animated_pack(
                 TestPack("foo", "bar", b"\x00\x00\x00\x00", b"\x99\x99\x99\x99")
@@ -434,28 +1263,53 @@ class UtilsTestCase(TestCase):
         )
         # WebP
         self.assertFalse(
-            utils.detect_animated_pack(
-                TestPack(
-                    "foo",
-                    "bar",
-                    b"\x52\x49\x46\x46\x46\xc9\x03\x00\x57\x45\x42\x50\x56\x50\x38\x58\x00\x00\x00\x00",
-                    b"\x52\x49\x46\x46\x46\xc9\x03\x00\x57\x45\x42\x50\x56\x50\x38\x58\x99\x99\x99\x99",
-                )
-            )
+            utils.detect_animated_pack(TestPack("foo", "bar", make_webp(), make_png()))
         )
 
         # Animated WebP
-        try:
-            utils.detect_animated_pack(
-                TestPack(
-                    "foo",
-                    "bar",
-                    b"\x52\x49\x46\x46\x46\xc9\x03\x00\x57\x45\x42\x50\x56\x50\x38\x58\x00\x00\x00\x00\x41\x4e\x49\x4d",
-                )
+        with self.assertRaises(ValidationError):
+            utils.detect_animated_pack(TestPack("foo", "bar", make_webp(frames=3)))
+
+
+class ImageFormatTestCase(TestCase):
+    def test_inspect_image(self):
+        for make_image, image_format in (
+            (make_png, "png"),
+            (make_gif, "gif"),
+            (make_webp, "webp"),
+        ):
+            self.assertEqual(
+                inspect_image(make_image(320, 200)),
+                ImageInfo(image_format, False, 1, 320, 200),
+            )
+            self.assertEqual(
+                inspect_image(make_image(320, 200, frames=12, frame_size=2000)),
+                ImageInfo(image_format, True, 12, 320, 200),
             )
-            self.fail("Animated WebP")
-        except ValidationError:
-            pass
+
+        self.assertEqual(inspect_image(b"\x00\x01\x02"), UNKNOWN_IMAGE)
+        self.assertEqual(inspect_image(b"GIF89a\x00"), UNKNOWN_IMAGE)
+        self.assertEqual(UNKNOWN_IMAGE.extension, "bin")
+        self.assertEqual(inspect_image(make_webp()).extension, "webp")
+
+    def test_inspect_image_payloads_not_scanned(self):
+        # Chunk names in the image data (e.g. compressed data) are not chunks
+        png = make_png()
+        idat = png.index(b"IDAT")
+        png = png[:idat] + b"IDAT" + b"acTL" + b"ANIM" + png[idat + 12 :]
+        self.assertEqual(inspect_image(png).frames, 1)
+        self.assertFalse(inspect_image(png).animated)
+
+        webp = make_webp()
+        webp = webp[:-4] + b"ANIM"
+        self.assertFalse(inspect_image(webp).animated)
+
+    def test_inspect_image_truncated(self):
+        apng = make_png(frames=5, frame_size=1000)
+        self.assertEqual(inspect_image(apng[:100]).frames, 5)
+
+        gif = make_gif(frames=5, frame_size=1000)
+        self.assertEqual(inspect_image(gif[: len(gif) // 2]).frames, 3)
 
 
 @patch("core.models.pack.get_pack_from_signal", autospec=True)
@@ -566,9 +1420,118 @@ class YmlImportCommandTest(TestCase):
 
         self.assertIn(f"Pack {'a'*32} not imported (key: {'b'*64})", out.getvalue())
 
+    def test_import_stickers_batches(self, mocked_getpacklib):
+        """
+        Test that packs are imported by batches, in reverse order, and that the
+        dry-run mode does not import anything
+        """
+        mocked_getpacklib.return_value = TestPack("a", "b", b"\x00")
+        yml = f"""\
+{'c'*32}:
+  key: {'d'*64}
+  tags:
+    - foo
+
+# Comment
+{'a'*32}:
+  key: {'b'*64}
+  editorschoice: true
+  tags: [Foo, " bar "]
+"""
+        with tempfile.NamedTemporaryFile() as f_in:
+            f_in.write(yml.encode())
+            f_in.flush()
+
+            out = StringIO()
+            call_command("import_from_yml", f_in.name, dry_run=True, stdout=out)
+            self.assertIn("Dry run, nothing imported. Valid: 2", out.getvalue())
+            self.assertEqual(Pack.objects.count(), 0)
+
+            # The shared Signal client caps the concurrency
+            with self.assertRaises(CommandError):
+                call_command("import_from_yml", f_in.name, concurrency=100)
+
+            out = StringIO()
+            call_command("import_from_yml", f_in.name, batch_size=1, stdout=out)
+
+        self.assertIn("All done! Imported: 2", out.getvalue())
+        self.assertEqual(
+            list(Pack.objects.order_by("id").values_list("pack_id", flat=True)),
+            ["a" * 32, "c" * 32],
+        )
+
+        pack = Pack.objects.get(pack_id="a" * 32)
+        self.assertTrue(pack.editorschoice)
+        self.assertEqual(sorted(str(tag) for tag in pack.tags.all()), ["bar", "foo"])
+        self.assertEqual(Tag.objects.count(), 2)
+        self.assertEqual(list(Pack.objects.search("bar")), [pack])
+
+
+@patch("core.models.pack.get_pack_from_signal", autospec=True)
+class ImportStatsFromLogfileCommandTest(TestCase):
+    def setUp(self):
+        tmp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmp_dir)
+        self.tmp_path = Path(tmp_dir)
+
+        # 2021-03-15
+        ping = "1615800000|POST /ping HTTP/1.1|https://signalstickers.org/"
+        pack_ping = f"{ping}pack/{'a' * 32}|x\n"
+        home_ping = f"{ping}|x\n"
+        other = "1615800000|GET / HTTP/1.1|https://signalstickers.org/|x\n"
+
+        self.log_path = self.tmp_path / "access.log"
+        self.log_path.write_text(pack_ping * 3 + other + home_ping, encoding="utf-8")
+        self.gz_log_path = self.tmp_path / "access.log.1.gz"
+        with gzip.open(self.gz_log_path, "wt", encoding="utf-8") as f_out:
+            f_out.write(pack_ping + home_ping * 2)
+
+    def test_shards(self, _):
+        expected = parse_shard((self.log_path, 0, self.log_path.stat().st_size))
+        self.assertEqual(expected[2], 4)
+
+        for shard_size in (1, 10, 97, 1000):
+            shards = plan_shards([self.log_path], shard_size)
+            pack_views, site_visits, nb_lines = Counter(), Counter(), 0
+            for shard in shards:
+                shard_pack_views, shard_site_visits, shard_nb_lines = parse_shard(shard)
+                pack_views.update(shard_pack_views)
+                site_visits.update(shard_site_visits)
+                nb_lines += shard_nb_lines
+            self.assertEqual((pack_views, site_visits, nb_lines), expected)
+
+    def test_command(self, mocked_getpacklib):
+        mocked_getpacklib.return_value = TestPack("foo", "bar", b"\x00")
+        pack = Pack.objects.new(
+            pack_id="a" * 32, pack_key="b" * 64, status=PackStatus.ONLINE.name
+        )
+        pack.stats = {"2021_03": 10, "2021_02": 5}
+        pack.save()
+
+        args = [self.log_path, self.gz_log_path, "--noinput", "--processes", "1"]
+
+        # Replace
+        call_command("import_stats_from_logfile", *args, stdout=StringIO())
+        pack.refresh_from_db()
+        self.assertEqual(pack.stats, {"2021_03": 4})
+        self.assertEqual(pack.total_views, 4)
+        self.assertEqual(Pack.objects.total_packviews(), {"2021_03": 4})
+        self.assertEqual(SiteStat.objects.get_visits_by_month(), {"2021_03": 3})
+
+        # Merge
+        call_command("import_stats_from_logfile", *args, "--merge", stdout=StringIO())
+        pack.refresh_from_db()
+        self.assertEqual(pack.stats, {"2021_03": 8})
+        self.assertEqual(pack.total_views, 8)
+        self.assertEqual(SiteStat.objects.get_visits_by_month(), {"2021_03": 6})
+
 
 @patch("core.models.pack.get_pack_from_signal", autospec=True)
 class CleanPacksTagsCommandTest(TestCase):
+    def setUp(self):
+        # Tags cached by other tests are rolled back without signals
+        Tag.objects.invalidate_cache()
+
     def test_command(self, mocked_getpacklib):
         """The Command should correctly remove, clean, delete tags"""
         mocked_getpacklib.return_value = TestPack(
@@ -598,6 +1561,187 @@ class CleanPacksTagsCommandTest(TestCase):
         )
         self.assertFalse(Tag.objects.filter(name=malformed_tag_name).exists())
 
+    def test_dry_run_and_refused_packs(self, mocked_getpacklib):
+        mocked_getpacklib.return_value = TestPack("Title", "Author", b"\x00")
+        online_pack = Pack.objects.new(
+            pack_id="a" * 32,
+            pack_key="a" * 64,
+            status=PackStatus.ONLINE.name,
+            tags=["#foo #bar", "baz"],
+        )
+        refused_pack = Pack.objects.new(
+            pack_id="b" * 32,
+            pack_key="b" * 64,
+            status=PackStatus.REFUSED.name,
+            tags=["#foo #bar"],
+        )
+
+        out = StringIO()
+        call_command("clean_packs_tags", dry_run=True, stdout=out)
+        self.assertIn("Malformed tags: 1, used by 1 packs (1 links)", out.getvalue())
+        self.assertIn("Tags to create: 2.", out.getvalue())
+        self.assertFalse(Tag.objects.filter(name="foo").exists())
+
+        call_command("clean_packs_tags", stdout=StringIO())
+        self.assertEqual(
+            sorted(online_pack.tags.values_list("name", flat=True)),
+            ["bar", "baz", "foo"],
+        )
+        # Still used by the refused pack
+        self.assertEqual(
+            list(refused_pack.tags.values_list("name", flat=True)), ["#foo #bar"]
+        )
+        self.assertEqual(list(Pack.objects.search("foo baz")), [online_pack])
+
+
+@patch("core.models.pack.get_pack_from_signal", autospec=True)
+class ExportPacksImgCommandTest(TestCase):
+    def test_command(self, mocked_getpacklib):
+        mocked_getpacklib.return_value = TestPack("Title", "Author", b"\x00")
+        for pack_id in "ace":
+            Pack.objects.new(
+                pack_id=pack_id * 32, pack_key="b" * 64, status=PackStatus.ONLINE.name
+            )
+
+        class ExportSignalClient(FakeSignalClient):
+            async def aget_pack(self, pack_id, _):
+                if pack_id == "e" * 32:
+                    raise SignalPackNotFound("Unknown pack")
+                return TestPack("Title", "Author", make_gif(), make_png())
+
+        tmp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmp_dir)
+        patcher = patch(
+            "core.management.commands.export_packs_img.SignalClient",
+            ExportSignalClient,
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        out = StringIO()
+        call_command("export_packs_img", output_dir=tmp_dir, stdout=out)
+        expected_files = [
+            f"{'a' * 32}_1.gif",
+            f"{'a' * 32}_2.png",
+            f"{'c' * 32}_1.gif",
+            f"{'c' * 32}_2.png",
+        ]
+        self.assertEqual(
+            sorted(path.name for path in Path(tmp_dir).glob("[!.]*")),
+            expected_files,
+        )
+        self.assertIn("Exported: 4 files", out.getvalue())
+        self.assertIn(f"Pack {'e' * 32}: could not be fetched", out.getvalue())
+        self.assertIn("failed: 1 packs", out.getvalue())
+
+        # Second run: the packs already exported are skipped
+        out = StringIO()
+        call_command("export_packs_img", output_dir=tmp_dir, stdout=out)
+        self.assertIn("Exported: 0 files", out.getvalue())
+        self.assertIn("Skipped (already exported): 2 packs", out.getvalue())
+
+        # Archive
+        archive_path = f"{tmp_dir}/export.zip"
+        call_command("export_packs_img", archive=archive_path, stdout=StringIO())
+        with zipfile.ZipFile(archive_path) as archive:
+            self.assertEqual(sorted(archive.namelist()), expected_files)
+
+        # Write errors do not stop the export
+        out = StringIO()
+        with patch(
+            "core.management.commands.export_packs_img.ArchiveWriter.write_pack",
+            side_effect=ValueError("Bad payload"),
+        ):
+            call_command("export_packs_img", archive=archive_path, stdout=out)
+        self.assertIn(f"Pack {'a' * 32}: could not be written", out.getvalue())
+        # Plus the unknown pack
+        self.assertIn("failed: 3 packs", out.getvalue())
+
+        # Nor any other error on a pack
+        out = StringIO()
+        with patch(
+            "core.management.commands.export_packs_img.inspect_image",
+            side_effect=ValueError("Bad image"),
+        ):
+            call_command("export_packs_img", archive=archive_path, stdout=out)
+        self.assertIn(f"Pack {'c' * 32}: could not be exported", out.getvalue())
+        self.assertIn("failed: 3 packs", out.getvalue())
+
+
+class FakeSignalClient:
+    def __init__(self, *_):
+        pass
+
+    async def aget_pack(self, pack_id, _):
+        if pack_id == "c" * 32:
+            raise SignalPackNotFound("Unknown pack")
+        return TestPack("New title", "New author", make_png(frames=2))
+
+    def close(self):
+        pass
+
+
+@patch("core.models.pack.get_pack_from_signal", autospec=True)
+@patch("core.management.commands.revalidate_packs.SignalClient", FakeSignalClient)
+class RevalidatePacksCommandTest(TestCase):
+    def setUp(self):
+        tmp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmp_dir)
+        self.tmp_path = Path(tmp_dir)
+
+        patcher = patch(
+            "core.management.commands.revalidate_packs.get_signal_cache",
+            return_value=SignalCache(self.tmp_path / "cache", 10_000),
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_command(self, mocked_getpacklib):
+        mocked_getpacklib.return_value = TestPack("Title", "Author", b"\x00")
+        pack_1 = Pack.objects.new(
+            pack_id="a" * 32, pack_key="b" * 64, status=PackStatus.ONLINE.name
+        )
+        pack_2 = Pack.objects.new(
+            pack_id="c" * 32, pack_key="d" * 64, status=PackStatus.ONLINE.name
+        )
+
+        out = StringIO()
+        call_command("revalidate_packs", stdout=out)
+
+        pack_1.refresh_from_db()
+        self.assertEqual((pack_1.title, pack_1.author), ("New title", "New author"))
+        self.assertTrue(pack_1.animated)
+        self.assertEqual(list(Pack.objects.search("new")), [pack_1])
+
+        # Missing packs are reported, not modified
+        pack_2.refresh_from_db()
+        self.assertEqual(pack_2.title, "Title")
+        self.assertIn(f"Pack {'c' * 32}: not found on Signal", out.getvalue())
+        self.assertIn("2/2 packs", out.getvalue())
+        self.assertIn("1 updated, 1 missing", out.getvalue())
+
+    def test_checkpoint(self, mocked_getpacklib):
+        mocked_getpacklib.return_value = TestPack("Title", "Author", b"\x00")
+        pack_1 = Pack.objects.new(
+            pack_id="a" * 32, pack_key="b" * 64, status=PackStatus.ONLINE.name
+        )
+        pack_2 = Pack.objects.new(
+            pack_id="e" * 32, pack_key="f" * 64, status=PackStatus.ONLINE.name
+        )
+
+        # Resume after the first pack
+        checkpoint = self.tmp_path / "checkpoint.json"
+        checkpoint.write_text(f'{{"last_id": {pack_1.id}}}', encoding="utf-8")
+        call_command("revalidate_packs", checkpoint=checkpoint, stdout=StringIO())
+
+        pack_1.refresh_from_db()
+        pack_2.refresh_from_db()
+        self.assertEqual(pack_1.title, "Title")
+        self.assertEqual(pack_2.title, "New title")
+
+        # Done: the checkpoint is removed
+        self.assertFalse(checkpoint.exists())
+
 
 @patch("core.models.pack.get_pack_from_signal", autospec=True)
 class AIReviewTestCase(TestCase):
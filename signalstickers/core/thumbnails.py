@@ -0,0 +1,107 @@
+"""
+Thumbnails of the stickers, shown in the admin panel instead of the full-size
+images. Each sticker is decoded once: its thumbnail (first frame of animated
+stickers) is stored on disk and served from there. Stickers are immutable on
+Signal, so thumbnails never expire; the cache is only bounded in size, the
+least recently used thumbnails being evicted first.
+
+Layout, in `settings.STICKER_THUMBNAILS["path"]`:
+    <pack_id>/<sticker_id>.<format>
+"""
+
+from functools import cache
+import io
+import logging
+
+from PIL import Image
+from core.disk_cache import DiskCache, touch
+from core.utils import get_pack_from_signal
+from django.conf import settings
+
+logger = logging.getLogger("main")
+
+
+class StickerThumbnails(DiskCache):
+    def __init__(self, path, max_size, size, image_format):
+        super().__init__(path, max_size)
+        self.size = size
+        self.format = image_format  # "webp" or "png"
+
+    @property
+    def content_type(self):
+        return f"image/{self.format}"
+
+    def _thumbnail_path(self, pack_id, sticker_id):
+        return self.path / pack_id / f"{int(sticker_id)}.{self.format}"
+
+    def get(self, pack_id, pack_key, sticker_id):
+        """
+        Return the thumbnail of the sticker `sticker_id` (the cover or any
+        sticker) of a pack, or None if there is no such sticker. On a miss, the
+        thumbnails of the whole pack are generated at once.
+        """
+        path = self._thumbnail_path(pack_id, sticker_id)
+        try:
+            thumbnail = path.read_bytes()
+            touch(path)
+            return thumbnail
+        except OSError:
+            pass
+        return self.generate(pack_id, pack_key).get(int(sticker_id))
+
+    def generate(self, pack_id, pack_key):
+        """
+        Fetch the pack from Signal, and store the thumbnails of its cover and
+        stickers not stored yet. Return them as a dict {sticker id: thumbnail}.
+        """
+        lib_pack = get_pack_from_signal(pack_id, pack_key)
+        if not lib_pack:
+            return {}
+
+        thumbnails = {}
+        for sticker in [lib_pack.cover, *lib_pack.stickers]:
+            path = self._thumbnail_path(pack_id, sticker.id)
+            if sticker.image_data is None or sticker.id in thumbnails or path.exists():
+                continue
+            try:
+                thumbnail = self.render(sticker.image_data)
+            except (OSError, SyntaxError, ValueError, Image.DecompressionBombError):
+                logger.warning(
+                    "Could not decode sticker %s of pack %s", sticker.id, pack_id
+                )
+                continue
+            thumbnails[sticker.id] = thumbnail
+
+            try:
+                self._write(path, thumbnail)
+            except OSError:
+                logger.warning("Could not cache thumbnail %s", path, exc_info=True)
+
+        if self._size is not None and self._size > self.max_size:
+            self.evict()
+        return thumbnails
+
+    def render(self, image_data):
+        """
+        Return the thumbnail of an image: its first frame, reduced to fit in a
+        square of `size` pixels.
+        """
+        with Image.open(io.BytesIO(image_data)) as image:
+            image.seek(0)
+            frame = image.convert("RGBA")
+        frame.thumbnail((self.size, self.size))
+
+        thumbnail = io.BytesIO()
+        frame.save(thumbnail, self.format)
+        return thumbnail.getvalue()
+
+
+@cache
+def get_sticker_thumbnails():
+    """
+    Return the thumbnails cache configured in `settings.STICKER_THUMBNAILS`.
+    """
+    conf = settings.STICKER_THUMBNAILS
+    return StickerThumbnails(
+        conf["path"], conf["max_size"], conf["size"], conf["format"]
+    )
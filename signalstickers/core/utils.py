@@ -1,9 +1,18 @@
 from datetime import date, timedelta
+import logging
 from urllib.parse import urlparse
 
-import anyio
+from core.image_format import inspect_image
+from core.signal_cache import get_signal_cache
+from core.signal_client import (
+    SignalError,
+    SignalInvalidPack,
+    SignalPackNotFound,
+    get_signal_client,
+)
 from django.core.exceptions import ValidationError
-from signalstickers_client import StickersClient
+
+logger = logging.getLogger("main")
 
 
 def get_current_ym_date():
@@ -16,43 +25,68 @@ def get_last_month_ym_date():
 
 def get_pack_from_signal(pack_id, pack_key):  # pragma: no cover
     """
-    Simple async -> sync wrapper around StickersClient.
+    Return the pack from the local cache, or fetch it from Signal and cache it.
+    Return None if the pack does not exist, or could not be fetched.
     """
+    signal_cache = get_signal_cache()
+    pack = signal_cache.get(pack_id, pack_key)
+    if pack:
+        return pack
+
+    try:
+        pack = get_signal_client().get_pack(pack_id, pack_key)
+    except SignalError as exc:
+        _log_signal_error(pack_id, exc)
+        return None
+
+    signal_cache.put(pack_id, pack_key, pack)
+    return pack
 
-    async def _get_pack(pack_id, pack_key):
-        async with StickersClient() as client:
-            pack = await client.get_pack(pack_id, pack_key)
+
+async def aget_pack_from_signal(pack_id, pack_key):  # pragma: no cover
+    """
+    Same as `get_pack_from_signal()`, for async code.
+    """
+    signal_cache = get_signal_cache()
+    pack = signal_cache.get(pack_id, pack_key)
+    if pack:
         return pack
 
     try:
-        return anyio.run(_get_pack, pack_id, pack_key)
-    except:  # pylint: disable=bare-except
+        pack = await get_signal_client().aget_pack(pack_id, pack_key)
+    except SignalError as exc:
+        _log_signal_error(pack_id, exc)
         return None
 
+    signal_cache.put(pack_id, pack_key, pack)
+    return pack
+
+
+def _log_signal_error(pack_id, exc):  # pragma: no cover
+    # Unknown packs and wrong keys are user errors, not worth a warning
+    if isinstance(exc, (SignalPackNotFound, SignalInvalidPack)):
+        logger.info("Pack %s not found on Signal: %s", pack_id, exc)
+    else:
+        logger.warning("Could not fetch pack %s from Signal: %s", pack_id, exc)
+
 
 def detect_animated_pack(lib_pack):
     """
     Take a pack from signalstickers_client and return a boolean describing if
     the pack is animated or not. A pack will be animated if at least one of its
-    stickers is a APNG or a GIF.
+    stickers is a APNG or an animated GIF.
     Will raise a `ValidationError` if the pack format is invalid.
     """
 
     for sticker in lib_pack.stickers:
-        if b"\x61\x63\x54\x4c" in sticker.image_data:  # APNG acTL chunk
-            return True
-        if sticker.image_data.startswith(
-            b"\x47\x49\x46\x38\x39\x61"
-        ):  # GIF89a magic numbers
-            return True
-        if (
-            b"\x41\x4e\x49\x4d" in sticker.image_data  # ANIM chunck
-            and b"\x57\x45\x42\x50" in sticker.image_data  # WEBP
-        ):
+        image = inspect_image(sticker.image_data)
+        if image.animated and image.format == "webp":
             # Animated WebP: invalid.
             raise ValidationError(
                 "Animated WebP are invalid; this pack can not be added."
             )
+        if image.animated:
+            return True
     return False
 
 
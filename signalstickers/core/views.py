@@ -1,8 +1,10 @@
 from statistics import mean, median
 
+from core.cdn import get_last_auto_purge
 from core.models import LOG_CLEAR_CACHES, AdminAction, Pack, SiteStat
 from core.services import invalidate_cdn
 from core.utils import get_current_ym_date, get_last_month_ym_date
+from django.conf import settings
 from django.contrib import messages
 from django.contrib.admin.models import LogEntry
 from django.contrib.auth.mixins import PermissionRequiredMixin
@@ -14,10 +16,16 @@ from django.views.generic import View
 
 
 class AdminTriggerActionsView(View):
-    def get(self, request, admin_site):
-        context = dict(
+    @staticmethod
+    def _get_context(request, admin_site):
+        return dict(
             admin_site.each_context(request),
+            automatic_purge=settings.CDN_PURGE["automatic"],
+            last_auto_purge=get_last_auto_purge(),
         )
+
+    def get(self, request, admin_site):
+        context = self._get_context(request, admin_site)
         return render(request, "admin/trigger_actions.html", context=context)
 
     def post(self, request, admin_site):
@@ -60,9 +68,7 @@ class AdminTriggerActionsView(View):
         if request.POST.get("action") == "cloudflareclear":
             clear_caches()
 
-        context = dict(
-            admin_site.each_context(request),
-        )
+        context = self._get_context(request, admin_site)
 
         return render(request, "admin/trigger_actions.html", context=context)
 
@@ -91,3 +91,115 @@ USE_TZ = True
 # https://docs.djangoproject.com/en/3.1/howto/static-files/
 
 STATIC_URL = "/static/"
+
+
+# Catalog snapshots
+# Pre-rendered catalogs, served as-is by the API. A snapshot is rebuilt when a
+# Pack or a Tag is modified, and every CATALOG_SNAPSHOT_TIMEOUT seconds (so that
+# views counters are refreshed). "v2-columnar" and "v2-msgpack" are the formats
+# of the v2 catalog selected with the `format` parameter (see `api_v2.catalog`).
+
+CATALOG_RENDERERS = {
+    "v1": "api.catalog.render_packs",
+    "v2": "api_v2.catalog.render_packs",
+    "v2-columnar": "api_v2.catalog.render_packs_columnar",
+    "v2-msgpack": "api_v2.catalog.render_packs_msgpack",
+}
+
+CATALOG_SNAPSHOT_TIMEOUT = 60 * 60
+
+# Catalog artifacts
+# The catalogs can be written as static files, for nginx or the CDN to serve
+# them without Python: `<path>/<catalog>/packs.<hash>.json`, with precompressed
+# `.json.gz` and `.json.br` (for `gzip_static` / `brotli_static`). They are
+# built with the `build_catalog_artifacts` command, and in the background when
+# the catalog changes. `serve` is how the API hands them over: "redirect" (to
+# `url`), "x-accel" (`X-Accel-Redirect` to `url`, an internal nginx location),
+# or None (the API serves the catalogs itself). The files of the last `keep`
+# builds are kept, for the clients redirected just before a new build. Only the
+# JSON lists ("v1" and "v2") are written as files.
+
+CATALOG_ARTIFACTS = {
+    "path": BASE_DIR / "catalog",
+    "url": "/catalog/",
+    "serve": None,
+    "keep": 3,
+}
+
+# HTTP caching
+# Cache-Control of the public read endpoints (arguments of
+# `django.utils.cache.patch_cache_control`). Clients and the CDN revalidate
+# their copy with ETag / Last-Modified once it is `max_age` seconds old; they
+# may serve it while revalidating for `stale_while_revalidate` more seconds.
+HTTP_CACHE_POLICIES = {
+    "catalog": {"public": True, "max_age": 60, "stale_while_revalidate": 600},
+    "status": {"public": True, "max_age": 10, "stale_while_revalidate": 30},
+    "feeds": {"public": True, "max_age": 300, "stale_while_revalidate": 3600},
+    "thumbnails": {"private": True, "max_age": 365 * 24 * 60 * 60, "immutable": True},
+}
+
+
+# Admin
+# The counters of the admin navbar (packs to review, reports to process...) are
+# cached for ADMIN_STATUS_SUMMARY_TIMEOUT seconds, or until a review action.
+
+ADMIN_STATUS_SUMMARY_TIMEOUT = 60
+
+
+# CDN
+# When packs or tags change, only the cached URLs they affect are purged from
+# Cloudflare (API at `api_base`; zone and token in CLOUDFLARE_CONF). `public_url`
+# is where the API is served through the CDN. Purges are debounced: changes made
+# within `debounce` seconds are purged together. With `automatic`, purges are
+# sent in the background on each change; otherwise, caches are purged from the
+# admin or with the `purge_cdn` command.
+
+CDN_PURGE = {
+    "api_base": "https://api.cloudflare.com/client/v4",
+    "public_url": "https://api.signalstickers.org",
+    "debounce": 10,
+    "automatic": False,
+}
+
+
+# Analytics
+# `backend` is "direct" (each hit is written to the DB), "memory" (hits are
+# buffered per worker) or "file" (hits are buffered in a local queue file, at
+# `path`, shared by all the workers; drain it with `flush_analytics`).
+# Buffers are written to the DB every `flush_interval` seconds, or once they
+# contain `flush_threshold` hits.
+
+ANALYTICS_BUFFER = {
+    "backend": "direct",
+    "path": BASE_DIR / "analytics.queue",
+    "flush_interval": 10,
+    "flush_threshold": 1000,
+}
+
+# Signal cache
+# Packs fetched from Signal (manifests and sticker images) are cached in `path`.
+# Above `max_size` bytes, the least recently used files are evicted.
+SIGNAL_CACHE = {
+    "path": BASE_DIR / "signal_cache",
+    "max_size": 512 * 1024 * 1024,
+}
+
+# Sticker thumbnails
+# The stickers are shown in the admin as thumbnails (`format`: "webp" or "png")
+# fitting in `size` pixels, cached in `path`. Above `max_size` bytes, the least
+# recently used thumbnails are evicted.
+STICKER_THUMBNAILS = {
+    "path": BASE_DIR / "thumbnails",
+    "max_size": 128 * 1024 * 1024,
+    "size": 128,
+    "format": "webp",
+}
+
+# Signal client
+# All the fetches of a process share a pool of connections to Signal. At most
+# `max_concurrency` packs are fetched at the same time, each within `timeout`
+# seconds.
+SIGNAL_CLIENT = {
+    "timeout": 30,
+    "max_concurrency": 8,
+}
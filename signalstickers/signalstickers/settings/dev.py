@@ -58,5 +58,9 @@ LOGGING = {
 
 HEADER_IP = "REMOTE_ADDR"
 
+# CDN purges are sent to the local fake API (`./manage.py fake_cloudflare`)
+CLOUDFLARE_CONF = {"zone_id": "dev", "token": "dev"}
+CDN_PURGE = {**CDN_PURGE, "api_base": "http://127.0.0.1:8787/client/v4"}
+
 EMAIL_BACKEND = "django.core.mail.backends.console.EmailBackend"
 EMAIL_FROM = '"Signalstickers" <Signalstickers@example.com>'
@@ -1,7 +1,26 @@
 # pylint: disable=invalid-name
+from contextlib import contextmanager
+import logging
+
+
+@contextmanager
+def logging_enabled():
+    """
+    Enable the logs, disabled by some test modules when they are imported: to
+    assert on them (`assertLogs()`) whatever the tests run.
+    """
+    disabled = logging.root.manager.disable
+    logging.disable(logging.NOTSET)
+    try:
+        yield
+    finally:
+        logging.disable(disabled)
+
+
 class TestSticker:
-    def __init__(self, sticker_id, img_data):
+    def __init__(self, sticker_id, img_data, emoji=""):
         self.id = sticker_id
+        self.emoji = emoji
         self.image_data = img_data
 
 
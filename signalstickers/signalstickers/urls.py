@@ -25,8 +25,8 @@ from django.urls import include, path
 urlpatterns = [
     path("v2/", api_v2.urls),
     path("v1/", include("api.urls")),
-    path("feed/rss/", RssPackFeed()),
-    path("feed/atom/", AtomPackFeed()),
+    path("feed/rss/", RssPackFeed(), name="feed_rss"),
+    path("feed/atom/", AtomPackFeed(), name="feed_atom"),
     path(settings.ADMIN_URL, admin.site.urls),
     path("__debug__/", include(debug_toolbar.urls)),
 ] + static(settings.STATIC_URL, document_root=settings.STATIC_ROOT)